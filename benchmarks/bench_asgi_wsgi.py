@@ -0,0 +1,328 @@
+"""
+Пропускная способность чтения: WSGI (gunicorn gthread, синхронные
+представления) против ASGI (uvicorn, async-представления library.asyncviews)
+на одних и тех же данных и одной смеси запросов:
+список книг (случайная страница), книга по id, выдачи читателя,
+/api/users/me/, /api/health/.
+
+Между серверами и Postgres — TCP-прокси с задержкой `--db-latency-ms` на
+каждый обмен (сеть до БД: на одной машине запросы почти не ждут, и
+перекрывать нечего). Кэш ответов каталога выключен
+(RESPONSE_CACHE_TIMEOUT=0) — меряется чтение из БД, а не из кэша.
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_asgi_wsgi.py --concurrency 16 64
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from library.models import Author, Book  # noqa: E402
+from users.authentication import ClaimsRefreshToken  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def generate(books, users, loans):
+    author = Author.objects.create(first_name="Бенч", last_name="Марк")
+    Book.objects.bulk_create(
+        (
+            Book(
+                title=f"Книга {n:06d}",
+                isbn=f"bench-{n}",
+                published_year=2000,
+                author=author,
+                author_display_name="Марк Бенч",
+                copies_total=5,
+                copies_available=5,
+            )
+            for n in range(books)
+        ),
+        batch_size=5000,
+    )
+    User.objects.bulk_create(
+        (
+            User(username=f"bench-{n}", email=f"bench-{n}@example.com")
+            for n in range(users)
+        ),
+        batch_size=5000,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO library_loan
+                (user_id, book_id, issued_at, due_at, status, created_at, updated_at)
+            SELECT u.lo + s %% u.n, b.lo + floor(random() * b.n)::int,
+                   now(), now() + interval '14 days', 'ISSUED', now(), now()
+            FROM generate_series(1, %s) s
+            CROSS JOIN (SELECT min(id) lo, count(*) n FROM users_user) u
+            CROSS JOIN (SELECT min(id) lo, count(*) n FROM library_book) b
+            ON CONFLICT DO NOTHING
+            """,
+            [loans],
+        )
+        cursor.execute("ANALYZE")
+
+
+async def pipe(reader, writer, delay):
+    try:
+        while data := await reader.read(65536):
+            await asyncio.sleep(delay)
+            writer.write(data)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+def latency_proxy(target, delay, port):
+    """TCP-прокси к Postgres: каждая порция данных приходит через delay секунд."""
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(*target)
+        await asyncio.gather(
+            pipe(client_reader, server_writer, delay),
+            pipe(server_reader, client_writer, delay),
+            return_exceptions=True,
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Connection:
+    """HTTP/1.1 keep-alive соединение клиента нагрузки."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path, token=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                "127.0.0.1", self.port
+            )
+        headers = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+        if token:
+            headers += f"Authorization: Bearer {token}\r\n"
+        try:
+            self.writer.write(f"{headers}\r\n".encode())
+            head = await self.reader.readuntil(b"\r\n\r\n")
+            length, close = 0, False
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+                elif name.lower() == b"connection":
+                    close = value.strip().lower() == b"close"
+            await self.reader.readexactly(length)
+        except (OSError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+        if close:
+            self.close()
+        return int(head.split(b" ", 2)[1])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def request_mix(book_ids, tokens, rng):
+    """(путь, токен) очередного запроса."""
+    kind = rng.random()
+    if kind < 0.35:
+        return f"/api/books/?page={rng.randint(1, len(book_ids) // 20)}", None
+    if kind < 0.65:
+        return f"/api/books/{rng.choice(book_ids)}/", None
+    if kind < 0.85:
+        return "/api/loans/", rng.choice(tokens)
+    if kind < 0.95:
+        return "/api/users/me/", rng.choice(tokens)
+    return "/api/health/", None
+
+
+async def load(port, seconds, concurrency, book_ids, tokens):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(seed):
+        nonlocal errors
+        rng = random.Random(seed)
+        conn = Connection(port)
+        while time.perf_counter() < deadline:
+            path, token = request_mix(book_ids, tokens, rng)
+            started = time.perf_counter()
+            try:
+                status = await conn.get(path, token)
+            except (OSError, asyncio.IncompleteReadError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def wait_ready(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("сервер не запустился")
+        try:
+            if asyncio.run(Connection(port).get("/api/health/")) == 200:
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            time.sleep(0.2)
+    raise RuntimeError("сервер не ответил на /api/health/")
+
+
+def servers(port, workers, threads):
+    return (
+        (
+            f"WSGI gunicorn {workers}x{threads} потоков",
+            [
+                "gunicorn",
+                "config.wsgi:application",
+                f"--bind=127.0.0.1:{port}",
+                "--worker-class=gthread",
+                f"--workers={workers}",
+                f"--threads={threads}",
+                "--log-level=warning",
+            ],
+        ),
+        (
+            f"ASGI uvicorn {workers} процесса",
+            [
+                "uvicorn",
+                "config.asgi:application",
+                "--host=127.0.0.1",
+                f"--port={port}",
+                f"--workers={workers}",
+                "--no-access-log",
+                "--log-level=warning",
+            ],
+        ),
+    )
+
+
+def measure(label, command, env, port, args, book_ids, tokens):
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        wait_ready(port, process)
+        asyncio.run(load(port, 2, 4, book_ids, tokens))  # прогрев
+        for concurrency in args.concurrency:
+            latencies, errors, elapsed = asyncio.run(
+                load(port, args.seconds, concurrency, book_ids, tokens)
+            )
+            print(
+                f"{label:<32} клиентов {concurrency:>3}: "
+                f"{len(latencies) / elapsed:7.0f} зап/с, "
+                f"p50 {percentile(latencies, 50):7.1f} мс, "
+                f"p99 {percentile(latencies, 99):7.1f} мс, "
+                f"ошибок {errors}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--loans", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--db-latency-ms", type=float, nargs="+", default=[0, 50, 200])
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        generate(args.books, args.users, args.loans)
+        book_ids = list(Book.objects.values_list("pk", flat=True))
+        tokens = [
+            str(ClaimsRefreshToken.for_user(user).access_token)
+            for user in User.objects.order_by("?")[:200]
+        ]
+        db = connection.settings_dict
+        target = (db["HOST"] or "localhost", int(db["PORT"] or 5432))
+        connection.close()
+        print(f"{args.books} книг, {args.loans} выдач, {args.seconds:.0f} с на замер")
+
+        for latency in args.db_latency_ms:
+            db_port, proxy = target[1], None
+            if latency:
+                # отдельный процесс: прокси не делит GIL с клиентами нагрузки
+                db_port = free_port()
+                proxy = multiprocessing.Process(
+                    target=latency_proxy,
+                    args=(target, latency / 2000, db_port),
+                    daemon=True,
+                )
+                proxy.start()
+            print(f"\nзадержка до БД {latency} мс на обмен")
+            env = {
+                **os.environ,
+                "POSTGRES_DB": db["NAME"],
+                "POSTGRES_HOST": target[0],
+                "POSTGRES_PORT": str(db_port),
+                "PYTHONWARNINGS": "ignore",
+                "DEBUG": "0",
+                "ALLOWED_HOSTS": "*",
+                "RESPONSE_CACHE_TIMEOUT": "0",
+            }
+            try:
+                for label, command in servers(
+                    port := free_port(), args.workers, args.threads
+                ):
+                    measure(label, command, env, port, args, book_ids, tokens)
+            finally:
+                if proxy is not None:
+                    proxy.terminate()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Задержка запроса с пулом соединений psycopg (DB_POOL=1) и без него
+(DB_POOL=0, CONN_MAX_AGE=0: подключение и аутентификация в Postgres на
+каждый запрос). Сервер — uvicorn, смесь запросов та же, что в
+bench_asgi_wsgi.py; для каждого варианта — p50/p99 и сколько соединений
+с тестовой БД было открыто на пике (pg_stat_activity).
+
+`--db-latency-ms` — задержка сети до БД на каждый обмен через TCP-прокси:
+подключение к Postgres — несколько обменов (startup, SCRAM, параметры),
+поэтому без пула задержка запроса растёт с ней быстрее.
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_db_pool.py --concurrency 8 32
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import threading
+
+# общие части нагрузочного бенчмарка; импорт заодно выполняет django.setup()
+from bench_asgi_wsgi import (
+    ROOT,
+    free_port,
+    generate,
+    latency_proxy,
+    load,
+    percentile,
+    wait_ready,
+)
+from django.db import connection
+
+from library.models import Book
+from users.authentication import ClaimsRefreshToken
+from users.models import User
+
+VARIANTS = (
+    ("без пула", {"DB_POOL": "0", "CONN_MAX_AGE": "0"}),
+    ("пул psycopg", {"DB_POOL": "1"}),
+)
+
+
+class BackendCounter(threading.Thread):
+    """Пиковое число соединений с БД `name` (опрос pg_stat_activity)."""
+
+    def __init__(self, params, name):
+        super().__init__(daemon=True)
+        self.params = params
+        self.name = name
+        self.peak = 0
+        self.done = threading.Event()
+
+    def run(self):
+        import psycopg
+
+        with psycopg.connect(**self.params, autocommit=True) as conn:
+            while not self.done.wait(0.1):
+                (count,) = conn.execute(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE datname = %s AND pid <> pg_backend_pid()",
+                    [self.name],
+                ).fetchone()
+                self.peak = max(self.peak, count)
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        return self.peak
+
+
+def measure(label, env, port, args, book_ids, tokens, db_params, db_name):
+    command = [
+        "uvicorn",
+        "config.asgi:application",
+        "--host=127.0.0.1",
+        f"--port={port}",
+        f"--workers={args.workers}",
+        "--no-access-log",
+        "--log-level=warning",
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        wait_ready(port, process)
+        asyncio.run(load(port, 2, 4, book_ids, tokens))  # прогрев
+        for concurrency in args.concurrency:
+            counter = BackendCounter(db_params, db_name)
+            counter.start()
+            latencies, errors, elapsed = asyncio.run(
+                load(port, args.seconds, concurrency, book_ids, tokens)
+            )
+            peak = counter.stop()
+            print(
+                f"{label:<12} клиентов {concurrency:>3}: "
+                f"{len(latencies) / elapsed:6.0f} зап/с, "
+                f"p50 {percentile(latencies, 50):7.1f} мс, "
+                f"p99 {percentile(latencies, 99):7.1f} мс, "
+                f"соединений {peak:>3}, ошибок {errors}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--loans", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--pool-max-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--db-latency-ms", type=float, nargs="+", default=[0, 5])
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        generate(args.books, args.users, args.loans)
+        book_ids = list(Book.objects.values_list("pk", flat=True))
+        tokens = [
+            str(ClaimsRefreshToken.for_user(user).access_token)
+            for user in User.objects.order_by("?")[:200]
+        ]
+        db = connection.settings_dict
+        db_params = connection.get_connection_params()
+        target = (db["HOST"] or "localhost", int(db["PORT"] or 5432))
+        connection.close()
+        print(
+            f"{args.books} книг, {args.loans} выдач, uvicorn {args.workers} процесса, "
+            f"пул до {args.pool_max_size} соединений на процесс"
+        )
+
+        for latency in args.db_latency_ms:
+            db_port, proxy = target[1], None
+            if latency:
+                db_port = free_port()
+                proxy = multiprocessing.Process(
+                    target=latency_proxy,
+                    args=(target, latency / 2000, db_port),
+                    daemon=True,
+                )
+                proxy.start()
+            print(f"\nзадержка до БД {latency} мс на обмен")
+            env = {
+                **os.environ,
+                "POSTGRES_DB": db["NAME"],
+                "POSTGRES_HOST": target[0],
+                "POSTGRES_PORT": str(db_port),
+                "PYTHONWARNINGS": "ignore",
+                "DEBUG": "0",
+                "ALLOWED_HOSTS": "*",
+                "RESPONSE_CACHE_TIMEOUT": "0",
+                "WEB_WORKERS": str(args.workers),
+                "DB_POOL_MAX_SIZE": str(args.pool_max_size),
+            }
+            try:
+                for label, variant in VARIANTS:
+                    measure(
+                        label,
+                        {**env, **variant},
+                        free_port(),
+                        args,
+                        book_ids,
+                        tokens,
+                        db_params,
+                        db["NAME"],
+                    )
+            finally:
+                if proxy is not None:
+                    proxy.terminate()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
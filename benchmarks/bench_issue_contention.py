@@ -0,0 +1,113 @@
+"""
+Нагрузочный бенчмарк выдачи одной «горячей» книги из N потоков:
+прежняя схема (select_for_update строки книги) против issue_book
+(условный UPDATE без явной блокировки).
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_issue_contention.py --threads 16 --per-thread 50
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, connections, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from library.models import Author, Book, Loan  # noqa: E402
+from library.services import issue_book  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+@transaction.atomic
+def issue_with_row_lock(*, actor, book_id):
+    """issue_book до изменения: блокировка строки книги на всю транзакцию."""
+    book = Book.objects.select_for_update().get(pk=book_id)
+    if book.copies_available <= 0:
+        raise ValueError("нет копий")
+    issued_at = timezone.now()
+    loan = Loan.objects.create(
+        user_id=actor.id,
+        book=book,
+        issued_at=issued_at,
+        due_at=issued_at + timedelta(days=14),
+        status=Loan.Status.ISSUED,
+    )
+    book.copies_available -= 1
+    book.save(update_fields=["copies_available"])
+    return loan
+
+
+def run(issue, threads, per_thread):
+    author = Author.objects.create(first_name="Энди", last_name="Вейер")
+    total = threads * per_thread
+    book = Book.objects.create(
+        title="Марсианин",
+        isbn=f"bench-{time.time_ns()}",
+        published_year=2011,
+        author=author,
+        copies_total=total,
+        copies_available=total,
+    )
+    users = User.objects.bulk_create(
+        User(username=f"bench-{book.pk}-{i}") for i in range(total)
+    )
+    barrier = threading.Barrier(threads)
+
+    def worker(chunk):
+        barrier.wait()
+        try:
+            for user in chunk:
+                issue(actor=user, book_id=book.pk)
+        finally:
+            connections.close_all()
+
+    workers = [
+        threading.Thread(target=worker, args=(users[i::threads],))
+        for i in range(threads)
+    ]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    book.refresh_from_db()
+    assert book.copies_available == 0, book.copies_available
+    assert Loan.objects.filter(book=book).count() == total
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--per-thread", type=int, default=50)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        for label, issue in (
+            ("select_for_update", issue_with_row_lock),
+            ("условный UPDATE", issue_book),
+        ):
+            rate = run(issue, args.threads, args.per_thread)
+            print(f"{label:<20} {rate:8.0f} выдач/с ({args.threads} потоков)")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
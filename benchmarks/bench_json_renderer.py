@@ -0,0 +1,56 @@
+"""
+Бенчмарк: стандартный JSONRenderer против ORJSONRenderer на страницах книг и
+выдач (данные сериализатора, как их получает рендерер в ответе API).
+
+    SECRET_KEY=x python benchmarks/bench_json_renderer.py [--rows 100]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from bench_list_serialization import make_objects  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from library.renderers import ORJSONRenderer  # noqa: E402
+from library.serializers import BookSerializer, LoanSerializer  # noqa: E402
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<28} {seconds * 1000:8.3f} ms/страница")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    books, loans = make_objects(args.rows)
+    pages = {
+        "books": {"count": args.rows, "results": BookSerializer(books, many=True).data},
+        "loans": {"count": args.rows, "results": LoanSerializer(loans, many=True).data},
+    }
+    stdlib, fast = JSONRenderer(), ORJSONRenderer()
+
+    print(f"{args.rows} строк на страницу")
+    for name, page in pages.items():
+        assert stdlib.render(page) == fast.render(page)
+        slow_time = bench(f"{name}: json", lambda: stdlib.render(page), args.number)
+        fast_time = bench(f"{name}: orjson", lambda: fast.render(page), args.number)
+        print(f"{name}: ускорение x{slow_time / fast_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
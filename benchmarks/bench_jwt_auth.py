@@ -0,0 +1,73 @@
+"""
+Накладные расходы JWT-аутентификации на запрос: JWTAuthentication
+(SELECT пользователя на каждый запрос) против CachedJWTAuthentication
+(claims токена + кэш пользователя).
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_jwt_auth.py --requests 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework_simplejwt.authentication import JWTAuthentication  # noqa: E402
+
+from users.authentication import (  # noqa: E402
+    CachedJWTAuthentication,
+    ClaimsRefreshToken,
+)
+from users.models import User  # noqa: E402
+
+
+def run(authentication, access, requests):
+    factory = APIRequestFactory()
+    request = Request(factory.get("/api/loans/", HTTP_AUTHORIZATION=f"Bearer {access}"))
+    authentication.authenticate(request)  # прогрев (кэш пользователя)
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(requests):
+            user, _token = authentication.authenticate(request)
+            user.is_staff
+        elapsed = time.perf_counter() - started
+    return elapsed / requests * 1e6, len(ctx.captured_queries) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        user = User.objects.create_user(username="bench", password="x")
+        access = str(ClaimsRefreshToken.for_user(user).access_token)
+        for label, authentication in (
+            ("JWTAuthentication", JWTAuthentication()),
+            ("CachedJWTAuthentication", CachedJWTAuthentication()),
+        ):
+            per_request, queries = run(authentication, access, args.requests)
+            print(
+                f"{label:<24} {per_request:8.1f} мкс/запрос, "
+                f"{queries:.2f} запросов к БД"
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
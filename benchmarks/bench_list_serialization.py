@@ -0,0 +1,145 @@
+"""
+Микробенчмарк: LoanSerializer/BookSerializer(many=True) против FastRowBuilder.
+
+Без БД: модели и строки `.values()` собираются в памяти, измеряется только
+сериализация страницы.
+
+    SECRET_KEY=x python benchmarks/bench_list_serialization.py [--rows 100]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+
+from library.fastlist import FastRowBuilder  # noqa: E402
+from library.models import Author, Book, Loan  # noqa: E402
+from library.serializers import BookSerializer, LoanSerializer  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def make_objects(rows):
+    now = timezone.now()
+    author = Author(id=1, first_name="Рэй", last_name="Брэдбери")
+    user = User(id=1, username="reader")
+    books, loans = [], []
+    for i in range(rows):
+        book = Book(
+            id=i + 1,
+            title=f"Книга {i}",
+            isbn=f"978-{i:09d}",
+            description="Описание " * 20,
+            genre=Book.Genre.FICTION,
+            published_year=1950 + i % 70,
+            author=author,
+            author_display_name=str(author),
+            copies_total=3,
+            copies_available=2,
+            created_at=now,
+        )
+        books.append(book)
+        loans.append(
+            Loan(
+                id=i + 1,
+                user=user,
+                book=book,
+                issued_at=now - timedelta(days=20),
+                due_at=now + timedelta(days=i % 2 * 2 - 1),
+                returned_at=None,
+                status=Loan.Status.ISSUED,
+            )
+        )
+    return books, loans
+
+
+def book_rows(books):
+    return [
+        {
+            "id": b.id,
+            "title": b.title,
+            "isbn": b.isbn,
+            "description": b.description,
+            "genre": b.genre,
+            "published_year": b.published_year,
+            "author": b.author_id,
+            "author_display_name": b.author_display_name,
+            "copies_total": b.copies_total,
+            "copies_available": b.copies_available,
+            "created_at": b.created_at,
+        }
+        for b in books
+    ]
+
+
+def loan_rows(loans, now):
+    return [
+        {
+            "id": loan.id,
+            "user": loan.user_id,
+            "user__username": loan.user.username,
+            "book": loan.book_id,
+            "book__title": loan.book.title,
+            "issued_at": loan.issued_at,
+            "due_at": loan.due_at,
+            "returned_at": loan.returned_at,
+            "status": loan.status,
+            # в БД это CASE WHEN из loan_effective_status
+            "_fast_effective_status": (
+                Loan.Status.OVERDUE.value
+                if loan.returned_at is None and loan.due_at < now
+                else loan.status
+            ),
+        }
+        for loan in loans
+    ]
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<32} {seconds * 1000:8.3f} ms/страница")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    now = timezone.now()
+    books, loans = make_objects(args.rows)
+    brows, lrows = book_rows(books), loan_rows(loans, now)
+    book_builder = FastRowBuilder(BookSerializer())
+    loan_builder = FastRowBuilder(LoanSerializer(), {"effective_status": "<sql>"})
+    assert book_builder.build(brows) == BookSerializer(books, many=True).data
+    assert loan_builder.build(lrows) == LoanSerializer(loans, many=True).data
+
+    print(f"{args.rows} строк на страницу")
+    for name, objects, rows, serializer, builder in (
+        ("books", books, brows, BookSerializer, book_builder),
+        ("loans", loans, lrows, LoanSerializer, loan_builder),
+    ):
+        slow = bench(
+            f"{name}: serializer",
+            lambda: serializer(objects, many=True).data,
+            args.number,
+        )
+        fast = bench(
+            f"{name}: FastRowBuilder", lambda: builder.build(rows), args.number
+        )
+        print(f"{name}: ускорение x{slow / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Нагрузочный тест входа: N потоков одновременно получают токены.
+Стандартный TokenObtainPairSerializer (authenticate() в потоке запроса)
+против ClaimsTokenObtainPairSerializer (PBKDF2 в ограниченном пуле,
+сверх очереди — сразу 503). Печатает p50/p99 успешных входов и число
+отказов.
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_login_load.py --threads 32 --per-thread 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from rest_framework_simplejwt.serializers import (  # noqa: E402
+    TokenObtainPairSerializer,
+)
+
+from users import hashing  # noqa: E402
+from users.models import User  # noqa: E402
+from users.serializers import ClaimsTokenObtainPairSerializer  # noqa: E402
+
+PASSWORD = "Str0ngPass!"
+
+
+def run(serializer_class, usernames, threads):
+    barrier = threading.Barrier(threads)
+    latencies, rejected = [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        barrier.wait()
+        try:
+            for username in chunk:
+                started = time.perf_counter()
+                try:
+                    serializer_class(
+                        data={"username": username, "password": PASSWORD}
+                    ).is_valid(raise_exception=True)
+                except hashing.HashingPoolBusy:
+                    with lock:
+                        rejected.append(time.perf_counter() - started)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+
+    workers = [
+        threading.Thread(target=worker, args=(usernames[i::threads],))
+        for i in range(threads)
+    ]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - started, latencies, rejected
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        total = args.threads * args.per_thread
+        password = make_password(PASSWORD)
+        usernames = [f"login-{n}" for n in range(total)]
+        User.objects.bulk_create(
+            User(username=username, password=password) for username in usernames
+        )
+        print(
+            f"{total} входов из {args.threads} потоков; пул: "
+            f"{settings.PASSWORD_HASHING_WORKERS} потоков, "
+            f"очередь {settings.PASSWORD_HASHING_QUEUE}"
+        )
+        for label, serializer_class in (
+            ("authenticate()", TokenObtainPairSerializer),
+            ("пул хеширования", ClaimsTokenObtainPairSerializer),
+        ):
+            elapsed, latencies, rejected = run(
+                serializer_class, usernames, args.threads
+            )
+            print(
+                f"{label:<18} p50 {percentile(latencies, 50):7.0f} мс, "
+                f"p99 {percentile(latencies, 99):7.0f} мс, "
+                f"успешно {len(latencies)}, 503: {len(rejected)} "
+                f"(p99 отказа {percentile(rejected, 99):.1f} мс), "
+                f"{len(latencies) / elapsed:.0f} входов/с"
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Бенчмарк рекомендаций на синтетической истории выдач (по умолчанию 1M
+возвращённых выдач, 20k книг, 50k читателей, популярность книг с перекосом):
+- время build_recommendations (пересборка соседей и популярности);
+- «также брали» живым self-join по выдачам против чтения BookNeighbor;
+- стоимость инкрементального обновления пар при возврате.
+
+Создаёт временную тестовую БД (как pytest) и удаляет её после прогона.
+
+    SECRET_KEY=x python benchmarks/bench_recommendations.py --loans 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+
+from library.models import Author, Book, Loan  # noqa: E402
+from library.recommendations import (  # noqa: E402
+    also_borrowed,
+    build_neighbors,
+    build_popularity,
+    record_co_borrows,
+)
+from users.models import User  # noqa: E402
+
+# «также брали» без индекса: пары считаются по выдачам на каждый запрос
+LIVE_ALSO_BORROWED = """
+    SELECT b.book_id, count(DISTINCT a.user_id) AS score
+    FROM library_loan a
+    JOIN library_loan b ON b.user_id = a.user_id AND b.book_id <> a.book_id
+    WHERE a.book_id = %s AND a.returned_at IS NOT NULL AND b.returned_at IS NOT NULL
+    GROUP BY b.book_id
+    ORDER BY score DESC, b.book_id
+    LIMIT %s
+"""
+INDEXED_ALSO_BORROWED = """
+    SELECT neighbor_id, score FROM library_bookneighbor
+    WHERE book_id = %s
+    ORDER BY score DESC, neighbor_id
+    LIMIT %s
+"""
+
+
+def generate(books, users, loans):
+    author = Author.objects.create(first_name="Бенч", last_name="Марк")
+    Book.objects.bulk_create(
+        (
+            Book(
+                title=f"Книга {n}",
+                isbn=f"bench-{n}",
+                published_year=2000,
+                author=author,
+                copies_total=5,
+                copies_available=5,
+            )
+            for n in range(books)
+        ),
+        batch_size=5000,
+    )
+    User.objects.bulk_create(
+        (User(username=f"bench-{n}") for n in range(users)), batch_size=5000
+    )
+    with connection.cursor() as cursor:
+        # random()^3 — небольшая доля книг собирает большую часть выдач
+        cursor.execute(
+            """
+            INSERT INTO library_loan
+                (user_id, book_id, issued_at, due_at, returned_at, status,
+                 created_at, updated_at)
+            SELECT u.lo + floor(random() * u.n)::int,
+                   b.lo + floor(power(random(), 3) * b.n)::int,
+                   t.issued_at, t.issued_at + interval '14 days',
+                   t.issued_at + interval '7 days', 'RETURNED',
+                   t.issued_at, t.issued_at
+            FROM generate_series(1, %s) s
+            CROSS JOIN (SELECT min(id) lo, count(*) n FROM users_user) u
+            CROSS JOIN (SELECT min(id) lo, count(*) n FROM library_book) b
+            CROSS JOIN LATERAL (
+                SELECT now() - interval '2 years' * random() - interval '8 days'
+                    + s * interval '0' AS issued_at
+            ) t
+            """,
+            [loans],
+        )
+        cursor.execute("ANALYZE")
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def latency_ms(fn, samples):
+    times = []
+    for arg in samples:
+        started = time.perf_counter()
+        fn(arg)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        _, elapsed = timed(generate, args.books, args.users, args.loans)
+        print(f"данные: {Loan.objects.count()} выдач за {elapsed:.1f} с")
+
+        pairs, elapsed = timed(build_neighbors)
+        print(f"build_neighbors:  {pairs} пар за {elapsed:.1f} с")
+        books, elapsed = timed(build_popularity)
+        print(f"build_popularity: {books} книг за {elapsed:.1f} с")
+
+        book_ids = list(Book.objects.order_by("pk").values_list("pk", flat=True))
+        rng = random.Random(0)
+        # первые id — самые популярные книги, худший случай для self-join
+        groups = (
+            ("популярные", book_ids[: args.samples]),
+            ("случайные", rng.sample(book_ids, args.samples)),
+        )
+
+        def query(sql):
+            def run(book_id):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [book_id, args.limit])
+                    return cursor.fetchall()
+
+            return run
+
+        for label, fn in (
+            ("живой self-join", query(LIVE_ALSO_BORROWED)),
+            ("BookNeighbor", query(INDEXED_ALSO_BORROWED)),
+            ("also_borrowed()", lambda book_id: also_borrowed(book_id, args.limit)),
+        ):
+            for group, samples in groups:
+                median, worst = latency_ms(fn, samples)
+                print(
+                    f"{label:<16} {group:<10} "
+                    f"медиана {median:8.2f} мс, максимум {worst:8.2f} мс"
+                )
+
+        loans = list(
+            Loan.objects.order_by("?").values_list("pk", "user_id", "book_id")[
+                : args.samples
+            ]
+        )
+
+        def record(loan):
+            loan_id, user_id, book_id = loan
+            with transaction.atomic():
+                record_co_borrows(user_id, {loan_id: book_id})
+                transaction.set_rollback(True)
+
+        median, worst = latency_ms(record, loans)
+        print(
+            f"{'возврат: пары':<27} медиана {median:8.2f} мс, максимум {worst:8.2f} мс"
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
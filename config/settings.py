@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "whitenoise.runserver_nostatic",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "drf_spectacular",
     "users",
@@ -49,7 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise без переходов в поток под ASGI
+    "config.middleware.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -83,6 +85,27 @@ AUTH_USER_MODEL = "users.User"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Соединения с Postgres — из пула psycopg на процесс (DB_POOL): запрос берёт
+# готовое соединение и возвращает его, без подключения и аутентификации
+# на каждый запрос. Без пула — постоянные соединения на поток (CONN_MAX_AGE).
+# Бюджет: WEB_WORKERS процессов × DB_POOL_MAX_SIZE + DB_RESERVED_CONNECTIONS
+# (manage.py, cron, psql) не больше max_connections Postgres
+# (DB_MAX_CONNECTIONS); проверяет library.checks.
+# Без REDIS_URL кэш — память процесса, и процесс должен быть один
+# (версии таблиц, кэш ответов и count, метки реплик — library.E001).
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2" if os.getenv("REDIS_URL") else "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))
+DB_POOL = os.getenv("DB_POOL", "1") == "1"
+# по умолчанию — поровну между процессами в пределах бюджета, не больше 20
+_pool_share = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // WEB_WORKERS
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", str(max(1, min(20, _pool_share)))))
+DB_POOL_MIN_SIZE = min(int(os.getenv("DB_POOL_MIN_SIZE", "2")), DB_POOL_MAX_SIZE)
+# сколько секунд запрос ждёт свободное соединение, если все заняты
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# соединения сверх DB_POOL_MIN_SIZE закрываются после простоя (сек)
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -91,9 +114,45 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "library"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        # с пулом — проверка соединения при выдаче из пула
+        # (ConnectionPool.check_connection), без пула — в начале запроса
+        "CONN_HEALTH_CHECKS": True,
+        # пул сам держит соединения, постоянные соединения Django с ним несовместимы
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("CONN_MAX_AGE", "60")),
+        "OPTIONS": {
+            "pool": (
+                {
+                    "min_size": DB_POOL_MIN_SIZE,
+                    "max_size": DB_POOL_MAX_SIZE,
+                    "timeout": DB_POOL_TIMEOUT,
+                    "max_idle": DB_POOL_MAX_IDLE,
+                }
+                if DB_POOL
+                else False
+            ),
+        },
     }
 }
 
+# Реплики для чтения: хосты через запятую (host или host:port), БД, пользователь
+# и пул — как у default. Безопасные запросы вьюсетов каталога, выдач и
+# пользователей читают с реплик (library.replicas); после выдачи/возврата
+# пользователь REPLICA_PIN_SECONDS читает с основной БД, а каталог — столько же
+# после смены версии таблицы (окно отставания реплики). В тестах реплика —
+# зеркало default (TEST MIRROR).
+_replica_hosts = os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")
+for _n, _host in enumerate(filter(None, map(str.strip, _replica_hosts)), 1):
+    _host, _, _port = _host.partition(":")
+    DATABASES[f"replica_{_n}"] = {
+        **DATABASES["default"],
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["library.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,10 +212,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # orjson; без него оба класса работают как стандартные JSONRenderer/JSONParser
+    "DEFAULT_RENDERER_CLASSES": (
+        "library.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "library.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": [
@@ -169,8 +236,25 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # токены с username/is_staff в claims: пользователь не читается из БД
+    # на каждый запрос (users.authentication.CachedJWTAuthentication)
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.ClaimsTokenRefreshSerializer",
 }
 
+# сколько секунд держать в кэше полного пользователя для аутентификации
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "300"))
+
+# хеширование паролей (регистрация, вход) — в пуле потоков на процесс:
+# одновременно, ждущих в очереди; сверх очереди и дольше таймаута — 503
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv("PASSWORD_HASHING_WORKERS", str(os.cpu_count() or 2))
+)
+PASSWORD_HASHING_QUEUE = int(
+    os.getenv("PASSWORD_HASHING_QUEUE", str(PASSWORD_HASHING_WORKERS * 2))
+)
+PASSWORD_HASHING_TIMEOUT = float(os.getenv("PASSWORD_HASHING_TIMEOUT", "10"))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Library API",
     "DESCRIPTION": "REST API для управления библиотекой: пользователи, авторы, книги и выдачи.",
@@ -193,4 +277,65 @@ SPECTACULAR_SETTINGS = {
 
 LOAN_DEFAULT_DAYS = int(os.getenv("LOAN_DEFAULT_DAYS", "14"))
 
+# через сколько дней после возврата выдача уходит в архив (archive_loans)
+LOAN_ARCHIVE_AFTER_DAYS = int(os.getenv("LOAN_ARCHIVE_AFTER_DAYS", "365"))
+
 ALLOW_SELF_ISSUE = os.getenv("ALLOW_SELF_ISSUE", "1") == "1"
+
+# чтение каталога, выдач и /api/users/me/ — async-представлениями (ASGI,
+# library.asyncviews); config/wsgi.py выключает их для WSGI-сервера
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "1") == "1"
+
+# до скольких строк (по оценке планировщика) count в пагинации считается точно
+COUNT_EXACT_THRESHOLD = int(os.getenv("COUNT_EXACT_THRESHOLD", "10000"))
+# сколько секунд кэшировать count для одной и той же выборки
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))
+
+# Кэш: без REDIS_URL — память процесса (dev/тесты), с REDIS_URL — общий Redis.
+# "responses" — кэш ответов каталога; объём ограничивается числом записей
+# (locmem) или maxmemory + allkeys-lru на стороне Redis.
+REDIS_URL = os.getenv("REDIS_URL", "")
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+# ответы больше этого размера (байт, pickle) не кэшируются
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(256 * 1024))
+)
+
+# выгрузка (/export/, export_library): строк на одну выборку серверного курсора
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+# импорт каталога (import_books, POST /api/books/import/): записей на порцию
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# статистика (/api/stats/): на сколько строк разложен каждый горячий счётчик
+STATS_COUNTER_STRIPES = int(os.getenv("STATS_COUNTER_STRIPES", "8"))
+# рекомендации (build_recommendations): соседей на книгу, последних книг
+# читателя в расчёте пар, окно популярности (дней)
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "20"))
+RECOMMENDATIONS_USER_HISTORY = int(os.getenv("RECOMMENDATIONS_USER_HISTORY", "100"))
+POPULAR_WINDOW_DAYS = int(os.getenv("POPULAR_WINDOW_DAYS", "30"))
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "responses": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "responses",
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "responses": {
+            "BACKEND": "library.cache_backends.CountingLocMemCache",
+            "LOCATION": "responses",
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+            "OPTIONS": {"MAX_ENTRIES": RESPONSE_CACHE_MAX_ENTRIES},
+        },
+    }
@@ -32,3 +32,11 @@ def test_schema_has_main_endpoints():
     assert "/api/authors/" in paths
     assert "/api/loans/issue/" in paths
     assert "/api/loans/return/" in paths
+
+
+def test_schema_documents_sparse_fieldsets():
+    r = APIClient().get(reverse("schema"), {"format": "json"})
+    data = json.loads(r.content)
+    params = data["paths"]["/api/books/"]["get"]["parameters"]
+    fields = next(p for p in params if p["name"] == "fields")
+    assert "title" in fields["schema"]["items"]["enum"]
@@ -9,7 +9,7 @@ from drf_spectacular.views import (
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from library.views import AuthorViewSet, BookViewSet, LoanViewSet
+from library.views import AuthorViewSet, BookViewSet, LoanViewSet, StatsView
 from users.views import RegisterView, UserViewSet
 
 router = DefaultRouter()
@@ -19,7 +19,7 @@ router.register(r"books", BookViewSet, basename="books")
 router.register(r"loans", LoanViewSet, basename="loans")
 
 
-def health(_):
+async def health(_):
     return JsonResponse({"status": "ok"})
 
 
@@ -40,6 +40,7 @@ urlpatterns = [
     path("api/auth/register", RegisterView.as_view(), name="register"),
     path("api/auth/token", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/refresh", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/stats/", StatsView.as_view(), name="stats"),
     # users
     path("api/", include(router.urls)),
 ]
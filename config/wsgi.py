@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# под WSGI async-представления исполнялись бы через async_to_sync (свой
+# цикл событий на каждый запрос) — здесь чтение идёт синхронным путём
+os.environ.setdefault("ASYNC_READ_VIEWS", "0")
 
 application = get_wsgi_application()
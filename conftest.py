@@ -0,0 +1,39 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """
+    Реплика "replica" — зеркало default (TEST MIRROR): тесты маршрутизации
+    включают её через settings.DATABASE_REPLICAS, остальным она не видна.
+    """
+    from django.conf import settings
+    from django.db import connections
+
+    replica = {**settings.DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    settings.DATABASES.setdefault("replica", replica)
+    # подключения уже прочитали DATABASES
+    databases = connections.configure_settings(
+        {**connections.settings, "replica": replica}
+    )
+    connections.settings.setdefault("replica", databases["replica"])
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    yield
+    # пул зеркала держит соединения с тестовой БД и мешает её удалить
+    from django.db import connections
+
+    with django_db_blocker.unblock():
+        connections["replica"].close_pool()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Author, Book, Loan
+from .models import Author, Book, Hold, Loan, LoanArchive
+from .services import allocate_holds, bump_loan_version
+from .stats import StatDeltas, add_stats
 
 
 @admin.register(Author)
@@ -26,6 +28,16 @@ class BookAdmin(admin.ModelAdmin):
     list_filter = ("genre", "published_year")
     autocomplete_fields = ("author",)
 
+    def save_model(self, request, obj, form, change):
+        # статистику правки (signals.update_book_stats) и выдач по очереди —
+        # одним add_stats в конце транзакции (changeform_view — в транзакции)
+        obj._stat_deltas = deltas = StatDeltas()
+        super().save_model(request, obj, form, change)
+        # добавленные копии сразу уходят ожидающим, как при возврате
+        if change and {"copies_total", "copies_available"} & set(form.changed_data):
+            allocate_holds(obj.pk, obj.copies_available, deltas=deltas)
+        add_stats(deltas)
+
 
 @admin.register(Loan)
 class LoanAdmin(admin.ModelAdmin):
@@ -33,3 +45,37 @@ class LoanAdmin(admin.ModelAdmin):
     list_filter = ("status", "due_at", "returned_at")
     search_fields = ("user__username", "book__title", "book__isbn")
     autocomplete_fields = ("user", "book")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_loan_version()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_loan_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_loan_version()
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("user", "book", "status", "created_at", "loan")
+    list_filter = ("status",)
+    search_fields = ("user__username", "book__title", "book__isbn")
+    raw_id_fields = ("user", "book", "loan")
+
+
+@admin.register(LoanArchive)
+class LoanArchiveAdmin(admin.ModelAdmin):
+    list_display = ("user", "book", "issued_at", "returned_at", "archived_at")
+    list_filter = ("returned_at",)
+    search_fields = ("user__username", "book__title", "book__isbn")
+    raw_id_fields = ("user", "book")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
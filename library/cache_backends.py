@@ -0,0 +1,14 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from .cache_stats import record
+
+
+class CountingLocMemCache(LocMemCache):
+    """LocMemCache, который считает вытеснения по MAX_ENTRIES (метрика `evictions`)."""
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        evicted = before - len(self._cache)
+        if evicted:
+            record("evictions", evicted)
@@ -0,0 +1,48 @@
+from django.core.cache import cache, caches
+
+METRICS = ("hits", "misses", "stores", "skipped", "evictions")
+
+
+def _key(metric):
+    return f"library:response_cache:{metric}"
+
+
+def record(metric, amount=1):
+    """Счётчик в общем (default) кэше — виден всем процессам."""
+    key = _key(metric)
+    if not cache.add(key, amount, None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:  # ключ успели вытеснить между add и incr
+            cache.set(key, amount, None)
+
+
+async def arecord(metric, amount=1):
+    """record для async-кода."""
+    key = _key(metric)
+    if not await cache.aadd(key, amount, None):
+        try:
+            await cache.aincr(key, amount)
+        except ValueError:
+            await cache.aset(key, amount, None)
+
+
+def response_cache_stats() -> dict:
+    values = cache.get_many([_key(metric) for metric in METRICS])
+    stats = {metric: values.get(_key(metric), 0) for metric in METRICS}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["redis_evicted_keys"] = _redis_evicted_keys()
+    return stats
+
+
+def _redis_evicted_keys():
+    # в Redis вытесняет сам сервер (maxmemory) — берём его счётчик
+    backend = caches["responses"]
+    if not hasattr(backend, "_cache") or not hasattr(backend._cache, "get_client"):
+        return None
+    return backend._cache.get_client().info("stats").get("evicted_keys")
+
+
+def reset_response_cache_stats():
+    cache.delete_many([_key(metric) for metric in METRICS])
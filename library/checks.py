@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def check_db_connection_budget(app_configs, **kwargs):
+    """
+    Пулы всех процессов вместе с резервом должны помещаться в max_connections
+    Postgres: иначе под нагрузкой новые соединения получают
+    "too many clients already", а не ждут свободного в пуле.
+    """
+    if not settings.DB_POOL:
+        return []
+    needed = (
+        settings.WEB_WORKERS * settings.DB_POOL_MAX_SIZE
+        + settings.DB_RESERVED_CONNECTIONS
+    )
+    if needed <= settings.DB_MAX_CONNECTIONS:
+        return []
+    return [
+        Warning(
+            f"Пулы соединений могут открыть {needed} соединений "
+            f"(WEB_WORKERS={settings.WEB_WORKERS} × "
+            f"DB_POOL_MAX_SIZE={settings.DB_POOL_MAX_SIZE} + "
+            f"DB_RESERVED_CONNECTIONS={settings.DB_RESERVED_CONNECTIONS}), "
+            f"а DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS}.",
+            hint="Уменьшите DB_POOL_MAX_SIZE или WEB_WORKERS либо увеличьте "
+            "max_connections Postgres и DB_MAX_CONNECTIONS.",
+            id="library.W001",
+        )
+    ]
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Версии таблиц (ETag, ключи кэша ответов и count) и метки
+    pin_to_primary живут в кэше `default`. LocMemCache у каждого процесса
+    свой: запись в одном воркере не видят другие, и они отдают 304 и
+    закэшированные ответы на старые данные бесконечно.
+    """
+    if settings.WEB_WORKERS <= 1 or not isinstance(caches["default"], LocMemCache):
+        return []
+    return [
+        Error(
+            f"WEB_WORKERS={settings.WEB_WORKERS}, а кэш default — память "
+            "процесса (LocMemCache): версии таблиц, кэш ответов и метки "
+            "чтения с основной БД не общие для воркеров.",
+            hint="Укажите REDIS_URL (общий Redis) или WEB_WORKERS=1. Команды "
+            "manage.py (import_books и др.) тоже должны видеть этот кэш.",
+            id="library.E001",
+        )
+    ]
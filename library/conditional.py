@@ -0,0 +1,155 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .replicas import version_reads
+from .versions import atable_version, table_version, version_datetime
+
+
+def normalized_query(request) -> str:
+    """
+    Query string без пустых значений и с отсортированными параметрами:
+    `?b=1&a=2&c=` == `?a=2&b=1`.
+    """
+    params = request.query_params
+    return urlencode(
+        sorted(
+            (key, value)
+            for key in params
+            for value in params.getlist(key)
+            if value.strip()
+        )
+    )
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified и 304 для list и retrieve.
+
+    - list: версия таблицы из кэша (versions.table_version) — 304 без запросов к БД;
+    - retrieve: `updated_at` строки — один запрос по первичному ключу.
+
+    ETag учитывает query string (фильтры, страница, `?fields=`) и формат ответа.
+    Список под недавно сменённой версией читается с основной БД
+    (replicas.version_reads): отставшая реплика отдала бы старые данные под
+    новым ETag. ETag карточки — из `updated_at`, прочитанного вместе с ней.
+    """
+
+    def list(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        version = table_version(model)
+        with version_reads(version):
+            return self.conditional_response(
+                request,
+                f"{model._meta.label_lower}:{version}",
+                version_datetime(version),
+                super().list,
+                *args,
+                **kwargs,
+            )
+
+    async def alist(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        version = await atable_version(model)
+        with version_reads(version):
+            return await self.aconditional_response(
+                request,
+                f"{model._meta.label_lower}:{version}",
+                version_datetime(version),
+                super().alist,
+                *args,
+                **kwargs,
+            )
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = self.row_updated_at(kwargs)
+        if updated_at is None:
+            # нет такой строки — пусть ответит обычный retrieve (404)
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request,
+            self.row_version(kwargs, updated_at),
+            updated_at,
+            super().retrieve,
+            *args,
+            **kwargs,
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        updated_at = await self.arow_updated_at(kwargs)
+        if updated_at is None:
+            return await super().aretrieve(request, *args, **kwargs)
+        return await self.aconditional_response(
+            request,
+            self.row_version(kwargs, updated_at),
+            updated_at,
+            super().aretrieve,
+            *args,
+            **kwargs,
+        )
+
+    def updated_at_queryset(self, kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return (
+            self.get_queryset()
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .values_list("updated_at", flat=True)
+        )
+
+    def row_updated_at(self, kwargs):
+        try:
+            return self.updated_at_queryset(kwargs).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    async def arow_updated_at(self, kwargs):
+        try:
+            return await self.updated_at_queryset(kwargs).afirst()
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def row_version(self, kwargs, updated_at):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return f"{kwargs[lookup_url_kwarg]}:{updated_at.isoformat()}"
+
+    def conditional_response(
+        self, request, version, last_modified, handler, *args, **kwargs
+    ):
+        etag, last_modified = self.validators(request, version, last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self.patch_validators(response, etag, last_modified)
+
+    async def aconditional_response(
+        self, request, version, last_modified, handler, *args, **kwargs
+    ):
+        etag, last_modified = self.validators(request, version, last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+        return self.patch_validators(response, etag, last_modified)
+
+    @staticmethod
+    def validators(request, version, last_modified):
+        source = (
+            f"{version}:{request.accepted_renderer.format}:{normalized_query(request)}"
+        )
+        etag = f'"{hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()}"'
+        return etag, int(last_modified.timestamp())
+
+    @staticmethod
+    def patch_validators(response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            # клиент каждый раз переспрашивает сервер (copies_available меняется)
+            patch_cache_control(response, no_cache=True)
+        return response
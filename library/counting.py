@@ -0,0 +1,116 @@
+import hashlib
+import json
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .versions import atable_version, table_version
+
+
+@dataclass(frozen=True)
+class CountResult:
+    value: int
+    exact: bool
+
+
+def table_row_estimate(model, using="default") -> int | None:
+    """Оценка числа строк таблицы из статистики планировщика (pg_class.reltuples)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            # только таблицы: у VIEW (LoanHistory) reltuples всегда 0
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE oid = %s::regclass AND relkind IN ('r', 'p')",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # -1: таблицу ещё ни разу не анализировали
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def plan_row_estimate(queryset) -> int | None:
+    """Оценка числа строк выборки по EXPLAIN, без выполнения запроса."""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def estimate_count(queryset) -> int | None:
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    query = queryset.query
+    if query.distinct or query.is_sliced or query.combinator:
+        return None
+    if not query.where:
+        estimate = table_row_estimate(queryset.model, queryset.db)
+        if estimate is not None:
+            return estimate
+    return plan_row_estimate(queryset)
+
+
+def count_cache_key(queryset, version) -> str:
+    # Ключ — нормализованный SQL: туда попадают фильтры, поиск и ограничения
+    # по пользователю, но не сортировка и не номер страницы. Версия таблицы —
+    # чтобы после записи (импорт, правка в админке) не отдавать старый count.
+    # Список столбцов на count не влияет (если нет DISTINCT и GROUP BY) и в
+    # ключ не идёт: аннотации списка с параметром «сейчас» (effective_status
+    # займов) давали бы новый ключ на каждый запрос.
+    query = queryset.query
+    if not query.distinct and query.group_by is None:
+        queryset = queryset.values("pk")
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(
+        f"{queryset.db}:{version}:{sql}:{params!r}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"library:count:{digest}"
+
+
+def count_queryset(queryset) -> CountResult:
+    """
+    Количество строк для пагинации:
+    - маленькие выборки считаются точно (COUNT(*));
+    - большие и нефильтрованные — оценка планировщика;
+    - результат кэшируется на COUNT_CACHE_TTL секунд.
+    """
+    queryset = queryset.order_by()
+    key = count_cache_key(queryset, table_version(queryset.model))
+    cached = cache.get(key)
+    if cached is not None:
+        return CountResult(*cached)
+    return _count_and_store(queryset, key)
+
+
+async def acount_queryset(queryset) -> CountResult:
+    """
+    count_queryset для async-кода. Оценка идёт сырым SQL (EXPLAIN,
+    pg_class), у которого нет async API, поэтому промах кэша — один
+    переход в поток на оценку и COUNT(*) вместе, а не по переходу на каждый.
+    """
+    queryset = queryset.order_by()
+    key = count_cache_key(queryset, await atable_version(queryset.model))
+    cached = await cache.aget(key)
+    if cached is not None:
+        return CountResult(*cached)
+    return await sync_to_async(_count_and_store)(queryset, key)
+
+
+def _count_and_store(queryset, key):
+    estimate = estimate_count(queryset)
+    if estimate is None or estimate < settings.COUNT_EXACT_THRESHOLD:
+        result = CountResult(queryset.count(), exact=True)
+    else:
+        result = CountResult(estimate, exact=False)
+
+    cache.set(key, (result.value, result.exact), settings.COUNT_CACHE_TTL)
+    return result
@@ -0,0 +1,162 @@
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, QueryDict, StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework import permissions, serializers
+from rest_framework.decorators import action
+from rest_framework.request import Request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+EXPORT_FORMAT_PARAM = "export_format"
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+# сколько строк склеивать в один кусок ответа
+ROWS_PER_CHUNK = 500
+
+
+def _dumps(item):
+    if orjson is not None:
+        return orjson.dumps(item)
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def ndjson_chunks(items, rows_per_chunk=ROWS_PER_CHUNK):
+    lines = []
+    for item in items:
+        lines.append(_dumps(item))
+        if len(lines) == rows_per_chunk:
+            yield b"\n".join(lines) + b"\n"
+            lines.clear()
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def csv_chunks(names, items, rows_per_chunk=ROWS_PER_CHUNK):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, item in enumerate(items, 1):
+        writer.writerow(["" if value is None else value for value in item.values()])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def aiter_chunks(chunks):
+    """
+    Куски синхронного генератора для ASGI: каждый следующий — в потоке.
+    Синхронный итератор ASGIHandler собрал бы целиком в список
+    (StreamingHttpResponse.__aiter__) — вся выгрузка оказалась бы в памяти.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # клиент мог отключиться на середине: закрываем серверный курсор
+        await sync_to_async(chunks.close)()
+
+
+class ExportMixin:
+    """
+    GET <list>/export/?export_format=csv|ndjson — вся выборка одним потоком.
+
+    Те же фильтры, поиск, сортировка и `?fields=`, что у list, но без
+    пагинации: строки читаются серверным курсором (`.iterator(chunk_size)`)
+    и собираются FastRowBuilder'ом, так что память не зависит от объёма.
+    Под ASGI куски отдаются async-итератором (aiter_chunks).
+    Только для staff. Нужен FastListMixin (get_fast_row_builder).
+    """
+
+    export_chunk_size = None
+
+    def get_permissions(self):
+        if self.action == "export":
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def get_export_format(self):
+        export_format = self.request.query_params.get(EXPORT_FORMAT_PARAM, "csv")
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise serializers.ValidationError(
+                {
+                    EXPORT_FORMAT_PARAM: "Допустимые форматы: "
+                    + ", ".join(EXPORT_CONTENT_TYPES)
+                }
+            )
+        return export_format
+
+    def export_chunks(self, export_format):
+        """Куски (bytes) выгрузки текущего запроса."""
+        builder = self.get_fast_row_builder()
+        queryset = builder.queryset(self.filter_queryset(self.get_queryset()))
+        rows = queryset.iterator(
+            chunk_size=self.export_chunk_size or settings.EXPORT_CHUNK_SIZE
+        )
+        items = builder.iter_build(rows)
+        if export_format == "csv":
+            return csv_chunks(builder.names, items)
+        return ndjson_chunks(items)
+
+    @extend_schema(
+        summary="Выгрузка CSV / NDJSON",
+        filters=True,
+        parameters=[
+            OpenApiParameter(
+                EXPORT_FORMAT_PARAM,
+                OpenApiTypes.STR,
+                enum=list(EXPORT_CONTENT_TYPES),
+                default="csv",
+            )
+        ],
+        responses={
+            (200, content_type.split(";")[0]): OpenApiResponse(OpenApiTypes.BINARY)
+            for content_type in EXPORT_CONTENT_TYPES.values()
+        },
+    )
+    @action(detail=False, methods=["get"], url_path="export", pagination_class=None)
+    def export(self, request, *args, **kwargs):
+        export_format = self.get_export_format()
+        chunks = self.export_chunks(export_format)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.basename}.{export_format}"'
+        )
+        return response
+
+
+def export_view(viewset_class, user, params=None):
+    """
+    Экземпляр вьюсета для выгрузки вне HTTP (manage.py export_library):
+    GET-запрос с параметрами `params` от имени `user`.
+    """
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.GET = QueryDict(mutable=True)
+    for key, value in params or ():
+        http_request.GET.appendlist(key, value)
+    request = Request(http_request)
+    request.user = user
+    return viewset_class(
+        request=request, action="export", args=(), kwargs={}, format_kwarg=None
+    )
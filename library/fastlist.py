@@ -0,0 +1,115 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Поля, чьё to_representation для значения из БД ничего не меняет
+# (str(str), int(int), pk связи уже лежит в `<fk>_id`)
+_IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _converter(field):
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+class FastRowBuilder:
+    """
+    Собирает ответ сериализатора из строк `.values()` без создания моделей и
+    экземпляров сериализатора на каждую строку. Вывод совпадает с
+    `serializer_class(many=True).data` побайтно (см. контрактный тест).
+
+    `annotations` — выражения для полей, которых нет в модели
+    (например, effective_status): {имя поля: выражение}.
+    """
+
+    def __init__(self, serializer, annotations=None):
+        annotations = annotations or {}
+        self.annotations = {}
+        self.paths = []
+        self.columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in annotations:
+                key = f"_fast_{name}"
+                self.annotations[key] = annotations[name]
+                self.columns.append((name, key, None))
+            elif field.source == "*":
+                raise TypeError(f"Поле {name} нельзя собрать из .values()")
+            else:
+                key = field.source.replace(".", "__")
+                self.paths.append(key)
+                self.columns.append((name, key, _converter(field)))
+
+    def queryset(self, queryset):
+        # ключи сортировки нужны keyset-пагинации для курсора
+        ordering = [
+            field.lstrip("-")
+            for field in queryset.query.order_by
+            if isinstance(field, str)
+        ]
+        names = dict.fromkeys([*self.paths, *ordering, "id"])
+        return queryset.annotate(**self.annotations).values(*names, *self.annotations)
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.columns]
+
+    def build(self, rows):
+        return list(self.iter_build(rows))
+
+    def iter_build(self, rows):
+        """То же, что build, но лениво — для потоковой выгрузки."""
+        columns = self.columns
+        for row in rows:
+            item = {}
+            for name, key, convert in columns:
+                value = row[key]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            yield item
+
+
+class FastListMixin:
+    """
+    list() через FastRowBuilder: фильтры, пагинация и `?fields=` работают
+    как обычно, но ответ собирается из `.values()`.
+    `fast_list = False` возвращает стандартный путь через сериализатор.
+    """
+
+    fast_list = True
+
+    def get_fast_list_annotations(self):
+        return {}
+
+    def get_fast_row_builder(self):
+        return FastRowBuilder(self.get_serializer(), self.get_fast_list_annotations())
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+
+        builder = self.get_fast_row_builder()
+        queryset = builder.queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page))
+        return Response(builder.build(queryset))
+
+    async def alist(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return await super().alist(request, *args, **kwargs)
+
+        builder = self.get_fast_row_builder()
+        queryset = builder.queryset(self.filter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page))
+        return Response(builder.build([row async for row in queryset]))
@@ -0,0 +1,111 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def _split(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def sparse_fieldset_parameters(serializer_class):
+    """OpenAPI-описание `?fields=` / `?exclude=` для данного сериализатора."""
+    names = list(serializer_class().fields)
+    return [
+        OpenApiParameter(
+            name,
+            OpenApiTypes.STR,
+            many=True,
+            explode=False,
+            enum=names,
+            description=description,
+        )
+        for name, description in (
+            (FIELDS_PARAM, "Вернуть только перечисленные поля (через запятую)."),
+            (EXCLUDE_PARAM, "Не возвращать перечисленные поля (через запятую)."),
+        )
+    ]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Оставляет в сериализаторе только поля из context["sparse_fields"].
+
+    `Meta.field_sources` — от каких атрибутов модели зависит поле, если это
+    не видно из `source` (SerializerMethodField и т.п.).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = self.context.get("sparse_fields")
+        if keep is not None:
+            for name in set(self.fields) - set(keep):
+                self.fields.pop(name)
+
+    @classmethod
+    def model_sources(cls, field_names):
+        """Пути модели (`user__username`) для only()/select_related."""
+        declared = getattr(cls.Meta, "field_sources", {})
+        fields = cls().fields
+        sources = []
+        for name in field_names:
+            if name in declared:
+                sources.extend(declared[name])
+            elif fields[name].source != "*":
+                sources.append(fields[name].source.replace(".", "__"))
+        return sources
+
+
+class SparseFieldsetViewMixin:
+    """
+    `?fields=a,b` / `?exclude=c` для GET: урезает ответ и загружает из БД
+    только нужные столбцы (only() + select_related только нужных связей).
+    """
+
+    def get_sparse_fields(self):
+        if getattr(self, "_sparse_fields", False) is not False:
+            return self._sparse_fields
+        self._sparse_fields = None
+
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        if FIELDS_PARAM not in params and EXCLUDE_PARAM not in params:
+            return None
+
+        available = list(self.get_serializer_class()().fields)
+        requested = _split(params.get(FIELDS_PARAM, "")) or available
+        excluded = _split(params.get(EXCLUDE_PARAM, ""))
+        unknown = sorted(set(requested + excluded) - set(available))
+        if unknown:
+            raise serializers.ValidationError(
+                {FIELDS_PARAM: f"Неизвестные поля: {', '.join(unknown)}"}
+            )
+        self._sparse_fields = [
+            name for name in available if name in requested and name not in excluded
+        ]
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["sparse_fields"] = self.get_sparse_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        # filter_queryset, а не get_queryset: его вызывают и list, и
+        # get_object, даже если вьюсет переопределяет get_queryset
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+
+        sources = self.get_serializer_class().model_sources(fields)
+        relations = {path.rsplit("__", 1)[0] for path in sources if "__" in path}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only("pk", *sources)
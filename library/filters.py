@@ -1,11 +1,56 @@
 import django_filters as df
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest
+from rest_framework.filters import SearchFilter
 
-from .models import Author, Book
+from .models import Author, Book, Loan, LoanHistory, author_full_name
+from .search import SEARCH_CONFIG, weighted_search_query
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    `?search=` по сохранённому `search_vector` (GIN) плюс триграммное
+    сходство по `view.search_trigram_fields` для опечаток.
+    Без `?ordering=` результаты сортируются по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch", config=SEARCH_CONFIG)
+        condition = Q(search_vector=query)
+        similarities = []
+        for field in getattr(view, "search_trigram_fields", ()):
+            condition |= Q(**{f"{field}__trigram_word_similar": terms})
+            similarities.append(TrigramWordSimilarity(terms, field))
+
+        rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+        if len(similarities) > 1:
+            rank += Cast(Greatest(*similarities), FloatField())
+        elif similarities:
+            rank += Cast(similarities[0], FloatField())
+
+        return (
+            queryset.filter(condition)
+            .annotate(search_rank=rank)
+            .order_by("-search_rank", "pk")
+        )
 
 
 class AuthorFilter(df.FilterSet):
-    first_name = df.CharFilter(field_name="first_name", lookup_expr="icontains")
-    last_name = df.CharFilter(field_name="last_name", lookup_expr="icontains")
+    first_name = df.CharFilter(
+        field_name="first_name", lookup_expr="trigram_word_similar"
+    )
+    last_name = df.CharFilter(
+        field_name="last_name", lookup_expr="trigram_word_similar"
+    )
 
     class Meta:
         model = Author
@@ -13,8 +58,8 @@ class AuthorFilter(df.FilterSet):
 
 
 class BookFilter(df.FilterSet):
-    title = df.CharFilter(field_name="title", lookup_expr="icontains")
-    description = df.CharFilter(field_name="description", lookup_expr="icontains")
+    title = df.CharFilter(field_name="title", lookup_expr="trigram_word_similar")
+    description = df.CharFilter(method="filter_description")
     author = df.NumberFilter(field_name="author_id")
     author_name = df.CharFilter(method="filter_author_name")
     genre = df.CharFilter(field_name="genre", lookup_expr="iexact")
@@ -27,7 +72,39 @@ class BookFilter(df.FilterSet):
         model = Book
         fields = ["title", "author", "genre", "published_year", "isbn"]
 
+    def filter_description(self, queryset, name, value):
+        # описание лежит в search_vector с весом C
+        query = weighted_search_query(value, "C")
+        if query is None:
+            return queryset
+        return queryset.filter(search_vector=query)
+
     def filter_author_name(self, queryset, name, value):
-        return queryset.filter(author__first_name__icontains=value) | queryset.filter(
-            author__last_name__icontains=value
+        # один LIKE по выражению "фамилия имя" из author_full_name_trgm_idx:
+        # "Брэд" — префикс/подстрока, "Bradbury Ray" — полное имя
+        value = " ".join(value.split()).lower()
+        return queryset.alias(author_full_name=author_full_name("author__")).filter(
+            author_full_name__contains=value
         )
+
+
+class LoanFilter(df.FilterSet):
+    # записанный статус: OVERDUE ставит mark_overdue_loans (частичный
+    # loan_overdue_issued_idx); effective_status — только для показа
+    status = df.ChoiceFilter(choices=Loan.Status.choices, label="Статус")
+    active = df.BooleanFilter(
+        field_name="returned_at",
+        lookup_expr="isnull",
+        label="true — на руках, false — возвращённые",
+    )
+
+    class Meta:
+        model = Loan
+        fields = ["status", "active"]
+
+
+class LoanHistoryFilter(LoanFilter):
+    """Те же фильтры для ?include_archived=1 (выборка из LoanHistory)."""
+
+    class Meta(LoanFilter.Meta):
+        model = LoanHistory
@@ -0,0 +1,315 @@
+import csv
+import io
+import json
+import re
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from .models import Author, Book
+from .search import refresh_author_search_vectors, refresh_book_search_vectors
+from .serializers import BookImportRowSerializer
+from .services import allocate_holds
+from .stats import StatDeltas, add_stats
+from .versions import bump_table_version
+
+IMPORT_FORMATS = ("csv", "ndjson", "json")
+
+# поля Book, которые импорт перезаписывает у существующей книги (по isbn)
+BOOK_UPDATE_FIELDS = (
+    "title",
+    "description",
+    "genre",
+    "published_year",
+    "author",
+    "author_display_name",
+    "copies_total",
+    "copies_available",
+    "updated_at",
+)
+
+_JSON_SKIP = re.compile(r"[\s,]*")
+
+
+class ImportFileError(ValueError):
+    """Файл нельзя разобрать дальше (битый JSON-массив и т.п.)."""
+
+
+@dataclass
+class ImportReport:
+    dry_run: bool = False
+    created: int = 0
+    updated: int = 0
+    authors_created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    # не больше max_errors записей; failed — полное число
+    errors: list = field(default_factory=list)
+    max_errors: int | None = None
+
+    def add_error(self, row, isbn, errors):
+        self.failed += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "isbn": isbn, "errors": errors})
+
+
+def import_format(name):
+    """Формат по расширению имени файла (`books.ndjson` -> "ndjson")."""
+    suffix = name.rsplit(".", 1)[-1].lower()
+    if suffix == "jsonl":
+        return "ndjson"
+    return suffix if suffix in IMPORT_FORMATS else None
+
+
+def _iter_json_array(text, read_size=1 << 16):
+    """Элементы JSON-массива верхнего уровня по одному, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    while True:
+        chunk = text.read(read_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            pos = _JSON_SKIP.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ImportFileError("Ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if not chunk:
+                    raise ImportFileError(f"Некорректный JSON: {e}") from None
+                break  # элемент не дочитан
+            yield item
+        if not chunk:
+            raise ImportFileError("JSON-массив не закрыт")
+
+
+def iter_records(stream, file_format):
+    """
+    (номер записи, dict | None) из бинарного потока; None — запись не
+    разобралась (битая строка NDJSON). Файл читается потоково.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(text), 1):
+                # пустая ячейка = поле не задано (значение по умолчанию)
+                yield number, {k: v for k, v in row.items() if k and v != ""}
+        elif file_format == "ndjson":
+            number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                yield number, record if isinstance(record, dict) else None
+        elif file_format == "json":
+            for number, record in enumerate(_iter_json_array(text), 1):
+                yield number, record if isinstance(record, dict) else None
+        else:
+            raise ImportFileError(f"Неизвестный формат: {file_format}")
+    finally:
+        text.detach()
+
+
+class BookImporter:
+    """
+    Загрузка каталога порциями по `batch_size` записей:
+    - каждая запись проверяется BookImportRowSerializer (ошибки — в отчёт);
+    - авторы ищутся по (фамилия, имя) через словарь в памяти, недостающие
+      создаются одним bulk_create на порцию;
+    - книги вставляются/обновляются по isbn одним
+      `bulk_create(update_conflicts=True)` на порцию.
+
+    У существующей книги copies_available сдвигается на разницу copies_total,
+    так что число выданных копий сохраняется (copies_available <= copies_total);
+    copies_total меньше числа выданных копий — ошибка записи.
+    dry_run — всё то же в транзакции, которая в конце откатывается.
+    """
+
+    def __init__(self, *, batch_size=None, dry_run=False, max_errors=None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.dry_run = dry_run
+        self.report = ImportReport(dry_run=dry_run, max_errors=max_errors)
+        self.authors = {}  # (last_name, first_name) -> id
+        self.row_serializer = BookImportRowSerializer()
+
+    def run(self, records):
+        # dry_run: одна внешняя транзакция, чтобы созданные «на время» авторы
+        # находились следующими порциями, а в конце — откат всего
+        with transaction.atomic() if self.dry_run else nullcontext():
+            batch = []
+            for number, record in records:
+                row = self.validate(number, record)
+                if row is not None:
+                    batch.append((number, row))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.report
+
+    def validate(self, number, record):
+        if record is None:
+            self.report.add_error(
+                number, None, {"non_field_errors": ["Не JSON-объект"]}
+            )
+            return None
+        try:
+            # один экземпляр на весь файл: run_validation не хранит состояние
+            return self.row_serializer.run_validation(record)
+        except serializers.ValidationError as e:
+            isbn = record.get("isbn")
+            self.report.add_error(
+                number, isbn if isinstance(isbn, str) else None, e.detail
+            )
+            return None
+
+    def import_batch(self, batch):
+        # внутри порции isbn уникален: ON CONFLICT не обновляет строку дважды
+        rows = {}
+        for number, row in batch:
+            if row["isbn"] in rows:
+                self.report.duplicates += 1
+            rows[row["isbn"]] = (number, row)
+        # при ошибке порция откатывается целиком — вместе с созданными авторами
+        authors, authors_created = dict(self.authors), self.report.authors_created
+        try:
+            with transaction.atomic():
+                created, updated, errors = self.write_books(list(rows.values()))
+        except DatabaseError as e:
+            self.authors, self.report.authors_created = authors, authors_created
+            for number, row in rows.values():
+                self.report.add_error(
+                    number, row["isbn"], {"non_field_errors": [str(e)]}
+                )
+            return
+        self.report.created += created
+        self.report.updated += updated
+        for error in errors:
+            self.report.add_error(*error)
+        if not self.dry_run and (created or updated):
+            bump_table_version(Book, Author)
+
+    def resolve_authors(self, rows):
+        names = {(row["author_last_name"], row["author_first_name"]) for _, row in rows}
+        missing = names - self.authors.keys()
+        if not missing:
+            return
+        found = (
+            Author.objects.filter(
+                last_name__in={last for last, _ in missing},
+                first_name__in={first for _, first in missing},
+            )
+            .order_by("pk")
+            .values_list("last_name", "first_name", "pk")
+        )
+        for last, first, pk in found:
+            if (last, first) in missing:
+                self.authors.setdefault((last, first), pk)
+        missing -= self.authors.keys()
+        if not missing:
+            return
+        created = Author.objects.bulk_create(
+            Author(last_name=last, first_name=first) for last, first in sorted(missing)
+        )
+        refresh_author_search_vectors(
+            Author.objects.filter(pk__in=[author.pk for author in created])
+        )
+        for author in created:
+            self.authors[(author.last_name, author.first_name)] = author.pk
+        self.report.authors_created += len(created)
+
+    def write_books(self, rows):
+        """Одна порция; возвращает (создано, обновлено, ошибки записей)."""
+        self.resolve_authors(rows)
+        existing = Book.objects.filter(isbn__in=[row["isbn"] for _, row in rows])
+        if not self.dry_run:
+            # выдача/возврат не сдвинут copies_available между чтением и записью
+            existing = existing.select_for_update()
+        existing = {
+            isbn: (genre, total, available)
+            for isbn, genre, total, available in existing.order_by("pk").values_list(
+                "isbn", "genre", "copies_total", "copies_available"
+            )
+        }
+
+        books, created, updated, errors = [], 0, 0, []
+        # существующие книги, у которых прибавились свободные копии
+        raised = set()
+        deltas = StatDeltas()
+        for number, row in rows:
+            total = row["copies_total"]
+            available = total
+            if row["isbn"] in existing:
+                old_genre, old_total, old_available = existing[row["isbn"]]
+                on_loan = old_total - old_available
+                if total < on_loan:
+                    message = f"Меньше числа выданных копий ({on_loan})"
+                    errors.append((number, row["isbn"], {"copies_total": [message]}))
+                    continue
+                available = total - on_loan
+                if available > old_available:
+                    raised.add(row["isbn"])
+                updated += 1
+                deltas.book(
+                    old_genre, books=-1, copies=-old_total, available=-old_available
+                )
+            else:
+                created += 1
+            deltas.book(row["genre"], books=1, copies=total, available=available)
+            last, first = row["author_last_name"], row["author_first_name"]
+            books.append(
+                Book(
+                    isbn=row["isbn"],
+                    title=row["title"],
+                    description=row["description"],
+                    genre=row["genre"],
+                    published_year=row["published_year"],
+                    author_id=self.authors[(last, first)],
+                    # как str(author)
+                    author_display_name=f"{last} {first}".strip(),
+                    copies_total=total,
+                    copies_available=available,
+                )
+            )
+        if not books:
+            return created, updated, errors
+        Book.objects.bulk_create(
+            books,
+            update_conflicts=True,
+            unique_fields=["isbn"],
+            update_fields=BOOK_UPDATE_FIELDS,
+        )
+        refresh_book_search_vectors(
+            Book.objects.filter(isbn__in=[book.isbn for book in books])
+        )
+        if not self.dry_run:
+            # добавленные копии сразу уходят ожидающим, как при возврате
+            for book in sorted(books, key=lambda book: book.pk):
+                if book.isbn in raised:
+                    allocate_holds(book.pk, book.copies_available, deltas=deltas)
+        add_stats(deltas)
+        return created, updated, errors
+
+
+def import_books(stream, file_format, **options):
+    """Импорт каталога из бинарного потока; см. BookImporter."""
+    return BookImporter(**options).run(iter_records(stream, file_format))
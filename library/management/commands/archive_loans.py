@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from library.services import archive_loans_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенести давно возвращённые выдачи из library_loan в LoanArchive "
+        "порциями. Работает на живой таблице, можно прерывать и повторять."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="По умолчанию — LOAN_ARCHIVE_AFTER_DAYS.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0)
+
+    def handle(self, *args, older_than_days, batch_size, sleep, **options):
+        if older_than_days is None:
+            older_than_days = settings.LOAN_ARCHIVE_AFTER_DAYS
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        total, last_id = 0, 0
+        while True:
+            moved, last_id = archive_loans_batch(
+                cutoff=cutoff, after_id=last_id, batch_size=batch_size
+            )
+            if not moved:
+                break
+            total += moved
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив: {total}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from library.models import Book
+from library.search import refresh_author_display_names, refresh_book_search_vectors
+from library.versions import bump_table_version
+
+
+class Command(BaseCommand):
+    help = "Пересчитать Book.author_display_name (и поисковый вектор) по авторам."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, batch_size, **options):
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                Book.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            batch = Book.objects.filter(pk__in=ids)
+            total += refresh_author_display_names(batch)
+            refresh_book_search_vectors(batch)
+            last_id = ids[-1]
+        bump_table_version(Book)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено книг: {total}"))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.recommendations import build_neighbors, build_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобрать индекс рекомендаций по истории выдач: соседей «с этой "
+        "книгой также брали» (BookNeighbor) и популярность за скользящее окно "
+        "(BookPopularity). Между пересборками соседей дополняет возврат книг."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=None,
+            help="По умолчанию — RECOMMENDATIONS_TOP_K.",
+        )
+        parser.add_argument(
+            "--user-history",
+            type=int,
+            default=None,
+            help="По умолчанию — RECOMMENDATIONS_USER_HISTORY.",
+        )
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=None,
+            help="По умолчанию — POPULAR_WINDOW_DAYS.",
+        )
+        parser.add_argument("--books-per-batch", type=int, default=5000)
+        parser.add_argument(
+            "--popular-only",
+            action="store_true",
+            help="Только популярность (быстро; например, раз в час).",
+        )
+
+    def handle(
+        self,
+        *args,
+        top_k,
+        user_history,
+        window_days,
+        books_per_batch,
+        popular_only,
+        **options,
+    ):
+        if not popular_only:
+            started = time.monotonic()
+            pairs = build_neighbors(
+                top_k=top_k, user_history=user_history, books_per_batch=books_per_batch
+            )
+            self.stdout.write(
+                f"Пар «также брали»: {pairs} ({time.monotonic() - started:.1f} с)"
+            )
+        started = time.monotonic()
+        books = build_popularity(window_days=window_days)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Популярных книг: {books} ({time.monotonic() - started:.1f} с)"
+            )
+        )
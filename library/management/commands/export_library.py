@@ -0,0 +1,70 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from library.exports import EXPORT_CONTENT_TYPES, export_view
+from library.views import AuthorViewSet, BookViewSet, LoanViewSet
+
+VIEWSETS = {"books": BookViewSet, "authors": AuthorViewSet, "loans": LoanViewSet}
+
+
+def _param(value):
+    key, sep, val = value.partition("=")
+    if not sep or not key:
+        raise ValueError(value)
+    return key, val
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгрузить книги, авторов или выдачи в CSV/NDJSON потоком — то же, что "
+        "GET /api/<resource>/export/, с теми же фильтрами (--param key=value)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(VIEWSETS))
+        parser.add_argument(
+            "--format", dest="export_format", choices=list(EXPORT_CONTENT_TYPES)
+        )
+        parser.add_argument(
+            "--output", "-o", default="-", help="Файл; по умолчанию stdout."
+        )
+        parser.add_argument(
+            "--param",
+            "-p",
+            type=_param,
+            action="append",
+            default=[],
+            help="Параметр запроса, например genre=Fantasy, ordering=-created_at, "
+            "fields=id,title, include_archived=1. Можно повторять.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(
+        self, *args, resource, export_format, output, param, chunk_size, **options
+    ):
+        if export_format is None:
+            export_format = "ndjson" if output.endswith(".ndjson") else "csv"
+        # от имени staff: в выгрузку попадает всё, как у библиотекаря в API
+        staff = get_user_model()(username="export_library", is_staff=True)
+        view = export_view(VIEWSETS[resource], staff, param)
+        view.export_chunk_size = chunk_size
+
+        try:
+            chunks = view.export_chunks(export_format)
+            if output == "-":
+                self.write_chunks(sys.stdout.buffer, chunks)
+                return
+            with open(output, "wb") as f:
+                self.write_chunks(f, chunks)
+        except ValidationError as e:
+            raise CommandError(e.detail)
+        self.stdout.write(self.style.SUCCESS(f"Выгружено: {output}"))
+
+    @staticmethod
+    def write_chunks(f, chunks):
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
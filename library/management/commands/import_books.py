@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.imports import (
+    IMPORT_FORMATS,
+    ImportFileError,
+    import_books,
+    import_format,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Загрузить книги из CSV / NDJSON / JSON-массива: авторы — по фамилии и "
+        "имени, книги — вставка или обновление по isbn порциями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=IMPORT_FORMATS,
+            help="По умолчанию — по расширению файла.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="По умолчанию IMPORT_BATCH_SIZE.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Проверить файл и посчитать изменения без записи в БД.",
+        )
+        parser.add_argument(
+            "--errors",
+            dest="errors_path",
+            help="Файл для ошибок записей (NDJSON); без него — первые 20 в stderr.",
+        )
+
+    def handle(
+        self, *args, path, file_format, batch_size, dry_run, errors_path, **options
+    ):
+        file_format = file_format or import_format(path)
+        if file_format is None:
+            raise CommandError("Не удалось определить формат, укажите --format")
+        try:
+            with open(path, "rb") as f:
+                report = import_books(
+                    f, file_format, batch_size=batch_size, dry_run=dry_run
+                )
+        except (OSError, ImportFileError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        if errors_path:
+            with open(errors_path, "w", encoding="utf-8") as f:
+                for error in report.errors:
+                    f.write(json.dumps(error, ensure_ascii=False) + "\n")
+        else:
+            for error in report.errors[:20]:
+                self.stderr.write(json.dumps(error, ensure_ascii=False))
+
+        summary = (
+            f"Создано: {report.created}, обновлено: {report.updated}, "
+            f"авторов создано: {report.authors_created}, "
+            f"дубликатов isbn: {report.duplicates}, ошибок: {report.failed}"
+        )
+        if dry_run:
+            summary = f"[dry-run, в БД ничего не записано] {summary}"
+        style = self.style.WARNING if report.failed else self.style.SUCCESS
+        self.stdout.write(style(summary))
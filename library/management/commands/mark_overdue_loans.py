@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from library.services import mark_overdue_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Перевести просроченные выдачи (ISSUED, due_at в прошлом) в OVERDUE "
+        "порциями. Можно запускать по cron и прерывать в любой момент."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Пауза между порциями, сек (снижает нагрузку на БД).",
+        )
+
+    def handle(self, *args, batch_size, sleep, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            updated = mark_overdue_batch(now=now, batch_size=batch_size)
+            if not updated:
+                break
+            total += updated
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Помечено просроченными: {total}"))
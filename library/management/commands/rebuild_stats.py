@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from library.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать счётчики статистики (/api/stats/) с нуля по книгам и "
+        "выдачам. Запись в счётчики на время пересчёта ждёт его окончания."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"Счётчиков статистики: {rows}"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from library.cache_stats import reset_response_cache_stats, response_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Метрики кэша ответов каталога: попадания, промахи, вытеснения."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Обнулить счётчики после вывода."
+        )
+
+    def handle(self, *args, reset, **options):
+        for metric, value in response_cache_stats().items():
+            self.stdout.write(f"{metric}: {value}")
+        if reset:
+            reset_response_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Счётчики обнулены"))
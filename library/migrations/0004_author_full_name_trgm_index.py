@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0003_search_vectors"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Lower(
+                        django.db.models.functions.text.Concat(
+                            "last_name", models.Value(" "), "first_name"
+                        )
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="author_full_name_trgm_idx",
+            ),
+        ),
+    ]
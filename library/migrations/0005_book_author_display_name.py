@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:35
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat, Trim
+
+
+def fill_author_display_name(apps, schema_editor):
+    Author = apps.get_model("library", "Author")
+    Book = apps.get_model("library", "Book")
+    Book.objects.update(
+        author_display_name=Subquery(
+            Author.objects.filter(pk=OuterRef("author_id")).values(
+                name=Trim(Concat("last_name", Value(" "), "first_name"))
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0004_author_full_name_trgm_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="author_display_name",
+            field=models.CharField(blank=True, editable=False, max_length=241),
+        ),
+        migrations.RunPython(fill_author_display_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+BATCH_SIZE = 10_000
+
+
+def fill_updated_at(apps, schema_editor):
+    # порциями по pk, каждая — своя транзакция (миграция не atomic): таблица
+    # выдач большая, одним UPDATE она переписалась бы под одной блокировкой
+    for name in ("Author", "Book", "Loan"):
+        model = apps.get_model("library", name)
+        last = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            model.objects.filter(pk__gt=last, pk__lte=batch[-1]).update(
+                updated_at=models.F("created_at")
+            )
+            last = batch[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("library", "0005_book_author_display_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="author",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:40
+
+from django.conf import settings
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять в транзакции;
+    # новые индексы строятся до удаления старых
+    atomic = False
+
+    dependencies = [
+        ("library", "0006_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["user", "-issued_at"],
+                name="loan_active_user_issued_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["due_at"],
+                name="loan_active_due_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("status", "ISSUED")),
+                fields=["due_at"],
+                name="loan_issued_due_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("status", "OVERDUE")),
+                fields=["-issued_at"],
+                name="loan_overdue_issued_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="loan",
+            name="library_loa_user_id_877dee_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="loan",
+            name="library_loa_due_at_7fb3ad_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="loan",
+            name="library_loa_status_a19041_idx",
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+LOAN_COLUMNS = (
+    "id, user_id, book_id, issued_at, due_at, returned_at, status, "
+    "created_at, updated_at"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0007_loan_partial_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanHistory",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("issued_at", models.DateTimeField()),
+                ("due_at", models.DateTimeField()),
+                ("returned_at", models.DateTimeField(null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ISSUED", "Выдана"),
+                            ("RETURNED", "Возвращена"),
+                            ("OVERDUE", "Просрочена"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "library_loan_history",
+                "ordering": ["-issued_at"],
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="LoanArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("issued_at", models.DateTimeField()),
+                ("due_at", models.DateTimeField()),
+                ("returned_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ISSUED", "Выдана"),
+                            ("RETURNED", "Возвращена"),
+                            ("OVERDUE", "Просрочена"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="library.book",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-issued_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-issued_at"],
+                        name="loanarchive_user_issued_idx",
+                    ),
+                    models.Index(fields=["-issued_at"], name="loanarchive_issued_idx"),
+                ],
+            },
+        ),
+        # новая пустая таблица и VIEW — без блокировок живой library_loan
+        migrations.RunSQL(
+            f"""
+            CREATE VIEW library_loan_history AS
+            SELECT {LOAN_COLUMNS} FROM library_loan
+            UNION ALL
+            SELECT {LOAN_COLUMNS} FROM library_loanarchive
+            """,
+            "DROP VIEW library_loan_history",
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+def fill_stat_counters(apps, schema_editor):
+    from library.stats import rebuild_stats
+
+    rebuild_stats(apps, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0009_loan_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("genre_books", "Книг в жанре"),
+                            ("genre_copies", "Копий в жанре"),
+                            ("genre_available", "Доступных копий в жанре"),
+                            ("loans_issued", "Выдач за день"),
+                            (
+                                "active_due",
+                                "Невозвращённых выдач со сроком в этот день",
+                            ),
+                            ("author_loans", "Выдач книг автора"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("bucket", models.CharField(max_length=64)),
+                ("stripe", models.PositiveSmallIntegerField(default=0)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "-value"], name="statcounter_kind_value_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "bucket", "stripe"), name="statcounter_key_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_stat_counters, migrations.RunPython.noop),
+    ]
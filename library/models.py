@@ -1,24 +1,56 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Concat, Lower
 from django.utils import timezone
 
 
+def author_full_name(prefix=""):
+    """`lower(last_name || ' ' || first_name)`; prefix="author__" — для Book."""
+    return Lower(Concat(f"{prefix}last_name", models.Value(" "), f"{prefix}first_name"))
+
+
 class TimeStampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        # auto_now не попадает в UPDATE, если его нет в update_fields
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            kwargs["update_fields"] = {*update_fields, "updated_at"}
+        super().save(*args, **kwargs)
+
 
 class Author(TimeStampedModel):
     first_name = models.CharField(max_length=120)
     last_name = models.CharField(max_length=120)
     date_of_birth = models.DateField(null=True, blank=True)
     bio = models.TextField(null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         indexes = [
             models.Index(fields=["last_name", "first_name"]),
+            GinIndex(fields=["search_vector"], name="author_search_vector_idx"),
+            GinIndex(
+                fields=["last_name"],
+                opclasses=["gin_trgm_ops"],
+                name="author_last_name_trgm_idx",
+            ),
+            GinIndex(
+                fields=["first_name"],
+                opclasses=["gin_trgm_ops"],
+                name="author_first_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(author_full_name(), name="gin_trgm_ops"),
+                name="author_full_name_trgm_idx",
+            ),
         ]
         ordering = ["last_name", "first_name"]
 
@@ -41,14 +73,21 @@ class Book(TimeStampedModel):
     genre = models.CharField(max_length=32, choices=Genre.choices, default=Genre.OTHER)
     published_year = models.PositiveIntegerField()
     author = models.ForeignKey(Author, on_delete=models.PROTECT, related_name="books")
+    # копия str(author): список книг отдаётся без JOIN на автора
+    author_display_name = models.CharField(max_length=241, blank=True, editable=False)
     copies_total = models.PositiveIntegerField(default=1)
     copies_available = models.PositiveIntegerField(default=1)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         indexes = [
             models.Index(fields=["genre"]),
             models.Index(fields=["published_year"]),
             models.Index(fields=["author"]),
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+            GinIndex(
+                fields=["title"], opclasses=["gin_trgm_ops"], name="book_title_trgm_idx"
+            ),
         ]
         constraints = [
             models.CheckConstraint(
@@ -65,6 +104,14 @@ class Book(TimeStampedModel):
     def __str__(self):
         return f"{self.title} ({self.isbn})"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "author" in update_fields:
+            self.author_display_name = str(self.author)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "author_display_name"}
+        super().save(*args, **kwargs)
+
 
 class Loan(TimeStampedModel):
     class Status(models.TextChoices):
@@ -84,10 +131,36 @@ class Loan(TimeStampedModel):
     )
 
     class Meta:
+        # Почти все запросы — про невозвращённые выдачи, а таблица в основном
+        # из RETURNED-истории, поэтому индексы частичные (returned_at IS NULL).
+        # Активная пара (user, book) — в uniq_active_loan_per_user_book,
+        # вся история пользователя/книги — в индексах внешних ключей.
         indexes = [
-            models.Index(fields=["user", "book"]),
-            models.Index(fields=["due_at"]),
-            models.Index(fields=["status"]),
+            # «мои текущие выдачи» в порядке списка
+            models.Index(
+                fields=["user", "-issued_at"],
+                condition=models.Q(returned_at__isnull=True),
+                name="loan_active_user_issued_idx",
+            ),
+            # выдачи на руках по сроку: сегодняшняя просрочка в read_stats
+            models.Index(
+                fields=["due_at"],
+                condition=models.Q(returned_at__isnull=True),
+                name="loan_active_due_idx",
+            ),
+            # mark_overdue_loans: только ещё не помеченные ISSUED — уже
+            # OVERDUE-выдачи на руках в индекс не входят и не копятся в скане
+            models.Index(
+                fields=["due_at"],
+                condition=models.Q(status="ISSUED"),
+                name="loan_issued_due_idx",
+            ),
+            # ?status=OVERDUE — то, что пометил mark_overdue_loans
+            models.Index(
+                fields=["-issued_at"],
+                condition=models.Q(status="OVERDUE"),
+                name="loan_overdue_issued_idx",
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -100,3 +173,214 @@ class Loan(TimeStampedModel):
 
     def __str__(self):
         return f"Loan[{self.pk}] {self.user} -> {self.book}"
+
+
+class LoanArchive(models.Model):
+    """
+    Возвращённые выдачи, перенесённые из library_loan командой archive_loans
+    (старше LOAN_ARCHIVE_AFTER_DAYS). id сохраняется прежним.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    book = models.ForeignKey(Book, on_delete=models.PROTECT, related_name="+")
+    issued_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+    returned_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=Loan.Status.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-issued_at"], name="loanarchive_user_issued_idx"
+            ),
+            models.Index(fields=["-issued_at"], name="loanarchive_issued_idx"),
+        ]
+        ordering = ["-issued_at"]
+
+    def __str__(self):
+        return f"LoanArchive[{self.pk}] {self.user_id} -> {self.book_id}"
+
+
+class LoanHistory(models.Model):
+    """
+    Только чтение: VIEW library_loan_history = library_loan UNION ALL
+    library_loanarchive (?include_archived=1). Условия и LIMIT Postgres
+    проталкивает в обе ветки, поэтому индексы таблиц работают.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    book = models.ForeignKey(
+        Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    issued_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+    returned_at = models.DateTimeField(null=True)
+    status = models.CharField(max_length=16, choices=Loan.Status.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "library_loan_history"
+        ordering = ["-issued_at"]
+
+
+class StatCounter(models.Model):
+    """
+    Слагаемое счётчика статистики (/api/stats/, library.stats).
+
+    Значение счётчика (kind, bucket) — сумма value по всем stripe: часто
+    меняющиеся счётчики (жанр, день) разложены на STATS_COUNTER_STRIPES
+    строк, чтобы параллельные выдачи не ждали друг друга на одной строке.
+    """
+
+    class Kind(models.TextChoices):
+        GENRE_BOOKS = "genre_books", "Книг в жанре"
+        GENRE_COPIES = "genre_copies", "Копий в жанре"
+        GENRE_AVAILABLE = "genre_available", "Доступных копий в жанре"
+        LOANS_ISSUED = "loans_issued", "Выдач за день"
+        ACTIVE_DUE = "active_due", "Невозвращённых выдач со сроком в этот день"
+        AUTHOR_LOANS = "author_loans", "Выдач книг автора"
+
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    # жанр, дата YYYY-MM-DD или id автора
+    bucket = models.CharField(max_length=64)
+    stripe = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "bucket", "stripe"], name="statcounter_key_uniq"
+            )
+        ]
+        indexes = [
+            # топ авторов: ORDER BY value DESC LIMIT n (author_loans без stripe)
+            models.Index(fields=["kind", "-value"], name="statcounter_kind_value_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.bucket}[{self.stripe}] = {self.value}"
+
+
+class Hold(TimeStampedModel):
+    """
+    Очередь на книгу без свободных копий. Возвращённая копия сразу
+    выдаётся первому в очереди (services.allocate_holds), поэтому ждать
+    и повторять выдачу не нужно.
+    """
+
+    class Status(models.TextChoices):
+        WAITING = "WAITING", "В очереди"
+        FULFILLED = "FULFILLED", "Выдана"
+        CANCELLED = "CANCELLED", "Отменена"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="holds"
+    )
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds")
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.WAITING
+    )
+    loan = models.OneToOneField(
+        Loan,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="hold",
+    )
+
+    class Meta:
+        indexes = [
+            # голова очереди: WHERE book_id = .. AND status = 'WAITING'
+            # ORDER BY created_at, id LIMIT n — без просмотра очереди
+            models.Index(
+                fields=["book", "created_at", "id"],
+                condition=models.Q(status="WAITING"),
+                name="hold_waiting_fifo_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=models.Q(status="WAITING"),
+                name="uniq_waiting_hold_per_user_book",
+            )
+        ]
+
+    def __str__(self):
+        return f"Hold[{self.pk}] {self.user} -> {self.book} ({self.status})"
+
+
+class BookNeighbor(models.Model):
+    """
+    «С этой книгой также брали»: до RECOMMENDATIONS_TOP_K соседей на книгу,
+    score — сколько читателей вернули обе книги. Строит build_recommendations,
+    между перестроениями return_loan прибавляет новые пары.
+    """
+
+    # индекс по book — первый столбец bookneighbor_book_score_idx
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "neighbor"], name="bookneighbor_pair_uniq"
+            )
+        ]
+        indexes = [
+            # also-borrowed: WHERE book_id = .. ORDER BY score DESC LIMIT k
+            models.Index(
+                fields=["book", "-score", "neighbor"],
+                name="bookneighbor_book_score_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbor_id} ({self.score})"
+
+
+class BookPopularity(models.Model):
+    """Выдач книги за последние POPULAR_WINDOW_DAYS дней (build_recommendations)."""
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score", "book"], name="bookpopularity_score_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.book_id}: {self.score}"
+
+
+def loan_effective_status(now):
+    """SQL-версия LoanSerializer.get_effective_status на момент `now`."""
+    return models.Case(
+        models.When(
+            returned_at__isnull=True,
+            due_at__lt=now,
+            then=models.Value(Loan.Status.OVERDUE.value),
+        ),
+        default=models.F("status"),
+        output_field=models.CharField(),
+    )
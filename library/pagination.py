@@ -1,7 +1,409 @@
-from rest_framework.pagination import PageNumberPagination
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+    _reverse_ordering,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counting import CountResult, acount_queryset, count_queryset
+
+
+def _encode_cursor_value(value):
+    # DjangoJSONEncoder обрезает микросекунды, а ключу нужна точная позиция
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class EstimatedPage(Page):
+    """Страница по оценке count: есть ли следующая — по лишней строке выборки."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Paginator, у которого `count` берётся из count_queryset (точный или оценка).
+
+    Оценка может сильно отставать (сразу после массового импорта, до
+    ANALYZE), поэтому при неточном count номер страницы им не ограничивается:
+    страница читается с одной лишней строкой, по ней решается, есть ли
+    следующая, а пустая страница после первой — 404.
+    """
+
+    @cached_property
+    def count_result(self):
+        if isinstance(self.object_list, QuerySet):
+            return count_queryset(self.object_list)
+        return CountResult(len(self.object_list), exact=True)
+
+    @cached_property
+    def count(self):
+        return self.count_result.value
+
+    @property
+    def count_exact(self):
+        return self.count_result.exact
+
+    async def aload_count(self):
+        """Посчитать count заранее через async ORM (дальше page() без запросов)."""
+        if "count_result" not in self.__dict__ and isinstance(
+            self.object_list, QuerySet
+        ):
+            self.count_result = await acount_queryset(self.object_list)
+
+    def validate_number(self, number):
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        if self.count_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        return self.estimated_page(list(self.page_rows(number)), number)
+
+    async def apage(self, number):
+        """page() через async ORM; count уже загружен (aload_count)."""
+        if self.count_exact:
+            page = super().page(number)
+            page.object_list = [row async for row in page.object_list]
+            return page
+        number = self.validate_number(number)
+        rows = [row async for row in self.page_rows(number)]
+        return self.estimated_page(rows, number)
+
+    def page_rows(self, number):
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page + 1
+        return self.object_list[bottom:top]
+
+    def estimated_page(self, rows, number):
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        # оценка не меньше того, что уже прочитано
+        seen = (number - 1) * self.per_page + len(rows) + has_more
+        self.count = max(self.count, seen)
+        return EstimatedPage(rows, number, self, has_more)
 
 
 class DefaultPageNumberPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset-пагинация по текущему ORDER BY выборки с добивкой по id.
+
+    Курсор хранит значения всех полей сортировки последней (первой) записи,
+    следующая страница выбирается условием `(a, b, id) > (va, vb, vid)`
+    без OFFSET и без COUNT(*).
+
+    NULL считается больше любого значения (как по умолчанию в Postgres):
+    по возрастанию — NULLS LAST, по убыванию — NULLS FIRST, и условие
+    курсора учитывает NULL в позиции и в строках.
+    """
+
+    ordering = None
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    tiebreaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset[: self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset[: self.page_size + 1]])
+
+    def page_queryset(self, queryset, request, view):
+        """Выборка страницы по курсору (+1 запись — есть ли следующая)."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse, self.position = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if self.reverse else self.ordering
+        nullable = {
+            field: self._nullable(queryset.model, field.lstrip("-"))
+            for field in ordering
+        }
+        queryset = queryset.order_by(
+            *(
+                self._nulls_ordering(field) if nullable[field] else field
+                for field in ordering
+            )
+        )
+        if self.position is not None:
+            queryset = queryset.filter(
+                self._position_filter(ordering, self.position, nullable)
+            )
+        return queryset
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Сортировка из `?ordering=`, иначе из самой выборки/модели, плюс id.
+        """
+        ordering = None
+        for backend in getattr(view, "filter_backends", ()):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = [str(field) for field in ordering]
+        if not {self.tiebreaker, "pk"} & {f.lstrip("-") for f in ordering}:
+            ordering.append(self.tiebreaker)
+        return tuple(ordering)
+
+    @staticmethod
+    def _nullable(model, name):
+        """Может ли поле сортировки быть NULL (связи и аннотации — может)."""
+        if name == "pk":
+            return False
+        try:
+            return model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return True
+
+    @staticmethod
+    def _nulls_ordering(field):
+        if field.startswith("-"):
+            return F(field[1:]).desc(nulls_first=True)
+        return F(field).asc(nulls_last=True)
+
+    def _position_filter(self, ordering, position, nullable):
+        if len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            if value is not None and not nullable[field]:
+                lookup = "lt" if field.startswith("-") else "gt"
+                condition |= equal & Q(**{f"{name}__{lookup}": value})
+                equal &= Q(**{name: value})
+                continue
+            after = self._after_filter(name, field.startswith("-"), value)
+            if after is not None:
+                condition |= equal & after
+            equal &= Q(**{f"{name}__isnull": True} if value is None else {name: value})
+        return condition
+
+    @staticmethod
+    def _after_filter(name, descending, value):
+        """Строки строго после value по nullable-полю name; None — таких нет."""
+        if descending:
+            # после NULL — все значения, после значения — меньшие
+            if value is None:
+                return Q(**{f"{name}__isnull": False})
+            return Q(**{f"{name}__lt": value})
+        # после значения — большие и NULL, после NULL — ничего
+        if value is None:
+            return None
+        return Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            return bool(payload.get("r")), list(payload["p"])
+        except (BinasciiError, KeyError, TypeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, position):
+        payload = {"p": position}
+        if reverse:
+            payload["r"] = 1
+        raw = json.dumps(payload, default=_encode_cursor_value, separators=(",", ":"))
+        encoded = urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if isinstance(instance, dict):
+                position.append(instance[name])
+            else:
+                position.append(getattr(instance, name))
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(False, position)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(True, position)
+
+
+class CursorOptInPagination(DefaultPageNumberPagination):
+    """
+    Постраничная пагинация по умолчанию; `?pagination=cursor` (или наличие
+    `?cursor=`) переключает список на keyset-режим без подсчёта количества.
+    В постраничном режиме `count` может быть оценкой (см. `count_exact`).
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+    mode_query_param = "pagination"
+    cursor_mode = "cursor"
+    cursor_pagination_class = KeysetPagination
+
+    def is_cursor_mode(self, request):
+        params = request.query_params
+        return (
+            params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset через async ORM: count (EstimatedCountPaginator)
+        и строки страницы читаются до сборки страницы.
+        """
+        self.cursor_paginator = None
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return await self.cursor_paginator.apaginate_queryset(
+                queryset, request, view
+            )
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        await paginator.aload_count()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = await paginator.apage(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return Response(
+            {
+                "count": self.page.paginator.count,
+                "count_exact": self.page.paginator.count_exact,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["required"] = ["results"]
+        response_schema["properties"]["count_exact"] = {
+            "type": "boolean",
+            "description": "false — `count` является оценкой планировщика.",
+        }
+        return response_schema
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        cursor_paginator = self.cursor_pagination_class()
+        parameters = super().get_schema_operation_parameters(view)
+        names = {parameter["name"] for parameter in parameters}
+        return [
+            *parameters,
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Режим пагинации: `cursor` — keyset без count.",
+                "schema": {"type": "string", "enum": [self.cursor_mode]},
+            },
+            # page_size общий у обоих режимов
+            *(
+                parameter
+                for parameter in cursor_paginator.get_schema_operation_parameters(view)
+                if parameter["name"] not in names
+            ),
+        ]
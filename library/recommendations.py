@@ -0,0 +1,203 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Book, BookNeighbor, BookPopularity, LoanHistory
+
+# временная таблица пересборки (живёт до конца соединения)
+NEIGHBORS_TMP = "recommendations_neighbors_tmp"
+
+
+def popular_books(limit):
+    """Популярные книги: одно чтение по индексу bookpopularity_score_idx."""
+    return list(
+        BookPopularity.objects.select_related("book")
+        .defer("book__search_vector")
+        .order_by("-score", "book_id")[:limit]
+    )
+
+
+def also_borrowed(book_id, limit):
+    """
+    Соседи книги: одно чтение по индексу bookneighbor_book_score_idx
+    (WHERE book_id = .. ORDER BY score DESC LIMIT ..) + JOIN к книгам.
+    """
+    return list(
+        BookNeighbor.objects.filter(book_id=book_id)
+        .select_related("neighbor")
+        .defer("neighbor__search_vector")
+        .order_by("-score", "neighbor_id")[:limit]
+    )
+
+
+def record_co_borrows(user_id, returned):
+    """
+    Читатель user_id только что вернул займы `returned` ({loan_id: book_id}):
+    каждой новой книге +1 к паре с книгами из его последних
+    RECOMMENDATIONS_USER_HISTORY возвратов — как посчитала бы пересборка.
+    Книга, уже бывшая в этих возвратах, пар не добавляет.
+
+    Новая пара добавляется, только пока у книги меньше RECOMMENDATIONS_TOP_K
+    соседей: таблица остаётся компактной, а редкие пары всё равно вытеснила
+    бы следующая пересборка (build_recommendations).
+    """
+    recent = (
+        LoanHistory.objects.filter(user_id=user_id, returned_at__isnull=False)
+        .exclude(pk__in=list(returned))
+        .order_by("-returned_at")
+        .values_list("book_id", flat=True)[: settings.RECOMMENDATIONS_USER_HISTORY]
+    )
+    seen = dict.fromkeys(recent)
+    pairs = Counter()
+    for book_id in returned.values():
+        if book_id in seen:
+            continue
+        for other in seen:
+            pairs[(book_id, other)] += 1
+            pairs[(other, book_id)] += 1
+        seen[book_id] = None
+    if pairs:
+        add_co_borrows(pairs)
+
+
+def add_co_borrows(pairs):
+    """Прибавить {(book_id, neighbor_id): n} одним INSERT ... ON CONFLICT."""
+    rows = sorted(pairs.items())
+    table = BookNeighbor._meta.db_table
+    values = ", ".join(["(%s, %s, %s)"] * len(rows))
+    with connection.cursor() as cursor:
+        # строки в одном порядке во всех транзакциях — без взаимоблокировок
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (book_id, neighbor_id, score)
+            SELECT book_id, neighbor_id, score FROM (
+                SELECT p.*, known, row_number() OVER (
+                    PARTITION BY p.book_id, known ORDER BY p.score DESC, p.neighbor_id
+                ) AS n
+                FROM (VALUES {values}) AS p (book_id, neighbor_id, score)
+                CROSS JOIN LATERAL (
+                    SELECT EXISTS (
+                        SELECT 1 FROM {table} t
+                        WHERE t.book_id = p.book_id AND t.neighbor_id = p.neighbor_id
+                    ) AS known
+                ) k
+            ) p
+            -- новых пар — не больше свободных мест до top-K
+            WHERE known OR n <= %s - (
+                SELECT count(*) FROM {table} t WHERE t.book_id = p.book_id
+            )
+            ORDER BY book_id, neighbor_id
+            ON CONFLICT (book_id, neighbor_id)
+            DO UPDATE SET score = {table}.score + EXCLUDED.score
+            """,
+            [
+                param
+                for (book_id, neighbor_id), n in rows
+                for param in (book_id, neighbor_id, n)
+            ]
+            + [settings.RECOMMENDATIONS_TOP_K],
+        )
+
+
+def build_neighbors(*, top_k=None, user_history=None, books_per_batch=5000):
+    """
+    Пересобрать BookNeighbor по всей истории выдач (library_loan_history).
+
+    Пары считаются одним запросом во временную таблицу: у каждого читателя
+    берутся книги его последних `user_history` возвратов, score пары — число
+    читателей, у которых встретились обе книги; у книги остаётся `top_k`
+    соседей с наибольшим score. Затем BookNeighbor заменяется диапазонами
+    по `books_per_batch` книг — короткими транзакциями, так что чтение и
+    инкрементальные обновления не ждут всей пересборки.
+
+    Возвращает число записанных пар.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    user_history = user_history or settings.RECOMMENDATIONS_USER_HISTORY
+    history = LoanHistory._meta.db_table
+    table = BookNeighbor._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {NEIGHBORS_TMP}")
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {NEIGHBORS_TMP} AS
+            WITH recent AS (
+                SELECT DISTINCT user_id, book_id FROM (
+                    SELECT user_id, book_id, row_number() OVER (
+                        PARTITION BY user_id ORDER BY returned_at DESC
+                    ) AS n
+                    FROM {history}
+                    WHERE returned_at IS NOT NULL
+                ) returns
+                WHERE n <= %s
+            ), pairs AS (
+                SELECT a.book_id, b.book_id AS neighbor_id, count(*) AS score
+                FROM recent a
+                JOIN recent b ON b.user_id = a.user_id AND b.book_id <> a.book_id
+                GROUP BY a.book_id, b.book_id
+            )
+            SELECT book_id, neighbor_id, score FROM (
+                SELECT pairs.*, row_number() OVER (
+                    PARTITION BY book_id ORDER BY score DESC, neighbor_id
+                ) AS rank
+                FROM pairs
+            ) ranked
+            WHERE rank <= %s
+            """,
+            [user_history, top_k],
+        )
+        cursor.execute(f"CREATE INDEX ON {NEIGHBORS_TMP} (book_id)")
+        cursor.execute(f"ANALYZE {NEIGHBORS_TMP}")
+
+        bounds = Book.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        written = 0
+        low = bounds["low"] or 0
+        while bounds["high"] is not None and low <= bounds["high"]:
+            high = low + books_per_batch
+            with transaction.atomic():
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE book_id >= %s AND book_id < %s",
+                    [low, high],
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (book_id, neighbor_id, score)
+                    SELECT book_id, neighbor_id, score FROM {NEIGHBORS_TMP}
+                    WHERE book_id >= %s AND book_id < %s
+                    ORDER BY book_id, neighbor_id
+                    """,
+                    [low, high],
+                )
+                written += cursor.rowcount
+            low = high
+        cursor.execute(f"DROP TABLE {NEIGHBORS_TMP}")
+    return written
+
+
+def build_popularity(*, window_days=None, now=None):
+    """
+    Пересобрать BookPopularity: выдачи каждой книги за последние
+    `window_days` дней (скользящее окно). Одна транзакция — таблица
+    размером с каталог. Возвращает число книг с выдачами в окне.
+    """
+    window_days = window_days or settings.POPULAR_WINDOW_DAYS
+    since = (now or timezone.now()) - timedelta(days=window_days)
+    table = BookPopularity._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (book_id, score)
+            SELECT book_id, count(*) FROM {LoanHistory._meta.db_table}
+            WHERE issued_at >= %s
+            GROUP BY book_id
+            ORDER BY book_id
+            """,
+            [since],
+        )
+        return cursor.rowcount
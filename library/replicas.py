@@ -0,0 +1,131 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_PIN_KEY = "db:primary-pin:{}"
+
+# реплика, с которой читает текущий запрос; None — всё с основной БД
+_read_alias = ContextVar("read_alias", default=None)
+
+
+class ReplicaRouter:
+    """
+    Чтение — с реплики, которую выбрал ReadReplicaMixin для текущего
+    запроса; всё остальное (запись, select_for_update, чтение внутри
+    транзакции, команды, фоновые задачи) — с основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        # в транзакции на основной БД читаем её же: реплика отстаёт
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # явно: иначе Django пишет объект, прочитанный с реплики, в реплику
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии основной БД
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплик приносит репликация
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def pin_to_primary(*user_ids):
+    """
+    После записи пользователь REPLICA_PIN_SECONDS читает с основной БД:
+    реплика могла ещё не получить его выдачи (read-your-writes). Метка —
+    в общем кэше, чтобы её видели все процессы (Redis).
+    """
+    if not settings.DATABASE_REPLICAS:
+        return
+    cache.set_many(
+        {PRIMARY_PIN_KEY.format(user_id): True for user_id in set(user_ids)},
+        settings.REPLICA_PIN_SECONDS,
+    )
+
+
+@contextmanager
+def version_reads(version):
+    """
+    Чтения для ответа, который кэшируется или получает ETag под версией
+    таблицы `version` (versions.table_version). Версия меняется сразу после
+    записи, а реплика может отставать до REPLICA_PIN_SECONDS: пока версия
+    моложе этого окна, читаем с основной БД, иначе реплика её уже догнала
+    и читаем с реплики запроса.
+    """
+    age = time.time_ns() - version
+    if _read_alias.get() is None or age >= settings.REPLICA_PIN_SECONDS * 10**9:
+        yield
+        return
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_for(request):
+    """Реплика для запроса или None: не GET/HEAD/OPTIONS или пользователь закреплён."""
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return None
+    user = request.user
+    if user.is_authenticated and cache.get(PRIMARY_PIN_KEY.format(user.pk)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+async def areplica_for(request):
+    """replica_for для async-кода."""
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return None
+    user = request.user
+    if user.is_authenticated and await cache.aget(PRIMARY_PIN_KEY.format(user.pk)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReadReplicaMixin:
+    """
+    Безопасные запросы вьюсета читают с реплики (ReplicaRouter), если
+    пользователь не закреплён за основной БД после своей записи
+    (pin_to_primary). Реплика выбирается после аутентификации — одна на
+    весь запрос, чтобы count и страница списка были из одного снимка.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        _read_alias.set(replica_for(request))
+
+    async def adispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return await super().adispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    async def ainitial(self, request, *args, **kwargs):
+        await super().ainitial(request, *args, **kwargs)
+        _read_alias.set(await areplica_for(request))
@@ -0,0 +1,123 @@
+import hashlib
+import pickle
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .cache_stats import arecord, record
+from .conditional import normalized_query
+from .replicas import version_reads
+from .versions import atable_version, table_version
+
+RESPONSE_CACHE_ALIAS = "responses"
+
+
+class CachedResponseMixin:
+    """
+    Кэш данных ответа list/retrieve в кэше `responses`.
+
+    Ключ — поколение таблицы (versions.table_version: меняется при любом
+    сохранении/удалении строки через админку, API или services) + адрес +
+    нормализованные фильтры/поиск/сортировка/пагинация/`?fields=`.
+    Старые поколения не удаляются — их вытесняет TIMEOUT/MAX_ENTRIES.
+    Ответы больше RESPONSE_CACHE_MAX_ENTRY_BYTES не кэшируются.
+    Промах под недавно сменённой версией читает с основной БД
+    (replicas.version_reads): ответ отставшей реплики был бы старше версии
+    в ключе; под более старой — с реплики.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response("list", super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.cached_response(
+            f"detail:{lookup}", super().retrieve, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            "list", super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return await self.acached_response(
+            f"detail:{lookup}", super().aretrieve, request, *args, **kwargs
+        )
+
+    def response_cache_key(self, request, scope, version):
+        model = self.get_queryset().model
+        source = ":".join(
+            (
+                str(version),
+                scope,
+                request.build_absolute_uri(request.path),
+                normalized_query(request),
+            )
+        )
+        digest = hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+        return f"library:response:{model._meta.label_lower}:{digest}"
+
+    def cached_response(self, scope, handler, request, *args, **kwargs):
+        version = table_version(self.get_queryset().model)
+        key, response = self.cached_lookup(request, scope, version)
+        if response is None:
+            with version_reads(version):
+                response = handler(request, *args, **kwargs)
+            self.cache_store(key, response)
+        return response
+
+    async def acached_response(self, scope, handler, request, *args, **kwargs):
+        version = await atable_version(self.get_queryset().model)
+        key, response = await self.acached_lookup(request, scope, version)
+        if response is None:
+            with version_reads(version):
+                response = await handler(request, *args, **kwargs)
+            await self.acache_store(key, response)
+        return response
+
+    def cached_lookup(self, request, scope, version):
+        key = self.response_cache_key(request, scope, version)
+        payload = caches[RESPONSE_CACHE_ALIAS].get(key)
+        if payload is not None:
+            record("hits")
+            return key, Response(pickle.loads(payload))
+        record("misses")
+        return key, None
+
+    async def acached_lookup(self, request, scope, version):
+        key = self.response_cache_key(request, scope, version)
+        payload = await caches[RESPONSE_CACHE_ALIAS].aget(key)
+        if payload is not None:
+            await arecord("hits")
+            return key, Response(pickle.loads(payload))
+        await arecord("misses")
+        return key, None
+
+    def cache_store(self, key, response):
+        payload = self.cache_payload(response)
+        if payload is None:
+            return
+        if len(payload) > settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            record("skipped")
+        else:
+            caches[RESPONSE_CACHE_ALIAS].set(key, payload)
+            record("stores")
+
+    async def acache_store(self, key, response):
+        payload = self.cache_payload(response)
+        if payload is None:
+            return
+        if len(payload) > settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            await arecord("skipped")
+        else:
+            await caches[RESPONSE_CACHE_ALIAS].aset(key, payload)
+            await arecord("stores")
+
+    @staticmethod
+    def cache_payload(response):
+        if response.status_code != 200:
+            return None
+        return pickle.dumps(response.data, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,63 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat, Now, Trim
+
+from .models import Author
+
+# russian: русские слова — russian_stem, латиница — english_stem
+SEARCH_CONFIG = "russian"
+
+BOOK_SEARCH_FIELDS = frozenset(
+    {"title", "description", "author", "author_id", "author_display_name"}
+)
+AUTHOR_SEARCH_FIELDS = frozenset({"first_name", "last_name", "bio"})
+
+
+def book_search_vector():
+    """Вес A — название, B — автор (фамилия имя), C — описание."""
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("author_display_name", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def author_search_vector():
+    """Вес A — фамилия и имя, B — биография."""
+    return SearchVector(
+        "last_name", "first_name", weight="A", config=SEARCH_CONFIG
+    ) + SearchVector("bio", weight="B", config=SEARCH_CONFIG)
+
+
+def refresh_book_search_vectors(queryset):
+    return queryset.update(search_vector=book_search_vector())
+
+
+def refresh_author_display_names(queryset):
+    """Пересчитать Book.author_display_name одним UPDATE по выборке книг."""
+    return queryset.update(
+        author_display_name=Subquery(
+            Author.objects.filter(pk=OuterRef("author_id")).values(
+                name=Trim(Concat("last_name", Value(" "), "first_name"))
+            )[:1]
+        ),
+        updated_at=Now(),
+    )
+
+
+def refresh_author_search_vectors(queryset):
+    return queryset.update(search_vector=author_search_vector())
+
+
+def weighted_search_query(value, weights):
+    """
+    tsquery по словам `value`, совпадающим только в частях вектора с весами
+    `weights` (например, "C" — только описание книги).
+    """
+    words = re.findall(r"\w+", value)
+    if not words:
+        return None
+    raw = " & ".join(f"{word}:{weights}" for word in words)
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
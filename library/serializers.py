@@ -1,18 +1,19 @@
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Author, Book, Loan
+from .fieldsets import SparseFieldsetSerializerMixin
+from .models import Author, Book, Hold, Loan
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Author
         fields = ("id", "first_name", "last_name", "date_of_birth", "bio", "created_at")
         read_only_fields = ("id", "created_at")
 
 
-class BookSerializer(serializers.ModelSerializer):
-    author_name = serializers.SerializerMethodField(read_only=True)
+class BookSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    author_name = serializers.CharField(source="author_display_name", read_only=True)
 
     class Meta:
         model = Book
@@ -31,11 +32,8 @@ class BookSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "created_at", "copies_available")
 
-    def get_author_name(self, obj):
-        return f"{obj.author.last_name} {obj.author.first_name}".strip()
 
-
-class LoanSerializer(serializers.ModelSerializer):
+class LoanSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     user_username = serializers.CharField(source="user.username", read_only=True)
     book_title = serializers.CharField(source="book.title", read_only=True)
     effective_status = serializers.SerializerMethodField()
@@ -61,6 +59,7 @@ class LoanSerializer(serializers.ModelSerializer):
             "status",
             "effective_status",
         )
+        field_sources = {"effective_status": ("returned_at", "due_at", "status")}
 
     def get_effective_status(self, obj: Loan) -> str:
         if obj.returned_at is None and timezone.now() > obj.due_at:
@@ -73,5 +72,130 @@ class IssueInputSerializer(serializers.Serializer):
     user_id = serializers.IntegerField(required=False, allow_null=True)
 
 
+class HoldInputSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Hold
+        fields = ("id", "user", "book", "status", "loan", "created_at")
+        read_only_fields = fields
+
+
 class ReturnInputSerializer(serializers.Serializer):
     loan_id = serializers.IntegerField()
+
+
+class BulkIssueInputSerializer(serializers.Serializer):
+    book_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=100
+    )
+    user_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class BulkReturnInputSerializer(serializers.Serializer):
+    loan_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=100
+    )
+
+
+class BulkItemResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField(help_text="book_id или loan_id из запроса")
+    ok = serializers.BooleanField()
+    detail = serializers.CharField(source="error", allow_null=True)
+    loan = LoanSerializer(allow_null=True)
+
+
+class BulkResultSerializer(serializers.Serializer):
+    succeeded = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    results = BulkItemResultSerializer(many=True)
+
+
+class BookImportRowSerializer(serializers.Serializer):
+    """Одна запись файла импорта (imports.import_books)."""
+
+    isbn = serializers.CharField(max_length=32)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True, required=False, default="")
+    genre = serializers.ChoiceField(
+        choices=Book.Genre.choices, required=False, default=Book.Genre.OTHER
+    )
+    published_year = serializers.IntegerField(min_value=0)
+    author_last_name = serializers.CharField(max_length=120)
+    author_first_name = serializers.CharField(
+        max_length=120, allow_blank=True, required=False, default=""
+    )
+    copies_total = serializers.IntegerField(min_value=0, required=False, default=1)
+
+
+class BookImportInputSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text="CSV, NDJSON или JSON-массив в UTF-8")
+    format = serializers.ChoiceField(
+        choices=("csv", "ndjson", "json"),
+        required=False,
+        help_text="По умолчанию — по расширению файла",
+    )
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+
+class ImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField(help_text="Номер записи в файле, с 1")
+    isbn = serializers.CharField(allow_null=True)
+    errors = serializers.DictField()
+
+
+class ImportReportSerializer(serializers.Serializer):
+    dry_run = serializers.BooleanField()
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    authors_created = serializers.IntegerField()
+    duplicates = serializers.IntegerField(
+        help_text="Записи, перекрытые более поздней записью с тем же ISBN"
+    )
+    failed = serializers.IntegerField()
+    errors = ImportErrorSerializer(many=True)
+
+
+class StatsQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, max_value=366, default=30)
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class GenreStatSerializer(serializers.Serializer):
+    genre = serializers.CharField()
+    label = serializers.CharField()
+    books = serializers.IntegerField()
+    copies_total = serializers.IntegerField()
+    copies_available = serializers.IntegerField()
+
+
+class DayStatSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    issued = serializers.IntegerField()
+
+
+class AuthorStatSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    loans = serializers.IntegerField()
+
+
+class StatsSerializer(serializers.Serializer):
+    genres = GenreStatSerializer(many=True)
+    loans_per_day = DayStatSerializer(many=True)
+    active_loans = serializers.IntegerField()
+    overdue_loans = serializers.IntegerField()
+    top_authors = AuthorStatSerializer(many=True)
+
+
+class RecommendationQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class RecommendationSerializer(serializers.Serializer):
+    """score: выдач за окно (popular) или общих читателей (also-borrowed)."""
+
+    book = BookSerializer()
+    score = serializers.IntegerField()
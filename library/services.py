@@ -1,23 +1,36 @@
+from collections import Counter
+from dataclasses import dataclass
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Least, Now
 from django.utils import timezone
 
-from .models import Book, Loan
+from .models import Book, Hold, Loan, LoanArchive, LoanHistory
+from .recommendations import record_co_borrows
+from .replicas import pin_to_primary
+from .stats import StatDeltas, add_stats
+from .versions import bump_table_version
 
 
-@transaction.atomic
-def issue_book(
-    *, actor, book_id: int, borrower_id: int | None = None, days: int | None = None
-) -> Loan:
-    """
-    Выдать книгу.
-    - actor: кто инициирует (для проверок прав)
-    - borrower_id: кому выдаём (если None → actor.id, т.е. самовыдача)
-    - транзакция + select_for_update на книгу
-    """
+@dataclass
+class BulkItemResult:
+    """Результат одного элемента пакетной операции: займ или текст ошибки."""
+
+    id: int
+    loan: Loan | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _check_issue_permissions(actor, borrower_id):
     if borrower_id is None:
         borrower_id = actor.id
 
@@ -25,20 +38,40 @@ def issue_book(
         raise PermissionDenied("Вы не можете выдавать книги другим пользователям")
     if not actor.is_staff and not settings.ALLOW_SELF_ISSUE:
         raise PermissionDenied("Вы не можете самостоятельно брать книги")
+    return borrower_id
 
-    book = Book.objects.select_for_update().get(pk=book_id)
 
-    if book.copies_available <= 0:
-        raise ValidationError("Все копии этой книги недоступны")
+def bump_loan_version(*models):
+    """
+    Сменить версию займов (ключ count в counting) вместе с `models`.
+    LoanHistory — VIEW поверх займов: её count меняется вместе с ними.
+    """
+    bump_table_version(Loan, LoanHistory, *models)
 
+
+def _loan_period(days):
     due_days = days or settings.LOAN_DEFAULT_DAYS
     issued_at = timezone.now()
-    due_at = issued_at + timedelta(days=due_days)
+    return issued_at, issued_at + timedelta(days=due_days)
+
+
+@transaction.atomic
+def issue_book(
+    *, actor, book_id: int, borrower_id: int | None = None, days: int | None = None
+) -> Loan:
+    """
+    Выдать книгу.
+    - actor: кто инициирует (для проверок прав)
+    - borrower_id: кому выдаём (если None → actor.id, т.е. самовыдача)
+    - без select_for_update: копия списывается одним условным UPDATE
+    """
+    borrower_id = _check_issue_permissions(actor, borrower_id)
+    issued_at, due_at = _loan_period(days)
 
     try:
         loan = Loan.objects.create(
             user_id=borrower_id,
-            book=book,
+            book_id=book_id,
             issued_at=issued_at,
             due_at=due_at,
             status=Loan.Status.ISSUED,
@@ -46,11 +79,22 @@ def issue_book(
     except IntegrityError as e:
         raise ValidationError("Этот пользователь уже взял эту книгу") from e
 
-    book.copies_available -= 1
-    if book.copies_available < 0:
-        raise ValidationError("Вы не можете взять книгу")
-    book.save(update_fields=["copies_available"])
+    # Списываем копию последним шагом: блокировка строки книги держится
+    # только от этого UPDATE до коммита. При неудаче откатывается и займ.
+    taken = take_copy(book_id)
+    if taken is None:
+        if not Book.objects.filter(pk=book_id).exists():
+            raise Book.DoesNotExist("Книга не найдена")
+        raise ValidationError("Все копии этой книги недоступны")
 
+    genre, author_id = taken
+    bump_loan_version()
+    add_stats(
+        StatDeltas().issued(
+            genre=genre, author_id=author_id, issued_at=issued_at, due_at=due_at
+        )
+    )
+    pin_to_primary(actor.id, borrower_id)
     return loan
 
 
@@ -60,10 +104,15 @@ def return_loan(*, actor, loan_id: int) -> Loan:
     Возврат книги.
     - увеличиваем copies_available
     - ставим returned_at, статус RETURNED
+    - освободившуюся копию выдаём первому в очереди (allocate_holds)
+    - пары «с этой книгой также брали» (recommendations.record_co_borrows)
     - только владелец займа или staff
     """
+    # блокируем только строку займа (повторный возврат), книгу — нет
     loan = (
-        Loan.objects.select_for_update().select_related("book", "user").get(pk=loan_id)
+        Loan.objects.select_for_update(of=("self",))
+        .select_related("book", "user")
+        .get(pk=loan_id)
     )
 
     if not actor.is_staff and loan.user_id != actor.id:
@@ -74,11 +123,418 @@ def return_loan(*, actor, loan_id: int) -> Loan:
     loan.returned_at = timezone.now()
     loan.status = Loan.Status.RETURNED
     loan.save(update_fields=["returned_at", "status"])
+    bump_loan_version()
 
-    book = loan.book
-    book.copies_available += 1
-    if book.copies_available > book.copies_total:
-        book.copies_available = book.copies_total
-    book.save(update_fields=["copies_available"])
-
+    copy_returned = return_copy(loan.book_id)
+    deltas = StatDeltas().returned(
+        genre=loan.book.genre, due_at=loan.due_at, copy_returned=copy_returned
+    )
+    # копия сразу уходит первому в очереди, если очередь есть
+    if copy_returned and not allocate_holds(loan.book_id, deltas=deltas):
+        loan.book.copies_available = min(
+            loan.book.copies_available + 1, loan.book.copies_total
+        )
+    add_stats(deltas)
+    record_co_borrows(loan.user_id, {loan.pk: loan.book_id})
+    pin_to_primary(actor.id, loan.user_id)
     return loan
+
+
+def take_copy(book_id: int) -> tuple[str, int] | None:
+    """
+    `UPDATE ... SET copies_available = copies_available - 1
+    WHERE id = %s AND copies_available > 0 RETURNING genre, author_id` —
+    без явной блокировки, не уходит ниже нуля; жанр и автор нужны статистике,
+    RETURNING избавляет от отдельного SELECT. None — свободных копий нет
+    (или нет книги).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Book._meta.db_table} "
+            "SET copies_available = copies_available - 1, "
+            "updated_at = STATEMENT_TIMESTAMP() "
+            "WHERE id = %s AND copies_available > 0 "
+            "RETURNING genre, author_id",
+            [book_id],
+        )
+        taken = cursor.fetchone()
+    if taken is not None:
+        bump_table_version(Book)
+    return taken
+
+
+def return_copy(book_id: int) -> bool:
+    """Вернуть копию, не превышая copies_total."""
+    returned = Book.objects.filter(
+        pk=book_id, copies_available__lt=F("copies_total")
+    ).update(copies_available=F("copies_available") + 1, updated_at=Now())
+    if returned:
+        bump_table_version(Book)
+    return bool(returned)
+
+
+@transaction.atomic
+def place_hold(*, actor, book_id: int, borrower_id: int | None = None) -> Hold:
+    """
+    Встать в очередь на книгу.
+    - есть свободная копия — выдаём сразу (заявка FULFILLED со ссылкой на займ);
+    - иначе — заявка WAITING; копию выдаст возврат (allocate_holds).
+    Строка книги блокируется: параллельный возврат либо успеет раньше
+    (и копия будет выдана здесь), либо дождётся коммита и увидит заявку.
+    """
+    borrower_id = _check_issue_permissions(actor, borrower_id)
+    available = (
+        Book.objects.select_for_update()
+        .filter(pk=book_id)
+        .values_list("copies_available", flat=True)
+        .first()
+    )
+    if available is None:
+        raise Book.DoesNotExist("Книга не найдена")
+    if Loan.objects.filter(
+        user_id=borrower_id, book_id=book_id, returned_at__isnull=True
+    ).exists():
+        raise ValidationError("Этот пользователь уже взял эту книгу")
+
+    if available > 0:
+        loan = issue_book(actor=actor, book_id=book_id, borrower_id=borrower_id)
+        return Hold.objects.create(
+            user_id=borrower_id,
+            book_id=book_id,
+            status=Hold.Status.FULFILLED,
+            loan=loan,
+        )
+    try:
+        return Hold.objects.create(user_id=borrower_id, book_id=book_id)
+    except IntegrityError as e:
+        raise ValidationError("Этот пользователь уже в очереди на эту книгу") from e
+
+
+def cancel_hold(*, actor, book_id: int, borrower_id: int | None = None) -> None:
+    """Выйти из очереди. Заявку, которой уже выдают копию, не отменить."""
+    borrower_id = _check_issue_permissions(actor, borrower_id)
+    cancelled = Hold.objects.filter(
+        user_id=borrower_id, book_id=book_id, status=Hold.Status.WAITING
+    ).update(status=Hold.Status.CANCELLED, updated_at=Now())
+    if not cancelled:
+        raise ValidationError("Заявка не найдена")
+
+
+def allocate_holds(book_id: int, copies: int = 1, *, deltas: StatDeltas) -> list[Loan]:
+    """
+    Выдать `copies` свободных копий первым в очереди: только что
+    возвращённых или добавленных (админка, импорт каталога).
+
+    Голова очереди читается по частичному индексу hold_waiting_fifo_idx
+    (`ORDER BY created_at, id LIMIT copies`) с FOR UPDATE SKIP LOCKED:
+    заявку, которую сейчас отменяют, пропускаем, а не ждём. Заявки
+    читателей, у которых книга уже на руках, пропускаются. Вызывается в
+    транзакции, увеличившей copies_available; возвращает созданные займы.
+    Изменения статистики добавляются в `deltas` вызывающего: add_stats —
+    один раз в конце транзакции, иначе порядок блокировок счётчиков
+    в разных транзакциях может не совпасть.
+    """
+    if copies <= 0:
+        return []
+    holds = list(
+        Hold.objects.select_for_update(skip_locked=True)
+        .filter(book_id=book_id, status=Hold.Status.WAITING)
+        .exclude(
+            Exists(
+                Loan.objects.filter(
+                    user_id=OuterRef("user_id"),
+                    book_id=OuterRef("book_id"),
+                    returned_at__isnull=True,
+                )
+            )
+        )
+        .order_by("created_at", "pk")[:copies]
+    )
+    loans = []
+    for hold in holds:
+        taken = take_copy(book_id)
+        if taken is None:
+            break
+        issued_at, due_at = _loan_period(None)
+        hold.loan = Loan.objects.create(
+            user_id=hold.user_id,
+            book_id=book_id,
+            issued_at=issued_at,
+            due_at=due_at,
+            status=Loan.Status.ISSUED,
+        )
+        hold.status = Hold.Status.FULFILLED
+        hold.save(update_fields=["status", "loan"])
+        loans.append(hold.loan)
+        genre, author_id = taken
+        deltas.issued(
+            genre=genre, author_id=author_id, issued_at=issued_at, due_at=due_at
+        )
+    if loans:
+        bump_loan_version()
+    return loans
+
+
+def _per_book_delta(counts: Counter):
+    """CASE id WHEN .. THEN n .. END — сдвиг счётчика для каждой книги одним UPDATE."""
+    return Case(
+        *(When(pk=book_id, then=Value(n)) for book_id, n in counts.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+@transaction.atomic
+def issue_books_bulk(
+    *,
+    actor,
+    book_ids: list[int],
+    borrower_id: int | None = None,
+    days: int | None = None,
+) -> list[BulkItemResult]:
+    """
+    Выдать несколько книг одному читателю за одну транзакцию.
+    - займы создаются bulk_create, счётчики меняются одним UPDATE;
+    - порядок как в issue_book: сначала займы, потом строки книг
+      (одним запросом в порядке id) — иначе параллельная выдача, которая
+      уже вставила займ и ждёт строку книги, и эта взаимоблокируются;
+    - займ, который не встал из-за такой выдачи той же книги, и книга без
+      свободных копий после блокировки — ошибка только этого элемента;
+    - ошибка по одной книге не мешает остальным (результат на каждый элемент).
+    Права и читатель проверяются для всего запроса целиком.
+    """
+    borrower_id = _check_issue_permissions(actor, borrower_id)
+    try:
+        borrower = get_user_model().objects.get(pk=borrower_id)
+    except get_user_model().DoesNotExist:
+        raise ValidationError("Пользователь не найден") from None
+    issued_at, due_at = _loan_period(days)
+
+    # без блокировки: copies_available — предварительная проверка,
+    # окончательная — по заблокированным строкам ниже
+    books = {
+        book.pk: book
+        for book in Book.objects.filter(pk__in=set(book_ids)).only(
+            "id", "title", "genre", "author_id", "copies_available", "copies_total"
+        )
+    }
+    taken = set(
+        Loan.objects.filter(
+            user_id=borrower_id, book_id__in=books, returned_at__isnull=True
+        ).values_list("book_id", flat=True)
+    )
+
+    results, issued, counts = [], [], Counter()
+    for book_id in book_ids:
+        book = books.get(book_id)
+        if book is None:
+            results.append(BulkItemResult(book_id, error="Книга не найдена"))
+        elif book_id in taken:
+            results.append(
+                BulkItemResult(book_id, error="Этот пользователь уже взял эту книгу")
+            )
+        elif book.copies_available - counts[book_id] <= 0:
+            results.append(
+                BulkItemResult(book_id, error="Все копии этой книги недоступны")
+            )
+        else:
+            loan = Loan(
+                user=borrower,
+                book=book,
+                issued_at=issued_at,
+                due_at=due_at,
+                status=Loan.Status.ISSUED,
+            )
+            issued.append(BulkItemResult(book_id, loan=loan))
+            results.append(issued[-1])
+            counts[book_id] += 1
+            taken.add(book_id)
+    if not issued:
+        return results
+
+    try:
+        with transaction.atomic():
+            Loan.objects.bulk_create([result.loan for result in issued])
+    except IntegrityError:
+        # ту же книгу этому читателю только что выдал issue_book: займы
+        # по одному, каждый в своей точке сохранения
+        for result in issued:
+            try:
+                with transaction.atomic():
+                    Loan.objects.bulk_create([result.loan])
+            except IntegrityError:
+                result.loan, result.error = None, "Этот пользователь уже взял эту книгу"
+        issued = [result for result in issued if result.ok]
+
+    available = dict(
+        Book.objects.select_for_update()
+        .filter(pk__in={result.id for result in issued})
+        .order_by("pk")
+        .values_list("pk", "copies_available")
+    )
+    counts, rejected = Counter(), []
+    for result in issued:
+        if available.get(result.id, 0) - counts[result.id] <= 0:
+            # копии разобрали после предварительной проверки
+            rejected.append(result.loan.pk)
+            result.loan, result.error = None, "Все копии этой книги недоступны"
+        else:
+            counts[result.id] += 1
+    if rejected:
+        Loan.objects.filter(pk__in=rejected).delete()
+    if not counts:
+        return results
+
+    Book.objects.filter(pk__in=counts).update(
+        copies_available=F("copies_available") - _per_book_delta(counts),
+        updated_at=Now(),
+    )
+    deltas = StatDeltas()
+    for book_id, n in counts.items():
+        books[book_id].copies_available = available[book_id] - n
+    for result in results:
+        if result.loan is not None:
+            deltas.issued(
+                genre=result.loan.book.genre,
+                author_id=result.loan.book.author_id,
+                issued_at=issued_at,
+                due_at=due_at,
+            )
+    add_stats(deltas)
+    bump_loan_version(Book)
+    pin_to_primary(actor.id, borrower_id)
+    return results
+
+
+@transaction.atomic
+def return_loans_bulk(*, actor, loan_ids: list[int]) -> list[BulkItemResult]:
+    """
+    Вернуть несколько займов за одну транзакцию: займы и их книги
+    блокируются упорядоченными запросами, займы закрываются одним UPDATE,
+    счётчики книг — другим (не выше copies_total). Результат на каждый элемент.
+    """
+    loans = {
+        loan.pk: loan
+        for loan in Loan.objects.select_for_update(of=("self",))
+        .select_related("book", "user")
+        .filter(pk__in=set(loan_ids))
+        .order_by("pk")
+    }
+
+    results, returned, counts = [], set(), Counter()
+    for loan_id in loan_ids:
+        loan = loans.get(loan_id)
+        if loan is None:
+            results.append(BulkItemResult(loan_id, error="Выдача не найдена"))
+        elif not actor.is_staff and loan.user_id != actor.id:
+            results.append(
+                BulkItemResult(loan_id, error="Вы не можете возвращать чужие книги")
+            )
+        elif loan.returned_at or loan_id in returned:
+            results.append(BulkItemResult(loan_id, error="Книга уже возвращена"))
+        else:
+            returned.add(loan_id)
+            counts[loan.book_id] += 1
+            results.append(BulkItemResult(loan_id, loan=loan))
+
+    if returned:
+        now = timezone.now()
+        locked = Book.objects.select_for_update().filter(pk__in=counts).order_by("pk")
+        # жанр и число «свободных мест» до copies_total — для статистики
+        free = {
+            pk: (genre, total - available)
+            for pk, genre, total, available in locked.values_list(
+                "pk", "genre", "copies_total", "copies_available"
+            )
+        }
+        Loan.objects.filter(pk__in=returned).update(
+            returned_at=now, status=Loan.Status.RETURNED, updated_at=Now()
+        )
+        Book.objects.filter(pk__in=counts).update(
+            copies_available=Least(
+                F("copies_total"), F("copies_available") + _per_book_delta(counts)
+            ),
+            updated_at=Now(),
+        )
+        deltas = StatDeltas()
+        for loan_id in returned:
+            loan = loans[loan_id]
+            loan.returned_at, loan.status = now, Loan.Status.RETURNED
+            deltas.returned(
+                genre=loan.book.genre, due_at=loan.due_at, copy_returned=False
+            )
+        for book_id, n in counts.items():
+            genre, room = free[book_id]
+            deltas.book(genre, available=min(n, room))
+        for book_id in sorted(counts):
+            allocate_holds(
+                book_id, min(counts[book_id], free[book_id][1]), deltas=deltas
+            )
+        add_stats(deltas)
+        by_user = {}
+        for loan_id in sorted(returned):
+            loan = loans[loan_id]
+            by_user.setdefault(loan.user_id, {})[loan_id] = loan.book_id
+        for user_id, user_returned in sorted(by_user.items()):
+            record_co_borrows(user_id, user_returned)
+        bump_loan_version(Book)
+        pin_to_primary(actor.id, *by_user)
+    return results
+
+
+def mark_overdue_batch(*, now, batch_size: int = 1000) -> int:
+    """
+    Одна порция «просрочки»: ISSUED с due_at < now → OVERDUE.
+    Строки, которые сейчас держит return_loan, пропускаются (SKIP LOCKED) —
+    их заберёт следующий запуск, если возврат не случится. Каждая порция —
+    отдельная транзакция, поэтому прерванный прогон можно просто повторить.
+    """
+    with transaction.atomic():
+        ids = list(
+            Loan.objects.select_for_update(skip_locked=True)
+            .filter(status=Loan.Status.ISSUED, returned_at__isnull=True, due_at__lt=now)
+            .order_by("due_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        marked = Loan.objects.filter(
+            pk__in=ids, status=Loan.Status.ISSUED, returned_at__isnull=True
+        ).update(status=Loan.Status.OVERDUE, updated_at=Now())
+        if marked:
+            bump_loan_version()
+        return marked
+
+
+ARCHIVE_FIELDS = (
+    "id",
+    "user_id",
+    "book_id",
+    "issued_at",
+    "due_at",
+    "returned_at",
+    "status",
+    "created_at",
+    "updated_at",
+)
+
+
+def archive_loans_batch(*, cutoff, after_id: int = 0, batch_size: int = 1000):
+    """
+    Перенести порцию возвращённых до `cutoff` выдач в LoanArchive
+    (INSERT + DELETE в одной транзакции, по возрастанию id после `after_id`).
+    Возвращает (сколько перенесено, последний просмотренный id или None).
+    """
+    with transaction.atomic():
+        rows = list(
+            Loan.objects.select_for_update(skip_locked=True)
+            .filter(pk__gt=after_id, returned_at__lt=cutoff)
+            .order_by("pk")
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0, None
+        LoanArchive.objects.bulk_create(LoanArchive(**row) for row in rows)
+        Loan.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        bump_loan_version()
+    return len(rows), rows[-1]["id"]
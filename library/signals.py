@@ -0,0 +1,98 @@
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Author, Book
+from .search import (
+    AUTHOR_SEARCH_FIELDS,
+    BOOK_SEARCH_FIELDS,
+    refresh_author_search_vectors,
+    refresh_book_search_vectors,
+)
+from .stats import StatDeltas, add_stats
+from .versions import bump_table_version
+
+BOOK_STAT_FIELDS = frozenset({"genre", "copies_total", "copies_available"})
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Book)
+def update_book_search_vector(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, BOOK_SEARCH_FIELDS):
+        refresh_book_search_vectors(Book.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def update_author_search_vector(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, AUTHOR_SEARCH_FIELDS):
+        refresh_author_search_vectors(Author.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def update_books_author_display_name(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    if created or not _touches(update_fields, {"first_name", "last_name"}):
+        return
+    books = Book.objects.filter(author_id=instance.pk)
+    books.update(author_display_name=str(instance), updated_at=Now())
+    refresh_book_search_vectors(books)
+    bump_table_version(Book)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def bump_catalog_version(sender, **kwargs):
+    bump_table_version(sender)
+
+
+@receiver(pre_save, sender=Book)
+def remember_book_stat_fields(sender, instance, update_fields=None, **kwargs):
+    # прежние жанр и копии — чтобы post_save поправил статистику на разницу
+    instance._stat_before = None
+    if instance.pk is not None and _touches(update_fields, BOOK_STAT_FIELDS):
+        instance._stat_before = (
+            Book.objects.filter(pk=instance.pk)
+            .values_list("genre", "copies_total", "copies_available")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Book)
+def update_book_stats(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and not _touches(update_fields, BOOK_STAT_FIELDS):
+        return
+    deltas = StatDeltas()
+    before = getattr(instance, "_stat_before", None)
+    if before is not None:
+        genre, total, available = before
+        deltas.book(genre, books=-1, copies=-total, available=-available)
+    deltas.book(
+        instance.genre,
+        books=1,
+        copies=instance.copies_total,
+        available=instance.copies_available,
+    )
+    # вызывающий сам запишет статистику одним add_stats (BookAdmin.save_model)
+    pending = getattr(instance, "_stat_deltas", None)
+    if pending is not None:
+        pending.update(deltas)
+    else:
+        add_stats(deltas)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_stats(sender, instance, **kwargs):
+    add_stats(
+        StatDeltas().book(
+            instance.genre,
+            books=-1,
+            copies=-instance.copies_total,
+            available=-instance.copies_available,
+        )
+    )
@@ -0,0 +1,213 @@
+import random
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Author, Book, Loan, StatCounter
+
+Kind = StatCounter.Kind
+
+# без stripe: топ авторов читается по индексу (kind, value DESC)
+UNSTRIPED_KINDS = frozenset({Kind.AUTHOR_LOANS})
+
+
+class StatDeltas(Counter):
+    """
+    Изменения счётчиков {(kind, bucket): delta}, записываются add_stats.
+    Методы — события каталога и выдач, которые двигают статистику.
+    """
+
+    def book(self, genre, *, books=0, copies=0, available=0):
+        self[(Kind.GENRE_BOOKS, genre)] += books
+        self[(Kind.GENRE_COPIES, genre)] += copies
+        self[(Kind.GENRE_AVAILABLE, genre)] += available
+        return self
+
+    def issued(self, *, genre, author_id, issued_at, due_at):
+        self[(Kind.GENRE_AVAILABLE, genre)] -= 1
+        self[(Kind.LOANS_ISSUED, _day(issued_at))] += 1
+        self[(Kind.ACTIVE_DUE, _day(due_at))] += 1
+        self[(Kind.AUTHOR_LOANS, str(author_id))] += 1
+        return self
+
+    def returned(self, *, genre, due_at, copy_returned=True):
+        if copy_returned:
+            self[(Kind.GENRE_AVAILABLE, genre)] += 1
+        self[(Kind.ACTIVE_DUE, _day(due_at))] -= 1
+        return self
+
+
+def _day(value):
+    return timezone.localdate(value).isoformat()
+
+
+def add_stats(deltas, using="default"):
+    """
+    Прибавить изменения одним `INSERT ... ON CONFLICT DO UPDATE SET value =
+    value + EXCLUDED.value` — в текущей транзакции, вместе с самим изменением.
+    Ключи в одном порядке во всех транзакциях — без взаимоблокировок.
+    """
+    stripe = random.randrange(settings.STATS_COUNTER_STRIPES)
+    rows = sorted(
+        (kind, bucket, 0 if kind in UNSTRIPED_KINDS else stripe, delta)
+        for (kind, bucket), delta in deltas.items()
+        if delta
+    )
+    if not rows:
+        return
+    table = StatCounter._meta.db_table
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (kind, bucket, stripe, value) VALUES {values} "
+            f"ON CONFLICT (kind, bucket, stripe) "
+            f"DO UPDATE SET value = {table}.value + EXCLUDED.value",
+            [param for row in rows for param in row],
+        )
+
+
+def _sums(kind, **bucket_filter):
+    return dict(
+        StatCounter.objects.filter(kind=kind, **bucket_filter)
+        .values_list("bucket")
+        .annotate(total=Sum("value"))
+        .values_list("bucket", "total")
+    )
+
+
+def read_stats(*, days=30, top_authors=10):
+    """
+    Статистика для /api/stats/ только из StatCounter: число читаемых строк
+    зависит от числа жанров, дней и stripe, но не от размера каталога и
+    истории выдач.
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    first_day = today - timedelta(days=days - 1)
+
+    genre_books = _sums(Kind.GENRE_BOOKS)
+    genre_copies = _sums(Kind.GENRE_COPIES)
+    genre_available = _sums(Kind.GENRE_AVAILABLE)
+    genres = [
+        {
+            "genre": genre,
+            "label": label,
+            "books": genre_books.get(genre, 0),
+            "copies_total": genre_copies.get(genre, 0),
+            "copies_available": genre_available.get(genre, 0),
+        }
+        for genre, label in Book.Genre.choices
+    ]
+
+    issued = _sums(Kind.LOANS_ISSUED, bucket__gte=first_day.isoformat())
+    loans_per_day = [
+        {"date": day, "issued": issued.get(day.isoformat(), 0)}
+        for day in (first_day + timedelta(days=n) for n in range(days))
+    ]
+
+    active_due = _sums(Kind.ACTIVE_DUE)
+    active = sum(active_due.values())
+    # сроки до сегодняшнего дня — из счётчиков, сегодняшние — по индексу
+    # loan_active_due_idx (строки одного дня)
+    start_of_today = timezone.make_aware(datetime.combine(today, time.min))
+    overdue = (
+        sum(value for day, value in active_due.items() if day < today.isoformat())
+        + Loan.objects.filter(
+            returned_at__isnull=True, due_at__gte=start_of_today, due_at__lt=now
+        ).count()
+    )
+
+    top = list(
+        StatCounter.objects.filter(kind=Kind.AUTHOR_LOANS, value__gt=0)
+        .order_by("-value")
+        .values_list("bucket", "value")[:top_authors]
+    )
+    names = {
+        str(author.pk): str(author)
+        for author in Author.objects.filter(pk__in=[int(pk) for pk, _ in top]).only(
+            "first_name", "last_name"
+        )
+    }
+
+    return {
+        "genres": genres,
+        "loans_per_day": loans_per_day,
+        "active_loans": active,
+        "overdue_loans": overdue,
+        "top_authors": [
+            {"id": int(pk), "name": names.get(pk, ""), "loans": value}
+            for pk, value in top
+        ],
+    }
+
+
+def compute_counters(apps=django_apps):
+    """Значения всех счётчиков с нуля — GROUP BY по каталогу и выдачам."""
+    book_model = apps.get_model("library", "Book")
+    loan_model = apps.get_model("library", "Loan")
+    # выдачи и архив по отдельности: у LoanHistory (VIEW) в состоянии
+    # миграций нет внешних ключей
+    history = (loan_model, apps.get_model("library", "LoanArchive"))
+    tz = timezone.get_current_timezone()
+
+    counters = StatDeltas()
+    for row in book_model.objects.values("genre").annotate(
+        books=Count("pk"), copies=Sum("copies_total"), available=Sum("copies_available")
+    ):
+        counters.book(
+            row["genre"],
+            books=row["books"],
+            copies=row["copies"],
+            available=row["available"],
+        )
+    for model in history:
+        for day, n in (
+            model.objects.annotate(day=TruncDate("issued_at", tzinfo=tz))
+            .values_list("day")
+            .annotate(n=Count("pk"))
+            .values_list("day", "n")
+        ):
+            counters[(Kind.LOANS_ISSUED, day.isoformat())] += n
+        for author_id, n in (
+            model.objects.values_list("book__author_id")
+            .annotate(n=Count("pk"))
+            .values_list("book__author_id", "n")
+        ):
+            counters[(Kind.AUTHOR_LOANS, str(author_id))] += n
+    for day, n in (
+        loan_model.objects.filter(returned_at__isnull=True)
+        .annotate(day=TruncDate("due_at", tzinfo=tz))
+        .values_list("day")
+        .annotate(n=Count("pk"))
+        .values_list("day", "n")
+    ):
+        counters[(Kind.ACTIVE_DUE, day.isoformat())] += n
+    return counters
+
+
+def rebuild_stats(apps=django_apps, using="default"):
+    """
+    Пересобрать StatCounter с нуля. Таблица счётчиков блокируется от записи
+    до коммита: выдачи и правки каталога, начатые во время пересборки,
+    дождутся её и добавят свои изменения к уже пересчитанным значениям.
+    """
+    counter_model = apps.get_model("library", "StatCounter")
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {counter_model._meta.db_table} IN SHARE ROW EXCLUSIVE MODE"
+            )
+        counters = compute_counters(apps)
+        counter_model.objects.using(using).all().delete()
+        rows = counter_model.objects.using(using).bulk_create(
+            counter_model(kind=kind, bucket=bucket, value=value)
+            for (kind, bucket), value in sorted(counters.items())
+            if value
+        )
+    return len(rows)
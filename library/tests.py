@@ -1,6 +1,8 @@
 from datetime import timedelta
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from model_bakery import baker
@@ -15,6 +17,9 @@ def test_authors_search_and_pagination():
     resp = client.get(reverse("authors-list"), {"search": "John", "page_size": 25})
     assert resp.status_code == 200
     assert resp.data["count"] == 30
+    assert len(resp.data["results"]) == 25
+    # по умолчанию — 20 на страницу
+    resp = client.get(reverse("authors-list"), {"search": "John"})
     assert len(resp.data["results"]) == 20
 
 
@@ -65,6 +70,349 @@ def test_books_filter_search_ordering_pagination():
     assert titles == ["The Martian"]
 
 
+def count_queries(ctx):
+    return [q for q in ctx.captured_queries if "COUNT(" in q["sql"].upper()]
+
+
+def test_books_page_count_exact_for_small_results():
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, genre="fiction", _quantity=3)
+    resp = APIClient().get(reverse("books-list"), {"genre": "fiction"})
+    assert resp.data["count"] == 3
+    assert resp.data["count_exact"] is True
+
+
+def test_books_page_count_estimated_above_threshold(settings):
+    settings.COUNT_EXACT_THRESHOLD = 0
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, _quantity=3)
+    with CaptureQueriesContext(connection) as ctx:
+        resp = APIClient().get(reverse("books-list"))
+    assert resp.status_code == 200
+    assert resp.data["count_exact"] is False
+    assert isinstance(resp.data["count"], int)
+    assert len(resp.data["results"]) == 3
+    assert not count_queries(ctx)
+
+
+@pytest.mark.parametrize("async_views", [False, True])
+def test_books_pages_not_capped_by_stale_estimate(settings, async_views):
+    from asgiref.sync import async_to_sync
+    from rest_framework.test import APIRequestFactory
+
+    from library.views import BookViewSet
+
+    settings.COUNT_EXACT_THRESHOLD = 0
+    settings.ASYNC_READ_VIEWS = async_views
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, _quantity=5)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE library_book")
+    # статистика устарела: после ANALYZE добавили ещё 45 книг (как после импорта)
+    baker.make("library.Book", author=a, _quantity=45)
+    view = BookViewSet.as_view({"get": "list"})
+    if async_views:
+        view = async_to_sync(view)
+
+    def page(number):
+        request = APIRequestFactory().get("/", {"page": number, "page_size": 20})
+        return view(request).render()
+
+    first, second, third = page(1), page(2), page(3)
+    assert first.data["count_exact"] is False
+    assert first.data["next"] and second.data["next"]
+    assert len(second.data["results"]) == 20
+    assert len(third.data["results"]) == 10 and third.data["next"] is None
+    assert third.data["count"] == 50
+    assert page(4).status_code == 404
+
+
+def test_books_page_count_cached_per_filter():
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, genre="fiction", _quantity=2)
+    baker.make("library.Book", author=a, genre="science")
+    client = APIClient()
+    client.get(reverse("books-list"), {"genre": "fiction"})
+
+    with CaptureQueriesContext(connection) as ctx:
+        again = client.get(reverse("books-list"), {"genre": "fiction", "page": 1})
+        other = client.get(reverse("books-list"), {"genre": "science"})
+    assert again.data["count"] == 2
+    assert other.data["count"] == 1
+    assert len(count_queries(ctx)) == 1
+
+
+def test_loans_page_count_changes_after_loan_writes():
+    from library.services import mark_overdue_batch
+
+    reader = baker.make("users.User")
+    books = [make_book(copies_total=2) for _ in range(2)]
+    client = APIClient()
+    client.force_authenticate(user=reader)
+
+    def counts():
+        resp = client.get(reverse("loans-list"))
+        history = client.get(reverse("loans-list"), {"include_archived": 1})
+        overdue = client.get(reverse("loans-list"), {"status": "OVERDUE"})
+        return resp.data["count"], history.data["count"], overdue.data["count"]
+
+    assert counts() == (0, 0, 0)
+    # count закэширован: аннотация списка с «сейчас» не меняет ключ
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(reverse("loans-list"))
+    assert count_queries(ctx) == []
+    client.post(reverse("loans-issue"), {"book_id": books[0].pk}, format="json")
+    assert counts() == (1, 1, 0)
+    client.post(reverse("loans-issue-bulk"), {"book_ids": [books[1].pk]}, format="json")
+    assert counts() == (2, 2, 0)
+    mark_overdue_batch(now=timezone.now() + timedelta(days=30))
+    assert counts() == (2, 2, 2)
+
+
+def collect_cursor_pages(client, url, params):
+    pages = []
+    resp = client.get(url, params)
+    while True:
+        assert resp.status_code == 200
+        assert "count" not in resp.data
+        pages.append(resp.data)
+        if not resp.data["next"]:
+            return pages
+        resp = client.get(resp.data["next"])
+
+
+def test_books_cursor_pagination_stable_on_ties_without_count():
+    a = baker.make("library.Author")
+    books = [
+        baker.make("library.Book", author=a, title=title, genre="fiction")
+        for title in ["B", "A", "B", "C", "B", "A", "D"]
+    ]
+    baker.make("library.Book", author=a, title="A", genre="science")
+    client = APIClient()
+
+    with CaptureQueriesContext(connection) as ctx:
+        pages = collect_cursor_pages(
+            client,
+            reverse("books-list"),
+            {"pagination": "cursor", "genre": "fiction", "page_size": 3},
+        )
+
+    ids = [item["id"] for page in pages for item in page["results"]]
+    expected = [b.id for b in sorted(books, key=lambda b: (b.title, b.id))]
+    assert ids == expected
+    assert [len(page["results"]) for page in pages] == [3, 3, 1]
+    assert pages[0]["previous"] is None
+    assert not any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries)
+
+    back = client.get(pages[-1]["previous"])
+    assert [i["id"] for i in back.data["results"]] == expected[3:6]
+    assert back.data["next"] == pages[1]["next"]
+
+
+def test_books_cursor_pagination_follows_ordering_param():
+    a = baker.make("library.Author")
+    for year in (2001, 1999, 2001, 2010):
+        baker.make("library.Book", author=a, published_year=year)
+    client = APIClient()
+    pages = collect_cursor_pages(
+        client,
+        reverse("books-list"),
+        {"pagination": "cursor", "ordering": "-published_year", "page_size": 2},
+    )
+    years = [item["published_year"] for page in pages for item in page["results"]]
+    assert years == [2010, 2001, 2001, 1999]
+
+
+def test_loans_cursor_pagination_by_issued_at():
+    c, u = auth_client()
+    issued = timezone.now()
+    for _ in range(5):
+        baker.make(
+            "library.Loan",
+            user=u,
+            book=make_book(),
+            issued_at=issued,
+            due_at=issued + timedelta(days=14),
+        )
+    pages = collect_cursor_pages(
+        c, reverse("loans-list"), {"pagination": "cursor", "page_size": 2}
+    )
+    ids = [item["id"] for page in pages for item in page["results"]]
+    assert len(ids) == len(set(ids)) == 5
+
+
+@pytest.mark.parametrize("ordering", ["returned_at", "-returned_at"])
+def test_loans_cursor_pagination_by_nullable_returned_at(ordering):
+    c, u = auth_client()
+    issued = timezone.now() - timedelta(days=5)
+    returned = [issued + timedelta(days=1), issued + timedelta(days=2), None, None]
+    loans = [
+        baker.make(
+            "library.Loan",
+            user=u,
+            book=make_book(),
+            issued_at=issued,
+            due_at=issued + timedelta(days=14),
+            returned_at=returned_at,
+            status="RETURNED" if returned_at else "ISSUED",
+        )
+        for returned_at in returned
+    ]
+    pages = collect_cursor_pages(
+        c,
+        reverse("loans-list"),
+        {"pagination": "cursor", "ordering": ordering, "page_size": 1},
+    )
+    ids = [item["id"] for page in pages for item in page["results"]]
+    # NULL (на руках) — после всех дат по возрастанию и перед ними по убыванию
+    expected = [loan.id for loan in loans]
+    if ordering.startswith("-"):
+        expected = expected[2:] + expected[1::-1]
+    assert ids == expected
+
+    back = c.get(pages[-1]["previous"])
+    assert [i["id"] for i in back.data["results"]] == expected[-2:-1]
+
+
+def test_cursor_pagination_rejects_garbage_cursor():
+    resp = APIClient().get(reverse("authors-list"), {"cursor": "not-a-cursor"})
+    assert resp.status_code == 404
+
+
+def search_titles(params):
+    resp = APIClient().get(reverse("books-list"), params)
+    assert resp.status_code == 200
+    return [i["title"] for i in resp.data["results"]]
+
+
+def test_books_search_ranks_title_over_description():
+    a = baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    baker.make("library.Book", author=a, title="Dandelion Wine", description="mars")
+    baker.make("library.Book", author=a, title="Mars Needs Moms")
+    baker.make("library.Book", author=a, title="Something Else")
+    assert search_titles({"search": "mars"}) == ["Mars Needs Moms", "Dandelion Wine"]
+    assert len(search_titles({"search": "bradbury"})) == 3
+
+
+def test_books_search_tolerates_typos_and_respects_ordering():
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, title="Fahrenheit 451", published_year=1953)
+    baker.make("library.Book", author=a, title="Fahrenheit 9/11", published_year=2004)
+    baker.make("library.Book", author=a, title="Solaris", published_year=1961)
+    assert set(search_titles({"search": "Farenheit"})) == {
+        "Fahrenheit 451",
+        "Fahrenheit 9/11",
+    }
+    assert search_titles({"search": "Farenheit", "ordering": "-published_year"}) == [
+        "Fahrenheit 9/11",
+        "Fahrenheit 451",
+    ]
+
+
+def test_book_search_vector_follows_author_rename():
+    a = baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    baker.make("library.Book", author=a, title="Dandelion Wine")
+    a.last_name = "Asimov"
+    a.save()
+    assert search_titles({"search": "asimov"}) == ["Dandelion Wine"]
+    assert search_titles({"search": "bradbury"}) == []
+
+
+def test_books_title_and_description_filters():
+    a = baker.make("library.Author")
+    baker.make("library.Book", author=a, title="Python 101", description="snakes")
+    baker.make("library.Book", author=a, title="Snakes", description="python basics")
+    assert search_titles({"title": "Pyton"}) == ["Python 101"]
+    assert search_titles({"description": "python"}) == ["Snakes"]
+
+
+def test_authors_search_and_name_filters():
+    baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    baker.make("library.Author", first_name="Andy", last_name="Weir", bio="Martian")
+    client = APIClient()
+    resp = client.get(reverse("authors-list"), {"last_name": "Bradbery"})
+    assert [i["last_name"] for i in resp.data["results"]] == ["Bradbury"]
+    resp = client.get(reverse("authors-list"), {"search": "martian"})
+    assert [i["last_name"] for i in resp.data["results"]] == ["Weir"]
+
+
+def explain(queryset, disable=("seqscan",)):
+    # на маленьких таблицах seq scan всегда дешевле — выключаем его, чтобы
+    # план показывал, каким индексом запрос может быть обслужен
+    with connection.cursor() as cursor:
+        for node in disable:
+            cursor.execute(f"SET LOCAL enable_{node} = off")
+    return queryset.explain()
+
+
+def test_books_author_name_filter_prefix_and_full_name():
+    ray = baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    andy = baker.make("library.Author", first_name="Andy", last_name="Weir")
+    baker.make("library.Book", author=ray, title="Fahrenheit 451")
+    baker.make("library.Book", author=andy, title="The Martian")
+    assert search_titles({"author_name": "Brad"}) == ["Fahrenheit 451"]
+    assert search_titles({"author_name": "bradbury  RAY"}) == ["Fahrenheit 451"]
+    assert search_titles({"author_name": "andy"}) == ["The Martian"]
+    assert search_titles({"author_name": "Weir Ray"}) == []
+
+
+def test_books_author_name_filter_uses_trigram_index():
+    from library.filters import BookFilter
+    from library.models import Book
+
+    baker.make("library.Book", _quantity=5)
+    qs = BookFilter({"author_name": "Bradbury Ray"}, queryset=Book.objects.all()).qs
+    plan = explain(qs, disable=("seqscan", "indexscan"))
+    assert plan.count("Bitmap Index Scan on author_full_name_trgm_idx") == 1
+    assert "Filter:" not in plan
+
+
+def test_books_list_reads_single_table_with_denormalized_author():
+    a = baker.make("library.Author", first_name="Ray", last_name="Bradbury", bio="x")
+    book = baker.make("library.Book", author=a, title="Fahrenheit 451")
+    assert book.author_display_name == "Bradbury Ray"
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = APIClient().get(reverse("books-list"))
+    assert resp.data["results"][0]["author_name"] == "Bradbury Ray"
+    select = next(q["sql"] for q in ctx.captured_queries if "library_book" in q["sql"])
+    assert "library_author" not in select
+    assert "search_vector" not in select
+
+
+def test_author_rename_updates_book_display_name():
+    a = baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    book = baker.make("library.Book", author=a)
+    a.first_name = "Raymond"
+    a.save()
+    book.refresh_from_db()
+    assert book.author_display_name == "Bradbury Raymond"
+
+    other = baker.make("library.Author", first_name="Andy", last_name="Weir")
+    book.author = other
+    book.save(update_fields=["author"])
+    book.refresh_from_db()
+    assert book.author_display_name == "Weir Andy"
+
+
+def test_backfill_author_display_name_command():
+    from django.core.management import call_command
+
+    from library.models import Book
+
+    a = baker.make("library.Author", first_name="Ray", last_name="Bradbury")
+    books = baker.make("library.Book", author=a, _quantity=3)
+    Book.objects.update(author_display_name="")
+    call_command("backfill_author_display_name", "--batch-size", "2")
+    names = set(
+        Book.objects.filter(pk__in=[b.pk for b in books]).values_list(
+            "author_display_name", flat=True
+        )
+    )
+    assert names == {"Bradbury Ray"}
+    assert search_titles({"search": "bradbury"})
+
+
 def test_books_create_requires_staff():
     a = baker.make("library.Author")
     client = APIClient()
@@ -220,3 +568,1712 @@ def test_effective_status_overdue_calculated_on_the_fly():
     r = c.get(reverse("loans-detail", args=[loan.id]))
     assert r.status_code == 200
     assert r.data["effective_status"] == "OVERDUE"
+
+
+def test_books_sparse_fieldset_loads_only_requested_columns():
+    b = make_book(copies_total=2)
+    with CaptureQueriesContext(connection) as ctx:
+        resp = APIClient().get(
+            reverse("books-list"), {"fields": "id,title,copies_available"}
+        )
+    assert resp.status_code == 200
+    assert resp.data["results"][0] == {
+        "id": b.id,
+        "title": b.title,
+        "copies_available": 2,
+    }
+    select = next(q["sql"] for q in ctx.captured_queries if "library_book" in q["sql"])
+    assert '"library_book"."description"' not in select
+    assert '"library_book"."isbn"' not in select
+
+    resp = APIClient().get(
+        reverse("books-detail", args=[b.id]), {"exclude": "description"}
+    )
+    assert "description" not in resp.data
+    assert resp.data["author_name"] == b.author_display_name
+
+
+def test_loans_sparse_fieldset_keeps_effective_status():
+    c, u = auth_client()
+    b = make_book(copies_total=1)
+    baker.make(
+        "library.Loan",
+        user=u,
+        book=b,
+        due_at=timezone.now() - timedelta(days=1),
+        returned_at=None,
+        status="ISSUED",
+    )
+    with CaptureQueriesContext(connection) as ctx:
+        resp = c.get(reverse("loans-list"), {"fields": "id,effective_status"})
+    assert resp.status_code == 200
+    assert set(resp.data["results"][0]) == {"id", "effective_status"}
+    assert resp.data["results"][0]["effective_status"] == "OVERDUE"
+    select = next(q["sql"] for q in ctx.captured_queries if "library_loan" in q["sql"])
+    assert "users_user" not in select
+
+
+def test_sparse_fieldset_rejects_unknown_fields():
+    resp = APIClient().get(reverse("books-list"), {"fields": "id,secret"})
+    assert resp.status_code == 400
+    assert "secret" in str(resp.data["fields"])
+
+
+@pytest.mark.parametrize(
+    "url_name, params",
+    [
+        ("books-list", {}),
+        ("books-list", {"search": "mars", "page_size": 2}),
+        ("books-list", {"fields": "id,author_name,created_at"}),
+        ("books-list", {"pagination": "cursor", "ordering": "-published_year"}),
+        ("authors-list", {}),
+        ("authors-list", {"exclude": "bio"}),
+        ("loans-list", {}),
+        ("loans-list", {"pagination": "cursor", "fields": "id,effective_status"}),
+    ],
+)
+def test_fast_list_matches_serializer_output(monkeypatch, url_name, params):
+    from django.core.cache import caches
+
+    from library.models import Book
+    from library.views import AuthorViewSet, BookViewSet, LoanViewSet
+
+    c, u = auth_client(is_staff=True)
+    a1 = baker.make("library.Author", last_name="Weir", first_name="Andy", bio=None)
+    a2 = baker.make(
+        "library.Author", last_name="Брэдбери", first_name="Рэй", bio="Фантаст"
+    )
+    a2.date_of_birth = timezone.now().date().replace(year=1920)
+    a2.save()
+    titles = ["Martian", "Mars Needs Moms", "Марсианские хроники", "Dune"]
+    for i, title in enumerate(titles):
+        baker.make(
+            "library.Book",
+            title=title,
+            author=a1 if i % 2 else a2,
+            genre="science" if i % 2 else "fantasy",
+            description=f"Про Марс {i}",
+            published_year=1950 + i,
+        )
+    now = timezone.now()
+    for book, due, returned in zip(
+        Book.objects.all(),
+        [now - timedelta(days=3), now + timedelta(days=3), now - timedelta(days=3)],
+        [None, None, now - timedelta(days=5)],
+    ):
+        baker.make(
+            "library.Loan",
+            user=u,
+            book=book,
+            due_at=due,
+            returned_at=returned,
+            status="RETURNED" if returned else "ISSUED",
+        )
+
+    fast = c.get(reverse(url_name), params)
+    for view in (AuthorViewSet, BookViewSet, LoanViewSet):
+        monkeypatch.setattr(view, "fast_list", False)
+    caches["responses"].clear()
+    slow = c.get(reverse(url_name), params)
+    assert fast.status_code == slow.status_code == 200
+    assert fast.data["results"]
+    assert fast.content == slow.content
+
+
+def test_orjson_renderer_matches_stdlib_renderer():
+    import datetime
+    import decimal
+    import uuid
+
+    from rest_framework.renderers import JSONRenderer
+
+    from library.models import Book, Loan
+    from library.renderers import ORJSONRenderer
+
+    now = timezone.now()
+    data = {
+        "datetime": now,
+        "naive": now.replace(tzinfo=None),
+        "msk": now.astimezone(datetime.timezone(timedelta(hours=3))),
+        "date": now.date(),
+        "time": now.time(),
+        "decimal": decimal.Decimal("12.50"),
+        "uuid": uuid.uuid4(),
+        "label": Loan.Status.OVERDUE.label,
+        "choice": Book.Genre.FANTASY,
+        "duration": timedelta(days=1, seconds=5),
+        "text": 'Рэй Брэдбери "451"\n\u2028\x01',
+        1: [1.5, None, True],
+    }
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+    context = {"indent": 4}
+    assert ORJSONRenderer().render(data, renderer_context=context) == (
+        JSONRenderer().render(data, renderer_context=context)
+    )
+
+
+def test_orjson_parser_accepts_json_and_rejects_garbage():
+    c, u = auth_client(is_staff=True)
+    a = baker.make("library.Author")
+    resp = c.post(
+        reverse("books-list"),
+        data='{"title": "Марсианин", "isbn": "978-5-17-000", "published_year": 2011, '
+        f'"author": {a.id}, "copies_total": 2}}',
+        content_type="application/json",
+    )
+    assert resp.status_code == 201
+    assert resp.json()["title"] == "Марсианин"
+
+    resp = c.post(
+        reverse("books-list"), data='{"title": NaN', content_type="application/json"
+    )
+    assert resp.status_code == 400
+    assert "JSON parse error" in resp.json()["detail"]
+
+
+def test_books_list_conditional_get(django_assert_num_queries):
+    b = make_book(copies_total=2)
+    client = APIClient()
+    resp = client.get(reverse("books-list"))
+    etag = resp["ETag"]
+    assert resp["Last-Modified"]
+
+    with django_assert_num_queries(0):
+        resp = client.get(reverse("books-list"), HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    assert resp["ETag"] == etag
+    resp = client.get(
+        reverse("books-list"), {"genre": "other"}, HTTP_IF_NONE_MATCH=etag
+    )
+    assert resp.status_code == 200
+
+    c, u = auth_client()
+    c.post(reverse("loans-issue"), {"book_id": b.id}, format="json")
+    resp = client.get(reverse("books-list"), HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp.data["results"][0]["copies_available"] == 1
+
+    etag = resp["ETag"]
+    b.author.last_name = "Другой"
+    b.author.save()
+    resp = client.get(reverse("books-list"), HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+
+
+def test_book_and_author_detail_conditional_get(django_assert_num_queries):
+    b = make_book()
+    client = APIClient()
+    url = reverse("books-detail", args=[b.id])
+    resp = client.get(url)
+    etag, last_modified = resp["ETag"], resp["Last-Modified"]
+
+    with django_assert_num_queries(1):
+        resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    resp = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert resp.status_code == 304
+    assert client.get(url, {"fields": "id"}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    staff, _ = auth_client(is_staff=True)
+    staff.patch(url, {"title": "Новое название"}, format="json")
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp.data["title"] == "Новое название"
+
+    url = reverse("authors-detail", args=[b.author_id])
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(reverse("authors-detail", args=[0])).status_code == 404
+
+
+def test_books_response_cache_hits_and_generation_invalidation(
+    django_assert_num_queries,
+):
+    from library.cache_stats import response_cache_stats
+
+    b = make_book(copies_total=2)
+    client = APIClient()
+    first = client.get(reverse("books-list"), {"page_size": 5, "genre": ""})
+    with django_assert_num_queries(0):
+        second = client.get(reverse("books-list"), {"genre": "", "page_size": 5})
+    assert second.content == first.content
+    stats = response_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+
+    c, u = auth_client()
+    c.post(reverse("loans-issue"), {"book_id": b.id}, format="json")
+    resp = client.get(reverse("books-list"), {"page_size": 5})
+    assert resp.data["results"][0]["copies_available"] == 1
+    detail = client.get(reverse("books-detail", args=[b.id]))
+    assert detail.data["copies_available"] == 1
+    assert response_cache_stats()["misses"] == 3
+
+
+def test_response_cache_size_cap_and_evictions(settings):
+    from django.core.cache import caches
+
+    from library.cache_stats import response_cache_stats
+
+    authors = baker.make("library.Author", _quantity=3)
+    client = APIClient()
+    settings.RESPONSE_CACHE_MAX_ENTRY_BYTES = 10
+    client.get(reverse("authors-list"))
+    assert response_cache_stats()["skipped"] == 1
+
+    settings.RESPONSE_CACHE_MAX_ENTRY_BYTES = 256 * 1024
+    response_cache = caches["responses"]
+    response_cache._max_entries, response_cache._cull_frequency = 2, 2
+    try:
+        for author in authors:
+            client.get(reverse("authors-detail", args=[author.id]))
+    finally:
+        response_cache._max_entries = settings.RESPONSE_CACHE_MAX_ENTRIES
+        response_cache._cull_frequency = 3
+    assert response_cache_stats()["evictions"] >= 1
+
+
+def test_response_cache_stats_command():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    APIClient().get(reverse("authors-list"))
+    out = StringIO()
+    call_command("response_cache_stats", "--reset", stdout=out)
+    assert "misses: 1" in out.getvalue()
+    out = StringIO()
+    call_command("response_cache_stats", stdout=out)
+    assert "misses: 0" in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_issue_never_oversells():
+    import threading
+
+    from django.core.exceptions import ValidationError
+    from django.db import connections
+
+    from library.models import Book, Loan
+    from library.services import issue_book
+
+    book = make_book(copies_total=3)
+    users = baker.make("users.User", _quantity=12)
+    barrier = threading.Barrier(len(users))
+    outcomes = []
+
+    def worker(user):
+        barrier.wait()
+        try:
+            issue_book(actor=user, book_id=book.id)
+            outcomes.append("ok")
+        except ValidationError:
+            outcomes.append("rejected")
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(u,)) for u in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes.count("ok") == 3
+    assert outcomes.count("rejected") == len(users) - 3
+    assert Book.objects.get(pk=book.id).copies_available == 0
+    assert Loan.objects.filter(book=book, returned_at__isnull=True).count() == 3
+
+
+def test_bulk_issue_partial_failure(django_assert_max_num_queries):
+    from library.models import Book, Loan
+
+    c, u = auth_client()
+    b1 = make_book(copies_total=2)
+    b2 = make_book(copies_total=1, copies_available=0)
+    b3 = make_book(copies_total=5)
+    payload = {"book_ids": [b3.id, b1.id, 999999, b2.id, b1.id]}
+    with django_assert_max_num_queries(12):
+        resp = c.post(reverse("loans-issue-bulk"), payload, format="json")
+    assert resp.status_code == 200
+    assert (resp.data["succeeded"], resp.data["failed"]) == (2, 3)
+    results = resp.data["results"]
+    assert [r["id"] for r in results] == payload["book_ids"]
+    assert [r["ok"] for r in results] == [True, True, False, False, False]
+    assert results[0]["loan"]["book_title"] == b3.title
+    assert results[0]["loan"]["user_username"] == u.username
+    assert results[2]["detail"] == "Книга не найдена"
+    assert "недоступны" in results[3]["detail"]
+    assert "уже взял" in results[4]["detail"]
+
+    available = dict(Book.objects.values_list("id", "copies_available"))
+    assert (available[b1.id], available[b2.id], available[b3.id]) == (1, 0, 4)
+    assert Loan.objects.filter(user=u, returned_at__isnull=True).count() == 2
+
+    resp = c.post(reverse("loans-issue-bulk"), {"book_ids": []}, format="json")
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_issue_reports_concurrent_single_issue_per_item():
+    import threading
+
+    from django.db import connections, transaction
+
+    from library.models import Book, Loan
+    from library.services import issue_books_bulk, take_copy
+
+    reader = baker.make("users.User")
+    contested, free = make_book(copies_total=2), make_book(copies_total=1)
+    inserted = threading.Event()
+
+    def single_issue():
+        # как issue_book: займ вставлен, строка книги — следующим шагом
+        try:
+            with transaction.atomic():
+                baker.make("library.Loan", user=reader, book=contested)
+                inserted.set()
+                # пакетная выдача успевает дойти до вставки своих займов
+                threading.Event().wait(0.5)
+                assert take_copy(contested.pk) is not None
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=single_issue)
+    thread.start()
+    inserted.wait(5)
+    try:
+        results = issue_books_bulk(actor=reader, book_ids=[contested.pk, free.pk])
+    finally:
+        thread.join()
+
+    assert [(r.id, r.ok) for r in results] == [(contested.pk, False), (free.pk, True)]
+    assert "уже взял" in results[0].error
+    assert Loan.objects.filter(user=reader, returned_at__isnull=True).count() == 2
+    available = dict(Book.objects.values_list("id", "copies_available"))
+    assert (available[contested.pk], available[free.pk]) == (1, 0)
+
+
+def test_bulk_return_partial_failure():
+    from library.models import Book
+
+    c, u = auth_client()
+    other, _ = auth_client()
+    b1 = make_book(copies_total=2)
+    b2 = make_book(copies_total=1)
+    issued = c.post(
+        reverse("loans-issue-bulk"), {"book_ids": [b1.id, b2.id]}, format="json"
+    ).data["results"]
+    mine = [r["loan"]["id"] for r in issued]
+    foreign = other.post(
+        reverse("loans-issue"), {"book_id": b1.id}, format="json"
+    ).data["id"]
+
+    payload = {"loan_ids": [mine[0], foreign, mine[1], mine[0], 999999]}
+    resp = c.post(reverse("loans-return-bulk"), payload, format="json")
+    assert resp.status_code == 200
+    assert [r["ok"] for r in resp.data["results"]] == [True, False, True, False, False]
+    assert resp.data["results"][0]["loan"]["status"] == "RETURNED"
+    assert "чужие" in resp.data["results"][1]["detail"]
+    assert "уже возвращена" in resp.data["results"][3]["detail"]
+
+    available = dict(Book.objects.values_list("id", "copies_available"))
+    assert (available[b1.id], available[b2.id]) == (1, 1)
+
+
+def make_loan(user, due_in_days, status="ISSUED", returned=False):
+    now = timezone.now()
+    return baker.make(
+        "library.Loan",
+        user=user,
+        book=make_book(),
+        issued_at=now - timedelta(days=20),
+        due_at=now + timedelta(days=due_in_days),
+        returned_at=now if returned else None,
+        status=status,
+    )
+
+
+def test_mark_overdue_loans_command_is_chunked_and_idempotent():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from library.models import Loan
+
+    u = baker.make("users.User")
+    overdue = [make_loan(u, -d) for d in (1, 2, 3)]
+    current = make_loan(u, 5)
+    returned = make_loan(u, -5, status="RETURNED", returned=True)
+
+    out = StringIO()
+    call_command("mark_overdue_loans", "--batch-size", "2", stdout=out)
+    assert "3" in out.getvalue()
+    statuses = dict(Loan.objects.values_list("id", "status"))
+    assert {statuses[loan.id] for loan in overdue} == {"OVERDUE"}
+    assert statuses[current.id] == "ISSUED"
+    assert statuses[returned.id] == "RETURNED"
+
+    out = StringIO()
+    call_command("mark_overdue_loans", stdout=out)
+    assert "Помечено просроченными: 0" in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_mark_overdue_skips_loans_locked_by_return():
+    import threading
+
+    from django.db import connections, transaction
+
+    from library.models import Loan
+    from library.services import mark_overdue_batch
+
+    u = baker.make("users.User")
+    locked, free = make_loan(u, -1), make_loan(u, -2)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        try:
+            with transaction.atomic():
+                Loan.objects.select_for_update().get(pk=locked.pk)
+                holding.set()
+                release.wait(5)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    holding.wait(5)
+    try:
+        assert mark_overdue_batch(now=timezone.now()) == 1
+    finally:
+        release.set()
+        thread.join()
+    statuses = dict(Loan.objects.values_list("id", "status"))
+    assert (statuses[free.id], statuses[locked.id]) == ("OVERDUE", "ISSUED")
+
+
+def test_loans_status_filter_uses_stored_status():
+    from library.filters import LoanFilter
+    from library.models import Loan
+
+    c, u = auth_client()
+    marked = make_loan(u, -3, status="OVERDUE")
+    unmarked = make_loan(u, -1)
+    current = make_loan(u, 5)
+    make_loan(u, -5, status="RETURNED", returned=True)
+
+    def ids(status):
+        resp = c.get(reverse("loans-list"), {"status": status})
+        return {row["id"] for row in resp.data["results"]}
+
+    # фильтр — по записанному статусу: непомеченная просрочка остаётся ISSUED
+    # до mark_overdue_loans, effective_status показывает её как OVERDUE
+    assert ids("OVERDUE") == {marked.id}
+    assert ids("ISSUED") == {unmarked.id, current.id}
+    resp = c.get(reverse("loans-list"), {"status": "ISSUED"})
+    effective = {row["id"]: row["effective_status"] for row in resp.data["results"]}
+    assert effective[unmarked.id] == "OVERDUE"
+    assert len(ids("RETURNED")) == 1
+    resp = c.get(reverse("loans-list"), {"active": "true"})
+    assert {row["id"] for row in resp.data["results"]} == {
+        marked.id,
+        unmarked.id,
+        current.id,
+    }
+    resp = c.get(reverse("loans-list"), {"active": "false"})
+    assert resp.data["count"] == 1
+
+    qs = LoanFilter({"status": "OVERDUE"}, queryset=Loan.objects.all()).qs
+    assert "loan_overdue_issued_idx" in explain(qs)
+
+
+@pytest.fixture
+def seeded_loans():
+    """
+    Таблица как в проде: много RETURNED-истории, немного активных выдач
+    и накопившиеся OVERDUE на руках.
+    """
+    from library.models import Loan
+
+    now = timezone.now()
+    users = baker.make("users.User", _quantity=20)
+    books = [make_book(copies_total=100) for _ in range(40)]
+    history = [
+        Loan(
+            user=users[i % 20],
+            book=books[i % 40],
+            issued_at=now - timedelta(days=400 - i % 380),
+            due_at=now - timedelta(days=386 - i % 380),
+            returned_at=now - timedelta(days=390 - i % 380),
+            status=Loan.Status.RETURNED,
+        )
+        for i in range(5000)
+    ]
+    # 400 на руках, из них просрочена каждая двадцатая
+    active = [
+        Loan(
+            user=users[i % 20],
+            book=books[i // 20],
+            issued_at=now - timedelta(days=i % 13, minutes=i),
+            due_at=now + timedelta(days=-3 if i % 20 == 0 else 10),
+            status=Loan.Status.ISSUED,
+        )
+        for i in range(400)
+    ]
+    # уже помеченные просроченные, ещё не возвращённые
+    overdue = [
+        Loan(
+            user=users[i % 20],
+            book=books[20 + i // 20],
+            issued_at=now - timedelta(days=30, minutes=i),
+            due_at=now - timedelta(days=16, minutes=i),
+            status=Loan.Status.OVERDUE,
+        )
+        for i in range(400)
+    ]
+    Loan.objects.bulk_create(history + active + overdue)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE library_loan")
+    return users, books
+
+
+def active_loan_queries(users, books):
+    from library.filters import LoanFilter
+    from library.models import Loan
+
+    now = timezone.now()
+    user, book = users[0], books[0]
+    loans = Loan.objects.order_by("-issued_at")
+    return {
+        "my_current_loans": (
+            # первая страница списка
+            LoanFilter({"active": "true"}, queryset=loans.filter(user=user)).qs[:10],
+            "loan_active_user_issued_idx",
+        ),
+        "overdue_list": (
+            LoanFilter({"status": "OVERDUE"}, queryset=loans).qs,
+            "loan_overdue_issued_idx",
+        ),
+        "overdue_sweeper": (
+            Loan.objects.filter(
+                status=Loan.Status.ISSUED, returned_at__isnull=True, due_at__lt=now
+            ).order_by("due_at", "pk")[:1000],
+            "loan_issued_due_idx",
+        ),
+        "active_pair_check": (
+            Loan.objects.filter(user=user, book=book, returned_at__isnull=True),
+            "uniq_active_loan_per_user_book",
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["my_current_loans", "overdue_list", "overdue_sweeper", "active_pair_check"],
+)
+def test_active_loan_queries_use_partial_indexes(seeded_loans, name):
+    queryset, index = active_loan_queries(*seeded_loans)[name]
+    plan = explain(queryset, disable=())
+    assert index in plan, plan
+    assert "Seq Scan" not in plan, plan
+    if name == "my_current_loans":
+        # порядок -issued_at берётся из индекса, без сортировки
+        assert "Sort" not in plan, plan
+
+
+def test_archive_loans_command_moves_only_old_returned_loans():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from library.models import Loan, LoanArchive
+
+    u = baker.make("users.User")
+    old = [make_loan(u, -400, status="RETURNED", returned=True) for _ in range(3)]
+    Loan.objects.filter(pk__in=[loan.pk for loan in old]).update(
+        returned_at=timezone.now() - timedelta(days=400)
+    )
+    recent = make_loan(u, -5, status="RETURNED", returned=True)
+    active = make_loan(u, -400)
+
+    out = StringIO()
+    call_command("archive_loans", "--older-than-days=365", "--batch-size=2", stdout=out)
+    assert "Перенесено в архив: 3" in out.getvalue()
+    assert set(Loan.objects.values_list("pk", flat=True)) == {recent.pk, active.pk}
+    archived = LoanArchive.objects.get(pk=old[0].pk)
+    assert (archived.user_id, archived.book_id, archived.status) == (
+        u.pk,
+        old[0].book_id,
+        "RETURNED",
+    )
+
+    out = StringIO()
+    call_command("archive_loans", "--older-than-days=365", stdout=out)
+    assert "Перенесено в архив: 0" in out.getvalue()
+    assert LoanArchive.objects.count() == 3
+
+
+@pytest.mark.parametrize("cursor", [False, True])
+def test_loans_include_archived(cursor):
+    from django.core.management import call_command
+
+    from library.models import Loan
+
+    c, u = auth_client()
+    other = baker.make("users.User")
+    old = make_loan(u, -400, status="RETURNED", returned=True)
+    Loan.objects.filter(pk=old.pk).update(
+        issued_at=timezone.now() - timedelta(days=500),
+        returned_at=timezone.now() - timedelta(days=400),
+    )
+    current = make_loan(u, 5)
+    make_loan(other, 5)
+    call_command("archive_loans", stdout=None)
+
+    params = {"cursor": ""} if cursor else {}
+    resp = c.get(reverse("loans-list"), params)
+    assert [row["id"] for row in resp.data["results"]] == [current.id]
+
+    resp = c.get(reverse("loans-list"), {**params, "include_archived": "1"})
+    assert resp.status_code == 200
+    rows = resp.data["results"]
+    assert [row["id"] for row in rows] == [current.id, old.id]
+    assert rows[1]["effective_status"] == "RETURNED"
+    assert rows[1]["book"] == old.book_id
+
+    resp = c.get(
+        reverse("loans-list"),
+        {"include_archived": "1", "status": "RETURNED", "fields": "id"},
+    )
+    assert resp.data["results"] == [{"id": old.id}]
+
+    url = reverse("loans-detail", args=[old.id])
+    assert c.get(url).status_code == 404
+    assert c.get(url, {"include_archived": "1"}).data["id"] == old.id
+
+
+def test_books_export_streams_filtered_csv_and_ndjson(django_assert_max_num_queries):
+    import csv
+    import io
+    import json
+
+    author = baker.make("library.Author", first_name="Лев", last_name="Толстой")
+    for n in range(25):
+        baker.make(
+            "library.Book",
+            author=author,
+            title=f"Книга {n:02d}",
+            description='с "кавычками",\nи переводом строки',
+            genre="Fantasy" if n % 2 else "Drama",
+            copies_total=1,
+            copies_available=1,
+        )
+    url = reverse("books-export")
+    assert auth_client()[0].get(url).status_code == 403
+
+    c, _ = auth_client(is_staff=True)
+    params = {"genre": "Fantasy", "ordering": "-title"}
+    listed = c.get(reverse("books-list"), {**params, "page_size": 100}).data["results"]
+    assert c.get(url, {"export_format": "xml"}).status_code == 400
+
+    with django_assert_max_num_queries(3):
+        resp = c.get(url, params)
+        body = b"".join(resp.streaming_content).decode()
+    assert resp["Content-Type"] == "text/csv; charset=utf-8"
+    assert 'filename="books.csv"' in resp["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [row["title"] for row in rows] == [book["title"] for book in listed]
+    assert rows[0]["description"] == listed[0]["description"]
+    assert rows[0]["author_name"] == listed[0]["author_name"] != ""
+
+    resp = c.get(url, {**params, "export_format": "ndjson", "fields": "id,title"})
+    assert resp["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(resp.streaming_content).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": book["id"], "title": book["title"]} for book in listed
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_books_export_streams_through_asgi_handler(recwarn):
+    """Под ASGI выгрузка идёт кусками, а не собирается целиком в список."""
+    import asyncio
+
+    from asgiref.sync import async_to_sync
+    from django.core.handlers.asgi import ASGIHandler
+
+    from library.exports import ROWS_PER_CHUNK
+    from users.authentication import ClaimsRefreshToken
+
+    author = baker.make("library.Author")
+    baker.make(
+        "library.Book",
+        author=author,
+        _quantity=2 * ROWS_PER_CHUNK + 1,
+        _bulk_create=True,
+    )
+    staff = baker.make("users.User", is_staff=True)
+    access = ClaimsRefreshToken.for_user(staff).access_token
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": reverse("books-export"),
+        "query_string": b"export_format=ndjson&fields=id",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", f"Bearer {access}".encode()),
+        ],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # клиент не отключается: ждём, пока обработчик не отменит ожидание
+        await asyncio.Future()
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(ASGIHandler())(scope, receive, send)
+
+    assert messages[0]["status"] == 200
+    bodies = [m.get("body", b"") for m in messages if m["type"] == "http.response.body"]
+    # по куску на ROWS_PER_CHUNK строк (и пустой завершающий)
+    assert len([body for body in bodies if body]) == 3
+    assert b"".join(bodies).count(b"\n") == 2 * ROWS_PER_CHUNK + 1
+    assert not [w for w in recwarn if "synchronous iterators" in str(w.message)]
+
+
+def test_loans_export_matches_list_and_export_library_command(tmp_path):
+    import json
+
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+
+    c, staff = auth_client(is_staff=True)
+    u = baker.make("users.User")
+    make_loan(u, -2)
+    make_loan(u, 3)
+    make_loan(staff, 3, status="RETURNED", returned=True)
+
+    listed = c.get(reverse("loans-list"), {"active": "true"}).data["results"]
+    resp = c.get(reverse("loans-export"), {"active": "true", "export_format": "ndjson"})
+    body = b"".join(resp.streaming_content)
+    exported = [json.loads(line) for line in body.splitlines()]
+    assert exported == json.loads(json.dumps(listed))
+    assert {row["effective_status"] for row in exported} == {"OVERDUE", "ISSUED"}
+
+    out = tmp_path / "loans.ndjson"
+    call_command(
+        "export_library",
+        "loans",
+        "--output",
+        str(out),
+        "--param",
+        "active=true",
+        "--chunk-size",
+        "1",
+    )
+    assert [json.loads(line) for line in out.read_bytes().splitlines()] == exported
+
+    with pytest.raises(CommandError):
+        call_command(
+            "export_library",
+            "books",
+            "-o",
+            str(tmp_path / "b.csv"),
+            "-p",
+            "published_year=abc",
+        )
+
+
+IMPORT_CSV = """isbn,title,description,genre,published_year,author_last_name,author_first_name,copies_total
+100-1,Пикник на обочине,Зона,fiction,1972,Стругацкий,Аркадий,3
+100-2,Трудно быть богом,,fiction,1964,Стругацкий,Аркадий,
+100-3,Солярис,"Океан ""мыслящий"", живой",science,1961,Лем,Станислав,2
+100-4,,Без названия,fiction,1999,Лем,Станислав,1
+100-5,Год неизвестен,,fiction,когда-то,Лем,Станислав,1
+100-2,Трудно быть богом (2-е изд.),,fiction,1966,Стругацкий,Аркадий,4
+EX-1,Существующая,,fiction,2000,Брэдбери,Рэй,5
+EX-2,Мало копий,,fiction,2000,Брэдбери,Рэй,1
+"""
+
+
+def make_import_fixtures():
+    """EX-1 и EX-2 уже в каталоге, у каждой две копии на руках."""
+    author = baker.make("library.Author", last_name="Брэдбери", first_name="Рэй")
+    for isbn in ("EX-1", "EX-2"):
+        baker.make(
+            "library.Book",
+            isbn=isbn,
+            author=author,
+            copies_total=3,
+            copies_available=1,
+        )
+    return author
+
+
+def test_import_books_command_upserts_in_batches(tmp_path):
+    import json
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from library.models import Author, Book
+
+    author = make_import_fixtures()
+    path = tmp_path / "feed.csv"
+    path.write_text(IMPORT_CSV, encoding="utf-8")
+    errors = tmp_path / "errors.ndjson"
+
+    out = StringIO()
+    call_command(
+        "import_books", str(path), "--batch-size=2", f"--errors={errors}", stdout=out
+    )
+    assert "Создано: 3, обновлено: 2" in out.getvalue()
+    assert "авторов создано: 2" in out.getvalue()
+    assert "дубликатов isbn: 0, ошибок: 3" in out.getvalue()
+    assert [
+        (e["row"], sorted(e["errors"])) for e in map(json.loads, errors.open())
+    ] == [
+        (4, ["title"]),
+        (5, ["published_year"]),
+        (8, ["copies_total"]),
+    ]
+
+    books = {b.isbn: b for b in Book.objects.all()}
+    assert books["100-1"].author_display_name == "Стругацкий Аркадий"
+    assert books["100-1"].author_id == books["100-2"].author_id
+    # 100-2 встретилась дважды в разных порциях: последняя запись побеждает
+    assert (books["100-2"].title, books["100-2"].copies_total) == (
+        "Трудно быть богом (2-е изд.)",
+        4,
+    )
+    assert books["100-3"].description == 'Океан "мыслящий", живой'
+    assert (books["100-3"].copies_total, books["100-3"].copies_available) == (2, 2)
+    # две копии на руках остаются на руках
+    assert (books["EX-1"].author_id, books["EX-1"].title) == (author.pk, "Существующая")
+    assert (books["EX-1"].copies_total, books["EX-1"].copies_available) == (5, 3)
+    assert (books["EX-2"].copies_total, books["EX-2"].copies_available) == (3, 1)
+    assert Author.objects.count() == 3
+
+    resp = APIClient().get(reverse("books-list"), {"search": "пикник"})
+    assert [b["isbn"] for b in resp.data["results"]] == ["100-1"]
+
+    out = StringIO()
+    call_command("import_books", str(path), "--batch-size=100", stdout=out)
+    assert "Создано: 0, обновлено: 4" in out.getvalue()
+    assert "дубликатов isbn: 1" in out.getvalue()
+
+
+def test_import_books_dry_run_writes_nothing(tmp_path):
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from library.models import Author, Book
+
+    make_import_fixtures()
+    path = tmp_path / "feed.csv"
+    path.write_text(IMPORT_CSV, encoding="utf-8")
+
+    out = StringIO()
+    call_command("import_books", str(path), "--dry-run", "--batch-size=2", stdout=out)
+    assert "dry-run" in out.getvalue()
+    assert "Создано: 3, обновлено: 2, авторов создано: 2" in out.getvalue()
+    assert Book.objects.count() == 2
+    assert Author.objects.count() == 1
+    assert Book.objects.get(isbn="EX-1").copies_total == 3
+
+
+@pytest.mark.parametrize("file_format", ["ndjson", "json"])
+def test_books_import_endpoint(file_format):
+    import json
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    rows = [
+        {
+            "isbn": f"200-{n}",
+            "title": f"Книга {n}",
+            "published_year": 2000 + n,
+            "author_last_name": "Ефремов",
+            "author_first_name": "Иван",
+            "genre": "science",
+        }
+        for n in range(3)
+    ]
+    rows.append({"isbn": "200-x", "title": "Без года", "author_last_name": "Ефремов"})
+    if file_format == "ndjson":
+        content = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+        content += "\n{битая строка\n"
+    else:
+        content = json.dumps(rows, ensure_ascii=False, indent=2)
+
+    def upload(client, **extra):
+        f = SimpleUploadedFile(f"feed.{file_format}", content.encode())
+        return client.post(
+            reverse("books-import"), {"file": f, **extra}, format="multipart"
+        )
+
+    assert upload(auth_client()[0]).status_code == 403
+
+    def listed():
+        return len(c.get(reverse("books-list")).data["results"])
+
+    c, _ = auth_client(is_staff=True)
+    assert listed() == 0
+    resp = upload(c, dry_run="true")
+    assert (resp.data["dry_run"], resp.data["created"]) == (True, 3)
+    assert listed() == 0
+
+    resp = upload(c)
+    assert resp.status_code == 200
+    assert (resp.data["created"], resp.data["authors_created"]) == (3, 1)
+    failed = 2 if file_format == "ndjson" else 1
+    assert resp.data["failed"] == failed
+    assert resp.data["errors"][0]["isbn"] == "200-x"
+    assert "published_year" in resp.data["errors"][0]["errors"]
+    # версия каталога сменилась — кэш списка не отдаёт старый ответ
+    assert listed() == 3
+
+
+def test_iter_json_array_reads_elements_across_chunks():
+    import json
+    from io import StringIO
+
+    from library.imports import ImportFileError, _iter_json_array
+
+    items = [{"isbn": str(n), "title": "ю" * n} for n in range(20)]
+    text = json.dumps(items, ensure_ascii=False)
+    assert list(_iter_json_array(StringIO(text), read_size=7)) == items
+    assert list(_iter_json_array(StringIO(" [ ] "), read_size=1)) == []
+    with pytest.raises(ImportFileError):
+        list(_iter_json_array(StringIO(text[:-5]), read_size=7))
+    with pytest.raises(ImportFileError):
+        list(_iter_json_array(StringIO('{"isbn": "1"}')))
+
+
+def test_stats_counters_follow_writes_and_match_rebuild(tmp_path):
+    from django.core.management import call_command
+
+    from library.services import (
+        issue_book,
+        issue_books_bulk,
+        return_loan,
+        return_loans_bulk,
+    )
+    from library.stats import read_stats, rebuild_stats
+
+    c, staff = auth_client(is_staff=True)
+    reader = baker.make("users.User")
+    author = baker.make("library.Author", last_name="Азимов", first_name="Айзек")
+    books = [
+        baker.make(
+            "library.Book",
+            author=author,
+            genre=genre,
+            copies_total=3,
+            copies_available=3,
+        )
+        for genre in ("science", "science", "fantasy")
+    ]
+    single = make_book()
+
+    loan = issue_book(actor=staff, book_id=books[0].id, borrower_id=reader.id)
+    issue_book(actor=staff, book_id=single.id, borrower_id=reader.id)
+    results = issue_books_bulk(
+        actor=staff, book_ids=[books[1].id, books[2].id], borrower_id=staff.id
+    )
+    return_loan(actor=staff, loan_id=loan.id)
+    return_loans_bulk(actor=staff, loan_ids=[results[0].loan.id])
+    resp = c.patch(
+        reverse("books-detail", args=[books[2].id]),
+        {"genre": "detective", "copies_total": 5},
+        format="json",
+    )
+    assert resp.status_code == 200
+    c.delete(reverse("books-detail", args=[make_book(copies_total=4).id]))
+    feed = tmp_path / "feed.ndjson"
+    feed.write_text(
+        '{"isbn": "S-1", "title": "Основание", "published_year": 1951, '
+        '"author_last_name": "Азимов", "author_first_name": "Айзек", '
+        '"genre": "science", "copies_total": 2}\n',
+        encoding="utf-8",
+    )
+    call_command("import_books", str(feed), stdout=None)
+
+    incremental = read_stats()
+    genres = {g["genre"]: g for g in incremental["genres"]}
+    assert (genres["science"]["books"], genres["science"]["copies_total"]) == (3, 8)
+    assert genres["science"]["copies_available"] == 8
+    # PATCH copies_total не трогает copies_available (одна копия на руках)
+    assert (genres["detective"]["books"], genres["detective"]["copies_available"]) == (
+        1,
+        2,
+    )
+    assert genres["fantasy"]["books"] == 0
+    assert incremental["loans_per_day"][-1]["issued"] == 4
+    assert (incremental["active_loans"], incremental["overdue_loans"]) == (2, 0)
+    assert incremental["top_authors"][0] == {
+        "id": author.id,
+        "name": "Азимов Айзек",
+        "loans": 3,
+    }
+
+    rebuild_stats()
+    assert read_stats() == incremental
+
+
+def test_stats_endpoint_reads_counters_in_constant_queries(
+    django_assert_max_num_queries,
+):
+    from django.core.management import call_command
+
+    c, staff = auth_client(is_staff=True)
+    assert auth_client()[0].get(reverse("stats")).status_code == 403
+
+    for n in range(30):
+        make_loan(staff, (1, -1, -2)[n % 3], returned=n % 5 == 0)
+    make_loan(staff, -0.001)  # срок истёк пару минут назад
+    call_command("rebuild_stats", stdout=None)
+
+    with django_assert_max_num_queries(9):
+        resp = c.get(reverse("stats"), {"days": 7, "top": 3})
+    assert resp.status_code == 200
+    assert len(resp.data["loans_per_day"]) == 7
+    # make_loan выдаёт 20 дней назад — вне окна
+    assert sum(day["issued"] for day in resp.data["loans_per_day"]) == 0
+    assert resp.data["active_loans"] == 25
+    # сроки в прошлые дни — из счётчиков, сегодняшний — запросом по индексу
+    assert resp.data["overdue_loans"] == 17
+    assert len(resp.data["top_authors"]) == 3
+    assert c.get(reverse("stats"), {"days": 0}).status_code == 400
+
+
+def borrow(user, book, days_ago, returned=True):
+    issued_at = timezone.now() - timedelta(days=days_ago)
+    return baker.make(
+        "library.Loan",
+        user=user,
+        book=book,
+        issued_at=issued_at,
+        due_at=issued_at + timedelta(days=14),
+        returned_at=issued_at + timedelta(days=1) if returned else None,
+        status="RETURNED" if returned else "ISSUED",
+    )
+
+
+def neighbors_of(book):
+    from library.models import BookNeighbor
+
+    return list(
+        BookNeighbor.objects.filter(book=book)
+        .order_by("-score", "neighbor_id")
+        .values_list("neighbor_id", "score")
+    )
+
+
+def test_build_recommendations_keeps_top_k_and_rolling_popularity():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from library.models import BookPopularity
+
+    b = [make_book() for _ in range(5)]
+    u1, u2, u3 = baker.make("users.User", _quantity=3)
+    for book in (b[0], b[1], b[2]):
+        borrow(u1, book, 3)
+    for book in (b[0], b[1]):
+        borrow(u2, book, 5)
+    borrow(u3, b[0], 10)
+    borrow(u3, b[3], 40)  # вне окна популярности, но пара считается
+    borrow(u3, b[4], 1, returned=False)  # ещё на руках — пар нет
+
+    call_command("build_recommendations", "--top-k", "2", stdout=StringIO())
+
+    assert neighbors_of(b[0]) == [(b[1].pk, 2), (b[2].pk, 1)]
+    assert neighbors_of(b[3]) == [(b[0].pk, 1)]
+    assert neighbors_of(b[4]) == []
+    assert dict(BookPopularity.objects.values_list("book_id", "score")) == {
+        b[0].pk: 3,
+        b[1].pk: 2,
+        b[2].pk: 1,
+        b[4].pk: 1,
+    }
+
+    # пересборка заменяет, а не добавляет
+    call_command("build_recommendations", "--top-k", "2", stdout=StringIO())
+    assert neighbors_of(b[0]) == [(b[1].pk, 2), (b[2].pk, 1)]
+
+
+def test_returns_update_co_borrow_pairs_incrementally():
+    from library.recommendations import build_neighbors
+    from library.services import return_loan, return_loans_bulk
+
+    b = [make_book() for _ in range(4)]
+    reader, other = baker.make("users.User", _quantity=2)
+    borrow(reader, b[0], 10)
+    borrow(other, b[0], 9)
+    borrow(other, b[1], 8)
+    build_neighbors()
+    assert neighbors_of(b[0]) == [(b[1].pk, 1)]
+
+    loan = borrow(reader, b[1], 2, returned=False)
+    return_loan(actor=reader, loan_id=loan.pk)
+    assert neighbors_of(b[0]) == [(b[1].pk, 2)]
+    assert neighbors_of(b[1]) == [(b[0].pk, 2)]
+
+    # та же книга ещё раз — читатель уже учтён
+    loan = borrow(reader, b[1], 1, returned=False)
+    return_loan(actor=reader, loan_id=loan.pk)
+    assert neighbors_of(b[0]) == [(b[1].pk, 2)]
+
+    loans = [borrow(other, book, 1, returned=False) for book in (b[2], b[3])]
+    return_loans_bulk(actor=other, loan_ids=[loan.pk for loan in loans])
+    assert neighbors_of(b[2]) == [(b[0].pk, 1), (b[1].pk, 1), (b[3].pk, 1)]
+    assert neighbors_of(b[3]) == [(b[0].pk, 1), (b[1].pk, 1), (b[2].pk, 1)]
+
+    # пересборка по истории даёт то же самое
+    incremental = {book.pk: neighbors_of(book) for book in b}
+    build_neighbors()
+    assert {book.pk: neighbors_of(book) for book in b} == incremental
+
+
+def test_incremental_pairs_respect_top_k(settings):
+    from library.services import return_loan
+
+    settings.RECOMMENDATIONS_TOP_K = 2
+    b = [make_book() for _ in range(4)]
+    reader = baker.make("users.User")
+    for book in b[:3]:
+        borrow(reader, book, 5)
+    loan = borrow(reader, b[3], 1, returned=False)
+    return_loan(actor=reader, loan_id=loan.pk)
+    assert len(neighbors_of(b[3])) == 2
+    assert neighbors_of(b[0]) == [(b[3].pk, 1)]
+
+
+def test_recommendation_endpoints_read_the_index(django_assert_num_queries):
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    c = APIClient()
+    b = [make_book() for _ in range(4)]
+    readers = baker.make("users.User", _quantity=3)
+    for n, reader in enumerate(readers):
+        for book in b[: n + 2]:
+            borrow(reader, book, 2)
+    call_command("build_recommendations", stdout=StringIO())
+
+    resp = c.get(reverse("books-popular"), {"limit": 2})
+    assert resp.status_code == 200
+    assert [(row["book"]["id"], row["score"]) for row in resp.data] == [
+        (b[0].pk, 3),
+        (b[1].pk, 3),
+    ]
+
+    url = reverse("books-also-borrowed", args=[b[2].pk])
+    with django_assert_num_queries(1):
+        resp = c.get(url)
+    assert resp.status_code == 200
+    assert [(row["book"]["id"], row["score"]) for row in resp.data] == [
+        (b[0].pk, 2),
+        (b[1].pk, 2),
+        (b[3].pk, 1),
+    ]
+    assert resp.data[0]["book"]["title"] == b[0].title
+    assert len(c.get(url, {"limit": 1}).data) == 1
+    assert c.get(url, {"limit": 0}).status_code == 400
+
+    lonely = make_book()
+    resp = c.get(reverse("books-also-borrowed", args=[lonely.pk]))
+    assert resp.status_code == 200 and resp.data == []
+    assert c.get(reverse("books-also-borrowed", args=[10**9])).status_code == 404
+    assert c.get(reverse("books-also-borrowed", args=["abc"])).status_code == 404
+
+
+def test_hold_queue_allocates_returned_copy_to_head_of_queue():
+    from library.models import Hold, Loan
+
+    book = make_book(copies_total=1)
+    first_client, first = auth_client()
+    resp = first_client.post(reverse("books-hold", args=[book.pk]))
+    # свободная копия выдаётся сразу
+    assert resp.status_code == 201
+    assert resp.data["status"] == "FULFILLED" and resp.data["loan"]
+    first_loan = resp.data["loan"]
+
+    waiting = []
+    for _ in range(3):
+        c, u = auth_client()
+        resp = c.post(reverse("books-hold", args=[book.pk]))
+        assert resp.status_code == 201 and resp.data["status"] == "WAITING"
+        waiting.append((c, u))
+    again = waiting[0][0].post(reverse("books-hold", args=[book.pk]))
+    assert again.status_code == 400
+    assert first_client.post(reverse("books-hold", args=[book.pk])).status_code == 400
+    assert APIClient().post(reverse("books-hold", args=[book.pk])).status_code in (
+        401,
+        403,
+    )
+
+    # второй выходит из очереди — копия достаётся третьему, минуя его
+    c, _ = waiting[1]
+    assert c.delete(reverse("books-hold", args=[book.pk])).status_code == 204
+    assert c.delete(reverse("books-hold", args=[book.pk])).status_code == 400
+
+    resp = first_client.post(reverse("loans-return-book"), {"loan_id": first_loan})
+    assert resp.status_code == 200
+    book.refresh_from_db()
+    assert book.copies_available == 0
+    assert Loan.objects.get(user=waiting[0][1], book=book).returned_at is None
+    assert Hold.objects.get(user=waiting[0][1]).status == "FULFILLED"
+    assert Hold.objects.get(user=waiting[1][1]).status == "CANCELLED"
+    assert Hold.objects.get(user=waiting[2][1]).status == "WAITING"
+
+    # очередь пуста — копия возвращается на полку
+    Hold.objects.filter(user=waiting[2][1]).delete()
+    loan = Loan.objects.get(user=waiting[0][1], book=book)
+    assert (
+        waiting[0][0]
+        .post(reverse("loans-return-book"), {"loan_id": loan.pk})
+        .status_code
+        == 200
+    )
+    book.refresh_from_db()
+    assert book.copies_available == 1
+
+
+def test_bulk_return_allocates_holds_and_skips_readers_holding_the_book():
+    from library.models import Hold, Loan
+    from library.services import issue_book, place_hold, return_loans_bulk
+
+    staff = baker.make("users.User", is_staff=True)
+    book = make_book(copies_total=2)
+    holders = baker.make("users.User", _quantity=2)
+    loans = [issue_book(actor=u, book_id=book.pk) for u in holders]
+    readers = baker.make("users.User", _quantity=3)
+    for reader in readers:
+        assert place_hold(actor=reader, book_id=book.pk).status == "WAITING"
+    # у первого в очереди книга уже на руках (выдана в обход очереди)
+    book.copies_available = 1
+    book.save(update_fields=["copies_available"])
+    issue_book(actor=staff, book_id=book.pk, borrower_id=readers[0].pk)
+
+    return_loans_bulk(actor=staff, loan_ids=[loan.pk for loan in loans])
+
+    statuses = dict(Hold.objects.values_list("user_id", "status"))
+    assert [statuses[r.pk] for r in readers] == ["WAITING", "FULFILLED", "FULFILLED"]
+    assert Loan.objects.filter(book=book, returned_at__isnull=True).count() == 3
+    book.refresh_from_db()
+    assert book.copies_available == 0
+
+
+def test_copies_added_by_import_and_admin_go_to_hold_queue():
+    import io
+
+    from django.test import Client
+
+    from library.imports import import_books
+    from library.models import Hold
+    from library.services import issue_book, place_hold
+
+    book = make_book(copies_total=1)
+    issue_book(actor=baker.make("users.User"), book_id=book.pk)
+    readers = baker.make("users.User", _quantity=3)
+    for reader in readers:
+        assert place_hold(actor=reader, book_id=book.pk).status == "WAITING"
+
+    def statuses():
+        holds = dict(Hold.objects.values_list("user_id", "status"))
+        return [holds[reader.pk] for reader in readers]
+
+    # импорт: 3 копии, одна на руках — две свободные уходят первым двум
+    feed = (
+        "isbn,title,description,genre,published_year,"
+        "author_last_name,author_first_name,copies_total\n"
+        f"{book.isbn},{book.title},,fiction,2000,Брэдбери,Рэй,3\n"
+    )
+    report = import_books(io.BytesIO(feed.encode()), "csv")
+    assert report.updated == 1 and not report.errors
+    assert statuses() == ["FULFILLED", "FULFILLED", "WAITING"]
+    book.refresh_from_db()
+    assert book.copies_available == 0
+
+    # админка: ещё одна копия — третьему
+    admin = Client()
+    admin.force_login(baker.make("users.User", is_staff=True, is_superuser=True))
+    resp = admin.post(
+        reverse("admin:library_book_change", args=[book.pk]),
+        {
+            "title": book.title,
+            "isbn": book.isbn,
+            "description": "",
+            "genre": book.genre,
+            "published_year": book.published_year,
+            "author": book.author_id,
+            "copies_total": 4,
+            "copies_available": 1,
+        },
+    )
+    assert resp.status_code == 302
+    assert statuses() == ["FULFILLED"] * 3
+    book.refresh_from_db()
+    assert (book.copies_total, book.copies_available) == (4, 0)
+
+
+def test_hold_allocation_writes_stats_once_per_transaction(monkeypatch):
+    import io
+
+    from django.test import Client
+
+    from library import admin, imports, services, signals
+    from library.imports import import_books
+    from library.services import issue_book, place_hold, return_loan, return_loans_bulk
+    from library.stats import add_stats, read_stats, rebuild_stats
+
+    # в разных вызовах add_stats свои stripe — несколько вызовов в одной
+    # транзакции блокируют счётчики не в общем порядке
+    calls = []
+    for module in (admin, imports, services, signals):
+        monkeypatch.setattr(
+            module, "add_stats", lambda deltas: calls.append(1) or add_stats(deltas)
+        )
+
+    def writes(action):
+        calls.clear()
+        action()
+        return len(calls)
+
+    staff = baker.make("users.User", is_staff=True, is_superuser=True)
+    author = baker.make("library.Author", last_name="Брэдбери", first_name="Рэй")
+    book = baker.make("library.Book", author=author, copies_total=2, copies_available=2)
+    loans = [
+        issue_book(actor=u, book_id=book.pk)
+        for u in baker.make("users.User", _quantity=2)
+    ]
+    readers = baker.make("users.User", _quantity=5)
+    for reader in readers:
+        place_hold(actor=reader, book_id=book.pk)
+
+    assert writes(lambda: return_loan(actor=staff, loan_id=loans[0].pk)) == 1
+    assert writes(lambda: return_loans_bulk(actor=staff, loan_ids=[loans[1].pk])) == 1
+    feed = (
+        "isbn,title,description,genre,published_year,"
+        "author_last_name,author_first_name,copies_total\n"
+        f"{book.isbn},{book.title},,{book.genre},2000,Брэдбери,Рэй,3\n"
+    )
+    assert writes(lambda: import_books(io.BytesIO(feed.encode()), "csv")) == 1
+
+    client = Client()
+    client.force_login(staff)
+    book.refresh_from_db()
+    form = {
+        "title": book.title,
+        "isbn": book.isbn,
+        "description": "",
+        "genre": book.genre,
+        "published_year": book.published_year,
+        "author": book.author_id,
+        "copies_total": 5,
+        "copies_available": 2,
+    }
+    url = reverse("admin:library_book_change", args=[book.pk])
+    assert writes(lambda: client.post(url, form)) == 1
+    assert not book.holds.filter(status="WAITING").exists()
+
+    incremental = read_stats()
+    rebuild_stats()
+    assert read_stats() == incremental
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hold_allocation_skips_locked_head():
+    import threading
+
+    from django.db import connections, transaction
+
+    from library.models import Hold
+    from library.services import issue_book, place_hold, return_loan
+
+    book = make_book(copies_total=1)
+    owner = baker.make("users.User")
+    loan = issue_book(actor=owner, book_id=book.pk)
+    readers = baker.make("users.User", _quantity=2)
+    head, second = (place_hold(actor=r, book_id=book.pk) for r in readers)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        try:
+            with transaction.atomic():
+                Hold.objects.select_for_update().get(pk=head.pk)
+                holding.set()
+                release.wait(5)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    holding.wait(5)
+    try:
+        return_loan(actor=owner, loan_id=loan.pk)
+    finally:
+        release.set()
+        thread.join()
+    statuses = dict(Hold.objects.values_list("id", "status"))
+    assert (statuses[head.pk], statuses[second.pk]) == ("WAITING", "FULFILLED")
+
+
+def test_async_read_views_match_sync_views(settings):
+    import inspect
+
+    from asgiref.sync import async_to_sync
+    from django.core.cache import cache, caches
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from library.views import BookViewSet, LoanViewSet
+
+    reader = baker.make("users.User")
+    books = [make_book(copies_total=2) for _ in range(3)]
+    for book in books:
+        baker.make(
+            "library.Loan",
+            user=reader,
+            book=book,
+            due_at=timezone.now() + timedelta(days=14),
+        )
+    factory = APIRequestFactory()
+
+    def responses(viewset, actions, params=None, **kwargs):
+        result = []
+        for async_views in (False, True):
+            settings.ASYNC_READ_VIEWS = async_views
+            view = viewset.as_view(actions)
+            assert inspect.iscoroutinefunction(view) is async_views
+            if async_views:
+                view = async_to_sync(view)
+            # оба пути — с холодным кэшем ответов и count
+            cache.clear()
+            caches["responses"].clear()
+            request = factory.get("/", params)
+            force_authenticate(request, reader)
+            with CaptureQueriesContext(connection) as ctx:
+                response = view(request, **kwargs).render()
+            result.append((response.status_code, response.content, len(ctx)))
+        return result
+
+    for viewset, actions, params, kwargs in (
+        (BookViewSet, {"get": "list"}, {"ordering": "-title"}, {}),
+        (BookViewSet, {"get": "list"}, {"pagination": "cursor", "page_size": 2}, {}),
+        (BookViewSet, {"get": "retrieve"}, {"fields": "id,title"}, {"pk": books[0].pk}),
+        (BookViewSet, {"get": "retrieve"}, None, {"pk": 0}),
+        (LoanViewSet, {"get": "list"}, {"status": "ISSUED"}, {}),
+    ):
+        sync, native = responses(viewset, actions, params, **kwargs)
+        assert sync == native
+
+
+def test_db_connection_budget_check(settings):
+    from library.checks import check_db_connection_budget
+
+    settings.DB_POOL = True
+    settings.WEB_WORKERS = 5
+    settings.DB_POOL_MAX_SIZE = 20
+    settings.DB_RESERVED_CONNECTIONS = 10
+    settings.DB_MAX_CONNECTIONS = 100
+    assert [e.id for e in check_db_connection_budget(None)] == ["library.W001"]
+
+    settings.DB_POOL_MAX_SIZE = 22
+    settings.WEB_WORKERS = 4
+    settings.DB_MAX_CONNECTIONS = 98
+    assert check_db_connection_budget(None) == []
+    # без пула соединения не ограничиваются пулом, проверять нечего
+    settings.DB_POOL = False
+    settings.DB_MAX_CONNECTIONS = 10
+    assert check_db_connection_budget(None) == []
+
+
+def test_shared_cache_check(settings):
+    from library.checks import check_shared_cache
+
+    settings.WEB_WORKERS = 2
+    assert [e.id for e in check_shared_cache(None)] == ["library.E001"]
+    settings.WEB_WORKERS = 1
+    assert check_shared_cache(None) == []
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_safe_reads_go_to_replica_until_user_writes(settings):
+    from django.db import connections, transaction
+
+    from library.models import Loan
+    from library.replicas import _read_alias
+
+    settings.DATABASE_REPLICAS = ["replica"]
+    settings.RESPONSE_CACHE_TIMEOUT = 0
+    reader = baker.make("users.User")
+    other = baker.make("users.User")
+    book = make_book(copies_total=2)
+    client = APIClient()
+
+    def queries(method, url, user=None, **kwargs):
+        client.force_authenticate(user=user)
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                resp = getattr(client, method)(url, **kwargs)
+        assert resp.status_code in (200, 201), resp.content
+        return len(primary), len(replica)
+
+    primary, replica = queries("get", reverse("loans-list"), reader)
+    assert primary == 0 and replica > 0
+
+    # запись — на основную БД, и после неё читатель видит свои выдачи с неё же
+    primary, replica = queries(
+        "post", reverse("loans-issue"), reader, data={"book_id": book.pk}, format="json"
+    )
+    assert primary > 0 and replica == 0
+    primary, replica = queries("get", reverse("loans-list"), reader)
+    assert primary > 0 and replica == 0
+    primary, replica = queries("get", reverse("users-me"), reader)
+    assert replica == 0
+    # остальные по-прежнему читают с реплики
+    primary, replica = queries("get", reverse("loans-list"), other)
+    assert primary == 0 and replica > 0
+
+    # select_for_update и чтение в транзакции — всегда с основной БД
+    token = _read_alias.set("replica")
+    try:
+        assert Loan.objects.all().db == "replica"
+        assert Loan.objects.select_for_update().db == "default"
+        with transaction.atomic():
+            assert Loan.objects.all().db == "default"
+    finally:
+        _read_alias.reset(token)
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+@pytest.mark.parametrize("async_views", [False, True])
+def test_catalog_reads_use_replica_outside_lag_window(settings, async_views):
+    """
+    Кэш ответов и ETag по версии таблицы заполняются с реплики, только когда
+    версия старше окна отставания реплики; иначе — с основной БД.
+    """
+    import time
+
+    from asgiref.sync import async_to_sync
+    from django.core.cache import cache
+    from django.db import connections
+    from rest_framework.test import APIRequestFactory
+
+    from library.models import Book
+    from library.versions import _key, bump_table_version
+    from library.views import BookViewSet
+
+    settings.DATABASE_REPLICAS = ["replica"]
+    settings.REPLICA_PIN_SECONDS = 10
+    settings.ASYNC_READ_VIEWS = async_views
+    book = make_book()
+
+    def queries(actions, headers=None, **kwargs):
+        view = BookViewSet.as_view(actions)
+        if async_views:
+            view = async_to_sync(view)
+        request = APIRequestFactory().get("/", headers=headers)
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = view(request, **kwargs)
+        return response, len(primary), len(replica)
+
+    # книгу только что записали: реплика могла её ещё не получить
+    response, primary, replica = queries({"get": "list"})
+    assert response.status_code == 200
+    assert primary > 0 and replica == 0
+
+    # версия старше окна — список и карточка с реплики, под прочитанной версией
+    cache.set(_key(Book), time.time_ns() - 60 * 10**9, None)
+    for actions, kwargs in (
+        ({"get": "list"}, {}),
+        ({"get": "retrieve"}, {"pk": book.pk}),
+    ):
+        response, primary, replica = queries(actions, **kwargs)
+        assert response.status_code == 200
+        assert primary == 0 and replica > 0
+        # повтор — из кэша ответов, ревалидация — 304
+        assert queries(actions, **kwargs)[1] == 0
+        revalidated, primary, _ = queries(
+            actions, {"If-None-Match": response["ETag"]}, **kwargs
+        )
+        assert revalidated.status_code == 304 and primary == 0
+
+    bump_table_version(Book)
+    response, primary, replica = queries({"get": "list"})
+    assert primary > 0 and replica == 0
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_async_reads_use_async_cache_api(settings, monkeypatch):
+    """
+    Async-представления не ходят в кэш синхронно из цикла событий:
+    метка аутентификации, закрепление, версия, ответы и count — через aget/aset.
+    """
+    import asyncio
+
+    from asgiref.sync import async_to_sync
+    from django.core.cache.backends.locmem import LocMemCache
+    from rest_framework.test import APIRequestFactory
+
+    from library.views import BookViewSet, LoanViewSet
+    from users.authentication import ClaimsRefreshToken
+    from users.views import UserViewSet
+
+    settings.DATABASE_REPLICAS = ["replica"]
+    settings.ASYNC_READ_VIEWS = True
+    reader = baker.make("users.User")
+    book = make_book(copies_total=2)
+    baker.make(
+        "library.Loan",
+        user=reader,
+        book=book,
+        due_at=timezone.now() + timedelta(days=14),
+    )
+    access = ClaimsRefreshToken.for_user(reader).access_token
+
+    blocking = []
+
+    def off_loop(name):
+        method = getattr(LocMemCache, name)
+
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                blocking.append(name)
+            except RuntimeError:  # поток sync_to_async
+                pass
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    for name in ("get", "set", "add", "incr", "delete", "touch", "has_key"):
+        monkeypatch.setattr(LocMemCache, name, off_loop(name))
+
+    factory = APIRequestFactory()
+    for viewset, actions, kwargs in (
+        (BookViewSet, {"get": "list"}, {}),
+        (BookViewSet, {"get": "list"}, {}),
+        (BookViewSet, {"get": "retrieve"}, {"pk": book.pk}),
+        (LoanViewSet, {"get": "list"}, {}),
+        (UserViewSet, {"get": "me"}, {}),
+    ):
+        view = async_to_sync(viewset.as_view(actions))
+        request = factory.get("/", headers={"Authorization": f"Bearer {access}"})
+        assert view(request, **kwargs).status_code == 200
+    assert blocking == []
@@ -0,0 +1,40 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(model):
+    return f"library:version:{model._meta.label_lower}"
+
+
+def table_version(model) -> int:
+    """
+    Версия таблицы — время последнего изменения в наносекундах.
+    Хранится в кэше (без запроса к БД); если ключа нет — версия «сейчас».
+    """
+    return cache.get_or_set(_key(model), time.time_ns, None)
+
+
+async def atable_version(model) -> int:
+    """table_version для async-кода."""
+    return await cache.aget_or_set(_key(model), time.time_ns, None)
+
+
+def version_datetime(version: int) -> datetime:
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def bump_table_version(*models, using="default"):
+    """
+    Сменить версию таблиц. Вызывается сразу и ещё раз после коммита:
+    ответ, прочитанный до коммита под новой версией, устареет вместе с ней.
+    """
+
+    def bump():
+        now = time.time_ns()
+        cache.set_many({_key(model): now for model in models}, None)
+
+    bump()
+    transaction.on_commit(bump, using=using)
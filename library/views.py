@@ -1,68 +1,325 @@
+from django.http import Http404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .filters import AuthorFilter, BookFilter
-from .models import Author, Book, Loan
+from .asyncviews import AsyncReadMixin
+from .conditional import ConditionalGetMixin
+from .exports import ExportMixin
+from .fastlist import FastListMixin
+from .fieldsets import SparseFieldsetViewMixin, sparse_fieldset_parameters
+from .filters import (
+    AuthorFilter,
+    BookFilter,
+    FullTextSearchFilter,
+    LoanFilter,
+    LoanHistoryFilter,
+)
+from .imports import ImportFileError, import_books, import_format
+from .models import Author, Book, Loan, LoanHistory, loan_effective_status
+from .pagination import CursorOptInPagination
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
+from .recommendations import also_borrowed, popular_books
+from .replicas import ReadReplicaMixin
+from .response_cache import CachedResponseMixin
 from .serializers import (
     AuthorSerializer,
+    BookImportInputSerializer,
     BookSerializer,
+    BulkIssueInputSerializer,
+    BulkResultSerializer,
+    BulkReturnInputSerializer,
+    HoldInputSerializer,
+    HoldSerializer,
+    ImportReportSerializer,
     IssueInputSerializer,
     LoanSerializer,
+    RecommendationQuerySerializer,
+    RecommendationSerializer,
     ReturnInputSerializer,
+    StatsQuerySerializer,
+    StatsSerializer,
+)
+from .services import (
+    cancel_hold,
+    issue_book,
+    issue_books_bulk,
+    place_hold,
+    return_loan,
+    return_loans_bulk,
 )
-from .services import issue_book, return_loan
+from .stats import read_stats
 
 
 @extend_schema(tags=["Authors"], summary="CRUD авторов")
-class AuthorViewSet(viewsets.ModelViewSet):
+@extend_schema_view(
+    list=extend_schema(parameters=sparse_fieldset_parameters(AuthorSerializer)),
+    retrieve=extend_schema(parameters=sparse_fieldset_parameters(AuthorSerializer)),
+)
+class AuthorViewSet(
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    ExportMixin,
+    FastListMixin,
+    SparseFieldsetViewMixin,
+    ReadReplicaMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Author.objects.all().order_by("last_name", "first_name")
     serializer_class = AuthorSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = CursorOptInPagination
     filterset_class = AuthorFilter
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
-    search_fields = ("first_name", "last_name", "bio")
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, OrderingFilter)
+    search_trigram_fields = ("last_name", "first_name")
     ordering_fields = ("last_name", "first_name", "created_at")
 
 
 @extend_schema(tags=["Books"], summary="CRUD книг")
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.select_related("author").all().order_by("title")
+@extend_schema_view(
+    list=extend_schema(parameters=sparse_fieldset_parameters(BookSerializer)),
+    retrieve=extend_schema(parameters=sparse_fieldset_parameters(BookSerializer)),
+)
+class BookViewSet(
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    ExportMixin,
+    FastListMixin,
+    SparseFieldsetViewMixin,
+    ReadReplicaMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet,
+):
+    # автор уже денормализован в author_display_name, поисковый вектор не нужен
+    queryset = Book.objects.only(
+        "id",
+        "title",
+        "isbn",
+        "description",
+        "genre",
+        "published_year",
+        "author_id",
+        "author_display_name",
+        "copies_total",
+        "copies_available",
+        "created_at",
+        # иначе save() экземпляра из only() не обновит updated_at
+        "updated_at",
+    ).order_by("title")
     serializer_class = BookSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = CursorOptInPagination
     filterset_class = BookFilter
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
-    search_fields = ("title", "description")
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, OrderingFilter)
+    search_trigram_fields = ("title",)
     ordering_fields = ("published_year", "title", "created_at")
 
+    # в ответе не больше стольких ошибок записей (failed — полное число)
+    import_max_reported_errors = 1000
+
+    def get_permissions(self):
+        if self.action == "hold":
+            return [permissions.IsAuthenticated()]
+        return super().get_permissions()
+
+    @extend_schema(
+        request={"multipart/form-data": BookImportInputSerializer},
+        responses={200: ImportReportSerializer, 400: dict},
+        summary="Импорт каталога (CSV / NDJSON / JSON)",
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        url_name="import",
+        parser_classes=(MultiPartParser,),
+    )
+    def import_catalog(self, request):
+        """
+        multipart: file, format (csv|ndjson|json, по умолчанию по расширению),
+        dry_run. Книги обновляются по isbn, авторы — по фамилии и имени.
+        """
+        serializer = BookImportInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        upload = data["file"]
+        file_format = data.get("format") or import_format(upload.name)
+        if file_format is None:
+            return Response(
+                {"format": ["Не удалось определить формат по имени файла"]},
+                status=400,
+            )
+        try:
+            report = import_books(
+                upload.file,
+                file_format,
+                dry_run=data["dry_run"],
+                max_errors=self.import_max_reported_errors,
+            )
+        except (ImportFileError, UnicodeDecodeError) as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(ImportReportSerializer(report).data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=HoldInputSerializer,
+        responses={201: HoldSerializer, 204: None, 400: dict},
+        summary="Встать в очередь на книгу / выйти из очереди",
+    )
+    @action(detail=True, methods=["post", "delete"], url_path="hold")
+    def hold(self, request, pk=None):
+        """
+        POST — встать в очередь: есть свободная копия — она выдаётся сразу
+        (status FULFILLED, loan), иначе заявка ждёт (WAITING) и возврат
+        копии выдаст её первому в очереди. DELETE — выйти из очереди.
+        body: { "user_id": optional } — только staff, за читателя.
+        """
+        serializer = HoldInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrower_id = serializer.validated_data.get("user_id")
+        try:
+            if request.method == "DELETE":
+                cancel_hold(
+                    actor=request.user, book_id=int(pk), borrower_id=borrower_id
+                )
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            hold = place_hold(
+                actor=request.user, book_id=int(pk), borrower_id=borrower_id
+            )
+        except Exception as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(HoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        parameters=[RecommendationQuerySerializer],
+        responses=RecommendationSerializer(many=True),
+        summary="Популярные книги (выдачи за POPULAR_WINDOW_DAYS дней)",
+    )
+    @action(detail=False, methods=["get"], url_path="popular", pagination_class=None)
+    def popular(self, request):
+        """Из BookPopularity (manage.py build_recommendations)."""
+        query = RecommendationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(
+            RecommendationSerializer(
+                [
+                    {"book": row.book, "score": row.score}
+                    for row in popular_books(query.validated_data["limit"])
+                ],
+                many=True,
+            ).data
+        )
+
+    @extend_schema(
+        parameters=[RecommendationQuerySerializer],
+        responses=RecommendationSerializer(many=True),
+        summary="С этой книгой также брали",
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="also-borrowed",
+        url_name="also-borrowed",
+        pagination_class=None,
+    )
+    def also_borrowed(self, request, pk=None):
+        """
+        Из BookNeighbor: один запрос по индексу. Книгу без соседей
+        проверяем отдельно, чтобы на несуществующую ответить 404.
+        """
+        query = RecommendationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise Http404 from None
+        neighbors = also_borrowed(book_id, query.validated_data["limit"])
+        if not neighbors:
+            self.get_object()
+        return Response(
+            RecommendationSerializer(
+                [{"book": row.neighbor, "score": row.score} for row in neighbors],
+                many=True,
+            ).data
+        )
+
+
+INCLUDE_ARCHIVED_PARAMETER = OpenApiParameter(
+    "include_archived",
+    OpenApiTypes.BOOL,
+    description="1 — вместе с архивом (выдачи, возвращённые давно; см. archive_loans).",
+)
+
 
 @extend_schema(tags=["Loans"], summary="Список/детали выданных книг")
-class LoanViewSet(viewsets.ReadOnlyModelViewSet):
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            *sparse_fieldset_parameters(LoanSerializer),
+            INCLUDE_ARCHIVED_PARAMETER,
+        ]
+    ),
+    retrieve=extend_schema(
+        parameters=[
+            *sparse_fieldset_parameters(LoanSerializer),
+            INCLUDE_ARCHIVED_PARAMETER,
+        ]
+    ),
+)
+class LoanViewSet(
+    ExportMixin,
+    FastListMixin,
+    SparseFieldsetViewMixin,
+    ReadReplicaMixin,
+    AsyncReadMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """
     GET /api/loans/         -> staff видит все, user — только свои
     GET /api/loans/{id}/    -> staff или владелец
+    ?include_archived=1     -> вместе с архивом (LoanHistory)
+    GET /api/loans/export/  -> выгрузка CSV/NDJSON (только staff)
     POST /api/loans/issue/  -> выдать (staff — кому угодно; user — себе при ALLOW_SELF_ISSUE)
     POST /api/loans/return/ -> вернуть (staff — любой; user — только свой)
     """
 
     serializer_class = LoanSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = CursorOptInPagination
+
+    @property
+    def filterset_class(self):
+        return LoanHistoryFilter if self.include_archived() else LoanFilter
+
+    def include_archived(self):
+        request = getattr(self, "request", None)
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return False
+        return request.query_params.get("include_archived") in ("1", "true", "True")
 
     def get_queryset(self):
-        qs = Loan.objects.select_related("user", "book").order_by("-issued_at")
+        model = LoanHistory if self.include_archived() else Loan
+        qs = model.objects.select_related("user", "book").order_by("-issued_at")
         user = self.request.user
         if user.is_staff:
             return qs
-        return qs.filter(user=user)
+        return qs.filter(user_id=user.id)
+
+    def get_fast_list_annotations(self):
+        # один момент времени на весь ответ, а не timezone.now() на строку
+        return {"effective_status": loan_effective_status(timezone.now())}
 
     def get_permissions(self):
         if self.action in ("retrieve",):
             return [permissions.IsAuthenticated(), IsOwnerOrAdmin()]
-        if self.action in ("issue", "return_book"):
+        if self.action in ("issue", "return_book", "issue_bulk", "return_bulk"):
             return [permissions.IsAuthenticated()]
         return super().get_permissions()
 
@@ -106,3 +363,85 @@ class LoanViewSet(viewsets.ReadOnlyModelViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=400)
         return Response(LoanSerializer(loan).data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=BulkIssueInputSerializer,
+        responses={200: BulkResultSerializer, 400: dict},
+        summary="Выдать несколько книг",
+    )
+    @action(detail=False, methods=["post"], url_path="issue/bulk")
+    def issue_bulk(self, request):
+        """
+        body: { "book_ids": [int, ...], "user_id": optional }
+        Частичный успех: результат по каждой книге в порядке запроса.
+        """
+        data = self.validated_input(BulkIssueInputSerializer, request)
+        try:
+            results = issue_books_bulk(
+                actor=request.user,
+                book_ids=data["book_ids"],
+                borrower_id=data.get("user_id"),
+            )
+        except Exception as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(self.bulk_response(results), status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=BulkReturnInputSerializer,
+        responses={200: BulkResultSerializer, 400: dict},
+        summary="Вернуть несколько книг",
+    )
+    @action(detail=False, methods=["post"], url_path="return/bulk")
+    def return_bulk(self, request):
+        """
+        body: { "loan_ids": [int, ...] }
+        """
+        data = self.validated_input(BulkReturnInputSerializer, request)
+        try:
+            results = return_loans_bulk(actor=request.user, loan_ids=data["loan_ids"])
+        except Exception as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(self.bulk_response(results), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def validated_input(serializer_class, request):
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @staticmethod
+    def bulk_response(results):
+        succeeded = sum(result.ok for result in results)
+        return BulkResultSerializer(
+            {
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results,
+            }
+        ).data
+
+
+@extend_schema(
+    tags=["Stats"],
+    summary="Статистика каталога и выдач",
+    parameters=[StatsQuerySerializer],
+    responses=StatsSerializer,
+)
+class StatsView(APIView):
+    """
+    GET /api/stats/?days=30&top=10 (только staff): книги и копии по жанрам,
+    выдачи по дням, активные и просроченные выдачи, топ авторов по выдачам.
+    Читается из счётчиков StatCounter — время ответа не зависит от объёма
+    данных. Пересчёт с нуля: manage.py rebuild_stats.
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        query = StatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = read_stats(
+            days=query.validated_data["days"],
+            top_authors=query.validated_data["top"],
+        )
+        return Response(StatsSerializer(data).data)
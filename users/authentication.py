@@ -0,0 +1,247 @@
+import time
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# поля пользователя, которые токен несёт в подписанных claims
+AUTH_CLAIMS = ("username", "is_staff")
+# когда claims прочитаны из БД (time.time()): токен старше изменения
+# пользователя (AUTH_CHANGED_KEY) проверяется по полному пользователю
+AUTH_AT_CLAIM = "auth_at"
+# поля, изменение которых делает claims выданных токенов устаревшими
+AUTH_STATE_FIELDS = frozenset({*AUTH_CLAIMS, "is_active"})
+
+USER_CACHE_KEY = "users:user:{}"
+AUTH_CHANGED_KEY = "users:auth-changed:{}"
+
+
+def cached_user(user_id):
+    """Полный пользователь из кэша (AUTH_USER_CACHE_TIMEOUT); промах — из БД."""
+    key = USER_CACHE_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+async def acached_user(user_id):
+    """cached_user для async-кода: промах кэша — через async ORM."""
+    key = USER_CACHE_KEY.format(user_id)
+    user = await cache.aget(key)
+    if user is None:
+        user = await get_user_model().objects.filter(pk=user_id).afirst()
+        if user is not None:
+            await cache.aset(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user(user_id, auth_changed=True):
+    """
+    Сбросить кэш пользователя; auth_changed — ещё и пометить claims уже
+    выданных токенов устаревшими. Сразу и ещё раз после коммита: чтение,
+    успевшее закэшировать старую строку до коммита, тоже будет сброшено.
+    """
+
+    def invalidate():
+        cache.delete(USER_CACHE_KEY.format(user_id))
+        if auth_changed:
+            cache.set(AUTH_CHANGED_KEY.format(user_id), time.time(), auth_marker_ttl())
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def auth_marker_ttl():
+    # метка нужна, пока живы токены, выданные до неё
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def set_auth_claims(token, user):
+    for claim in AUTH_CLAIMS:
+        token[claim] = getattr(user, claim)
+    token[AUTH_AT_CLAIM] = now = time.time()
+    # claims только что прочитаны: новый токен проходит по ним, а токены,
+    # выданные раньше, проверяются по пользователю. add — не затирает
+    # метку изменения, если она есть
+    cache.add(AUTH_CHANGED_KEY.format(user.pk), now, auth_marker_ttl())
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh-токен с claims пользователя (AUTH_CLAIMS). Новый access при
+    обновлении получает claims заново — из кэша пользователя, а не копию
+    из refresh-токена, поэтому изменения пользователя доходят до токенов
+    не позже, чем через ACCESS_TOKEN_LIFETIME.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_auth_claims(token, user)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = cached_user(self[api_settings.USER_ID_CLAIM])
+        if user is not None:
+            set_auth_claims(access, user)
+        return access
+
+
+class ClaimsUser:
+    """
+    request.user из подписанных claims токена (id, username, is_staff) —
+    без запроса к users_user. Остальные атрибуты (email, phone, has_perm()
+    и т.п.) берутся у полного пользователя из cached_user при первом
+    обращении.
+    """
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, username, is_staff):
+        # в токене id — строка
+        self.id = self.pk = get_user_model()._meta.pk.to_python(user_id)
+        self.username = username
+        self.is_staff = is_staff
+
+    @cached_property
+    def user(self):
+        user = cached_user(self.id)
+        if user is None:
+            raise AuthenticationFailed("Пользователь не найден", code="user_not_found")
+        return user
+
+    async def auser(self):
+        """
+        Полный пользователь в async-коде: там self.user (синхронный запрос
+        к БД при промахе кэша) запрещён.
+        """
+        if "user" not in self.__dict__:
+            user = await acached_user(self.id)
+            if user is None:
+                raise AuthenticationFailed(
+                    "Пользователь не найден", code="user_not_found"
+                )
+            self.__dict__["user"] = user
+        return self.user
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        if isinstance(other, (ClaimsUser, get_user_model())):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.username
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication без SELECT пользователя на каждый запрос.
+
+    Токен с claims (ClaimsRefreshToken), выданный не раньше метки
+    AUTH_CHANGED_KEY (последнее изменение username/is_staff/is_active или
+    выпуск токена), даёт ClaimsUser — нужно лишь чтение метки из кэша.
+    Старые токены, токены без claims и токены пользователя без метки
+    (вытеснена из кэша) проверяются по полному пользователю из cached_user
+    (БД — только при промахе кэша). Кэш и метку сбрасывают сигналы
+    users.signals.
+    """
+
+    def get_user(self, validated_token):
+        user = self.claims_user(validated_token)
+        if user is None:
+            user = self.check_user(cached_user(self.token_user_id(validated_token)))
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() для async-представлений (library.asyncviews)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user = await self.aclaims_user(validated_token)
+        if user is None:
+            user = self.check_user(
+                await acached_user(self.token_user_id(validated_token))
+            )
+        return user
+
+    @staticmethod
+    def token_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Токен не содержит идентификатора пользователя") from e
+
+    def claims_user(self, validated_token):
+        """ClaimsUser, если claims токена не старше метки пользователя."""
+        key = self.auth_changed_key(validated_token)
+        if key is None:
+            return None
+        changed_at = cache.get(key)
+        if changed_at is None:
+            # метки нет — отзыв мог потеряться вместе с ней: этот и
+            # более старые токены идут по пользователю до обновления
+            cache.add(key, time.time(), auth_marker_ttl())
+        return self.fresh_claims_user(validated_token, changed_at)
+
+    async def aclaims_user(self, validated_token):
+        """claims_user для async-кода."""
+        key = self.auth_changed_key(validated_token)
+        if key is None:
+            return None
+        changed_at = await cache.aget(key)
+        if changed_at is None:
+            await cache.aadd(key, time.time(), auth_marker_ttl())
+        return self.fresh_claims_user(validated_token, changed_at)
+
+    def auth_changed_key(self, validated_token):
+        """Ключ метки пользователя или None, если в токене нет claims."""
+        user_id = self.token_user_id(validated_token)
+        if all(claim in validated_token for claim in (*AUTH_CLAIMS, AUTH_AT_CLAIM)):
+            return AUTH_CHANGED_KEY.format(user_id)
+        return None
+
+    def fresh_claims_user(self, validated_token, changed_at):
+        if changed_at is None or validated_token[AUTH_AT_CLAIM] < changed_at:
+            return None
+        return ClaimsUser(
+            self.token_user_id(validated_token),
+            validated_token["username"],
+            validated_token["is_staff"],
+        )
+
+    @staticmethod
+    def check_user(user):
+        if user is None:
+            raise AuthenticationFailed("Пользователь не найден", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("Пользователь неактивен", code="user_inactive")
+        return user
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolBusy(APIException):
+    """503 + Retry-After: пул хеширования паролей занят."""
+
+    status_code = 503
+    default_detail = "Сервер перегружен, повторите попытку позже."
+    default_code = "hashing_pool_busy"
+
+    def __init__(self, detail=None, code=None, wait=1):
+        super().__init__(detail, code)
+        # DRF exception_handler превращает wait в заголовок Retry-After
+        self.wait = wait
+
+
+class HashingPool:
+    """
+    Пул потоков для PBKDF2 с ограничением: не больше `workers` хеширований
+    одновременно и `queue_size` ждущих. Сверх этого — сразу HashingPoolBusy,
+    а не очередь без конца: поток сервера освобождается за микросекунды.
+    hashlib.pbkdf2_hmac отпускает GIL, поэтому потоки хешируют параллельно.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.timeout = timeout
+
+    def submit(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingPoolBusy()
+
+        def task():
+            # место освобождается до того, как результат станет виден
+            try:
+                return fn(*args)
+            finally:
+                self.slots.release()
+
+        try:
+            return self.executor.submit(task)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def run(self, fn, *args):
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingPoolBusy() from None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    """Пул процесса; создаётся при первом вызове — уже после fork воркера."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    workers=settings.PASSWORD_HASHING_WORKERS,
+                    queue_size=settings.PASSWORD_HASHING_QUEUE,
+                    timeout=settings.PASSWORD_HASHING_TIMEOUT,
+                )
+    return _pool
+
+
+def hash_password(raw_password):
+    """make_password в пуле."""
+    return hashing_pool().run(make_password, raw_password)
+
+
+def authenticate_user(username, password, request=None):
+    """
+    Как authenticate() с ModelBackend, но хеширование — в пуле, ровно одно
+    на попытку (и для несуществующего пользователя — чтобы время ответа
+    не выдавало, есть ли такой логин). Хеш, который надо обновить (сменились
+    параметры хешера), пересчитывается и сохраняется. None — не подошло.
+    """
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        user = None
+        hashing_pool().run(make_password, password)
+    else:
+        if not hashing_pool().run(check_password, password, user.password):
+            user = None
+        elif not user.is_active:
+            user = None
+        elif identify_hasher(user.password).must_update(user.password):
+            user.password = hash_password(password)
+            user.save(update_fields=["password"])
+    if user is None:
+        user_login_failed.send(
+            sender=__name__,
+            credentials={User.USERNAME_FIELD: username},
+            request=request,
+        )
+    return user
@@ -5,4 +5,5 @@ class IsSelfOrAdmin(BasePermission):
     """Доступ к объекту пользователя только себе или админу."""
 
     def has_object_permission(self, request, view, obj):
-        return bool(request.user and (request.user.is_staff or obj == request.user))
+        u = request.user
+        return bool(u and (u.is_staff or obj.pk == u.pk))
@@ -1,10 +1,21 @@
 from django.contrib.auth import get_user_model, password_validation
-from rest_framework import serializers
+from django.contrib.auth.models import update_last_login
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from library.fieldsets import SparseFieldsetSerializerMixin
+
+from .authentication import ClaimsRefreshToken
+from .hashing import authenticate_user, hash_password
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = (
@@ -31,8 +42,38 @@ class RegisterSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
+        # один хеш (в пуле) и один INSERT — как create_user, но без
+        # set_unusable_password и второго save
         password = validated_data.pop("password")
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save(update_fields=["password"])
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.password = hash_password(password)
+        user.save(force_insert=True)
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Пара токенов с claims пользователя (см. CachedJWTAuthentication)."""
+
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        # проверка пароля — в пуле хеширования (users.hashing)
+        self.user = authenticate_user(
+            attrs[self.username_field],
+            attrs["password"],
+            request=self.context.get("request"),
+        )
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        refresh = self.get_token(self.user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
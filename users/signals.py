@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import AUTH_STATE_FIELDS, invalidate_user
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    auth_changed = update_fields is None or bool(AUTH_STATE_FIELDS & set(update_fields))
+    invalidate_user(instance.pk, auth_changed=auth_changed)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
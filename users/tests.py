@@ -86,3 +86,197 @@ def test_users_me_ok():
     resp = client.get(reverse("users-me"))
     assert resp.status_code == 200
     assert resp.data["username"] == "u1"
+
+
+def obtain_tokens(username, password="Str0ngPass!"):
+    resp = APIClient().post(
+        reverse("token_obtain_pair"),
+        {"username": username, "password": password},
+        format="json",
+    )
+    assert resp.status_code == 200
+    return resp.data
+
+
+def bearer(access):
+    c = APIClient()
+    c.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    return c
+
+
+def make_user(**kwargs):
+    from users.models import User
+
+    return User.objects.create_user(password="Str0ngPass!", **kwargs)
+
+
+def test_jwt_requests_do_not_query_users_table():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    user = make_user(username="reader", email="reader@example.com")
+    c = bearer(obtain_tokens("reader")["access"])
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = c.get(reverse("loans-list"))
+    assert resp.status_code == 200
+    # users_user — только в JOIN списка выдач, отдельного SELECT пользователя нет
+    assert not [q for q in ctx.captured_queries if 'FROM "users_user"' in q["sql"]]
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = c.get(reverse("users-me"), {"fields": "id,username,is_staff"})
+    assert resp.data == {"id": user.pk, "username": "reader", "is_staff": False}
+    assert not ctx.captured_queries
+
+    # остальные поля — из кэша полного пользователя
+    assert c.get(reverse("users-me")).data["email"] == "reader@example.com"
+    assert c.get(reverse("users-detail", args=[user.pk])).status_code == 200
+
+
+def test_jwt_claims_are_invalidated_when_user_changes():
+    user = make_user(username="librarian", is_staff=True)
+    tokens = obtain_tokens("librarian")
+    c = bearer(tokens["access"])
+    assert c.get(reverse("stats")).status_code == 200
+
+    user.is_staff = False
+    user.save(update_fields=["is_staff"])
+    # claims старого токена больше не действуют
+    assert c.get(reverse("stats")).status_code == 403
+
+    # новый access по refresh-токену получает актуальные claims
+    resp = APIClient().post(
+        reverse("token_refresh"), {"refresh": tokens["refresh"]}, format="json"
+    )
+    assert resp.status_code == 200
+    assert bearer(resp.data["access"]).get(reverse("stats")).status_code == 403
+
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    assert c.get(reverse("users-me")).status_code == 401
+
+    # правка полей вне claims не трогает выданные токены
+    other = make_user(username="other")
+    other_client = bearer(obtain_tokens("other")["access"])
+    other.phone = "+100"
+    other.save(update_fields=["phone"])
+    assert other_client.get(reverse("users-me")).data["phone"] == "+100"
+
+
+def test_jwt_revocation_survives_cache_eviction():
+    from django.core.cache import cache
+
+    user = make_user(username="keeper", is_staff=True)
+    c = bearer(obtain_tokens("keeper")["access"])
+    assert c.get(reverse("stats")).status_code == 200
+
+    user.is_staff = False
+    user.save(update_fields=["is_staff"])
+    # метку изменения вытеснили из кэша — claims токена всё равно не действуют
+    cache.clear()
+    assert c.get(reverse("stats")).status_code == 403
+
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    cache.clear()
+    assert c.get(reverse("users-me")).status_code == 401
+    assert c.get(reverse("users-me")).status_code == 401
+
+
+def test_register_hashes_once_and_inserts_once(monkeypatch):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from users import hashing
+    from users.models import User
+
+    calls = []
+    make_password = hashing.make_password
+    monkeypatch.setattr(
+        hashing, "make_password", lambda raw: calls.append(raw) or make_password(raw)
+    )
+    payload = {
+        "username": "once",
+        "email": "Once@EXAMPLE.com",
+        "password": "Str0ngPass!",
+    }
+    with CaptureQueriesContext(connection) as ctx:
+        resp = APIClient().post(reverse("register"), payload, format="json")
+    assert resp.status_code == 201
+    writes = [
+        q["sql"].split()[0]
+        for q in ctx.captured_queries
+        if '"users_user"' in q["sql"] and not q["sql"].startswith("SELECT")
+    ]
+    assert writes == ["INSERT"]
+    assert calls == ["Str0ngPass!"]
+    user = User.objects.get(username="once")
+    assert user.email == "Once@example.com"
+    assert user.check_password("Str0ngPass!")
+
+    assert obtain_tokens("once")["access"]
+    resp = APIClient().post(
+        reverse("token_obtain_pair"),
+        {"username": "once", "password": "wrong"},
+        format="json",
+    )
+    assert resp.status_code == 401
+
+
+def test_saturated_hashing_pool_answers_503(monkeypatch):
+    import threading
+
+    from users import hashing
+
+    pool = hashing.HashingPool(workers=1, queue_size=0, timeout=5)
+    monkeypatch.setattr(hashing, "_pool", pool)
+    make_user(username="busy")
+    release = threading.Event()
+    blocker = pool.submit(release.wait, 5)
+    try:
+        resp = APIClient().post(
+            reverse("token_obtain_pair"),
+            {"username": "busy", "password": "Str0ngPass!"},
+            format="json",
+        )
+        assert resp.status_code == 503
+        assert resp["Retry-After"] == "1"
+        resp = APIClient().post(
+            reverse("register"),
+            {"username": "later", "password": "Str0ngPass!"},
+            format="json",
+        )
+        assert resp.status_code == 503
+    finally:
+        release.set()
+        blocker.result()
+    assert obtain_tokens("busy")["access"]
+
+
+def test_me_async_view_reads_full_user_only_for_non_claim_fields():
+    import inspect
+
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import resolve
+
+    from users.authentication import USER_CACHE_KEY
+
+    user = make_user(username="async-reader", email="async@example.com")
+    c = bearer(obtain_tokens("async-reader")["access"])
+    assert inspect.iscoroutinefunction(resolve(reverse("users-me")).func)
+    cache.delete(USER_CACHE_KEY.format(user.pk))
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = c.get(reverse("users-me"), {"fields": "id,username"})
+    assert resp.data["username"] == "async-reader"
+    assert not ctx.captured_queries
+
+    # промах кэша пользователя — один SELECT через async ORM, затем из кэша
+    with CaptureQueriesContext(connection) as ctx:
+        assert c.get(reverse("users-me")).data["email"] == "async@example.com"
+    assert len(ctx.captured_queries) == 1
+    with CaptureQueriesContext(connection) as ctx:
+        assert c.get(reverse("users-me")).status_code == 200
+    assert not ctx.captured_queries
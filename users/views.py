@@ -1,9 +1,14 @@
 from django.contrib.auth import get_user_model
-from drf_spectacular.utils import OpenApiExample, extend_schema
+from drf_spectacular.utils import OpenApiExample, extend_schema, extend_schema_view
 from rest_framework import generics, permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from library.asyncviews import AsyncReadMixin
+from library.fieldsets import SparseFieldsetViewMixin, sparse_fieldset_parameters
+from library.replicas import ReadReplicaMixin
+
+from .authentication import AUTH_CLAIMS, ClaimsUser
 from .permissions import IsSelfOrAdmin
 from .serializers import RegisterSerializer, UserSerializer
 
@@ -34,9 +39,19 @@ class RegisterView(generics.CreateAPIView):
 
 
 @extend_schema(tags=["Users"], summary="Профиль текущего пользователя")
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+@extend_schema_view(
+    list=extend_schema(parameters=sparse_fieldset_parameters(UserSerializer)),
+    retrieve=extend_schema(parameters=sparse_fieldset_parameters(UserSerializer)),
+)
+class UserViewSet(
+    SparseFieldsetViewMixin,
+    ReadReplicaMixin,
+    AsyncReadMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     queryset = User.objects.all().order_by("id")
     serializer_class = UserSerializer
+    async_actions = ("me",)
 
     def get_permissions(self):
         if self.action == "list":
@@ -47,8 +62,22 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
             return [permissions.IsAuthenticated()]
         return super().get_permissions()
 
-    @extend_schema(tags=["Users"], summary="Текущий пользователь")
+    @extend_schema(
+        tags=["Users"],
+        summary="Текущий пользователь",
+        parameters=sparse_fieldset_parameters(UserSerializer),
+    )
     @action(detail=False, methods=["get"])
     def me(self, request):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
+
+    async def ame(self, request):
+        user = request.user
+        serializer = self.get_serializer(user)
+        claims = {"id", *AUTH_CLAIMS}
+        if isinstance(user, ClaimsUser) and not claims.issuperset(serializer.fields):
+            # поля не из claims — у полного пользователя, в async-коде
+            # его можно получить только через auser()
+            serializer = self.get_serializer(await user.auser())
+        return Response(serializer.data)